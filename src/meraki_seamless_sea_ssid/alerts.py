@@ -0,0 +1,107 @@
+import json
+import re
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # orjson is optional; the standard library decoder accepts bytes as well
+    _loads = json.loads
+
+PORT_ALERT_TYPES = frozenset(("port_connected", "port_disconnected"))
+
+# Top-level string fields read straight from the raw body; values containing escapes are left to the decoder
+_ALERT_TYPE_RE = re.compile(rb'"alertTypeId"\s*:\s*"([^"\\]*)"')
+_SERIAL_RE = re.compile(rb'"deviceSerial"\s*:\s*"([^"\\]*)"')
+_NETWORK_RE = re.compile(rb'"networkId"\s*:\s*"([^"\\]*)"')
+# Strings (skipped whole, so brackets inside them do not count) and brackets, to find the nesting depth
+_TOKEN_RE = re.compile(rb'"(?:[^"\\]|\\.)*"|[][{}]')
+
+
+def _depth(body, end):
+    """Nesting depth of position end of body (1 for the keys of the top-level object)."""
+    depth = 0
+    for token in _TOKEN_RE.finditer(body, 0, end):
+        if token.group() in (b"{", b"["):
+            depth += 1
+        elif token.group() in (b"}", b"]"):
+            depth -= 1
+    return depth
+
+
+def _peek(pattern, body):
+    """
+    The value of the key matched by pattern if it occurs once, as a key of the top-level object. Otherwise
+    (absent, repeated or only found in a nested object such as alertData) None, which leaves it to the decoder.
+    """
+    matches = list(pattern.finditer(body))
+    if len(matches) != 1 or _depth(body, matches[0].start()) != 1:
+        return None
+    return matches[0].group(1).decode()
+
+
+def peek_alert_type(body):
+    """
+    Return the alertTypeId of a raw webhook body without decoding it (None if it cannot be found), so
+    unrelated alerts can be rejected before the JSON is parsed.
+    """
+    return _peek(_ALERT_TYPE_RE, body)
+
+
+def peek_serial(body):
+    """Return the deviceSerial of a raw webhook body without decoding it (None if it cannot be found)."""
+    return _peek(_SERIAL_RE, body)
+
+
+def peek_network_id(body):
+    """Return the networkId of a raw webhook body without decoding it (None if it cannot be found)."""
+    return _peek(_NETWORK_RE, body)
+
+
+class PortAlert:
+    """
+    The fields of a Meraki webhook alert used by the app. Everything else in the payload is ignored.
+    The decoded payload is kept in `payload` for logging.
+    """
+
+    __slots__ = ("device_serial", "alert_type_id", "network_id", "port_number", "alert_id", "occurred_at",
+                 "payload")
+
+    def __init__(self, device_serial, alert_type_id, network_id=None, port_number=None, alert_id=None,
+                 occurred_at=None, payload=None):
+        self.device_serial = device_serial
+        self.alert_type_id = alert_type_id
+        self.network_id = network_id
+        self.port_number = port_number
+        self.alert_id = alert_id
+        self.occurred_at = occurred_at
+        self.payload = payload
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a PortAlert from a decoded payload. Missing fields are None."""
+        alert_data = data.get("alertData")
+        return cls(
+            device_serial=data.get("deviceSerial"),
+            alert_type_id=data.get("alertTypeId"),
+            network_id=data.get("networkId"),
+            port_number=alert_data.get("portNum") if isinstance(alert_data, dict) else None,
+            alert_id=data.get("alertId"),
+            occurred_at=data.get("occurredAt"),
+            payload=data,
+        )
+
+    @classmethod
+    def parse(cls, body):
+        """
+        Decode a raw webhook body.
+
+        :raises ValueError: if the body is not a JSON object.
+        """
+        data = _loads(body)
+        if not isinstance(data, dict):
+            raise ValueError("Webhook payload must be a JSON object")
+        return cls.from_dict(data)
+
+    @property
+    def is_port_alert(self):
+        return self.alert_type_id in PORT_ALERT_TYPES
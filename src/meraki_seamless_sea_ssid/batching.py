@@ -0,0 +1,124 @@
+import asyncio
+
+# Dashboard limits: synchronous action batches take up to 20 actions, asynchronous ones up to 100.
+ACTION_BATCH_SYNC_LIMIT = 20
+ACTION_BATCH_MAX_SIZE = 100
+
+
+class ActionBatchError(Exception):
+    """Raised when the Dashboard reports an action batch as failed."""
+
+    def __init__(self, errors):
+        self.errors = errors or []
+        super().__init__(f"Action batch failed: {'; '.join(map(str, self.errors)) or 'unknown error'}")
+
+
+def is_rejection(e):
+    """
+    True if the Dashboard rejected the content of a batch (a failed action batch or a 4xx other than 429),
+    so retrying its items one by one tells which of them is at fault. Outages and 429s fail every item alike.
+    """
+    status = getattr(e, "status", None)
+    return isinstance(e, ActionBatchError) or status is not None and 400 <= status < 500 and status != 429
+
+
+def ssid_action_body(payload):
+    """
+    The body of an SSID update action: the payload without None values, with a `vlan` (queued by earlier
+    versions) given as useVlanTagging/defaultVlanId. Action bodies are not filtered to the operation's
+    parameters by the SDK, so any other field would fail the whole batch.
+    """
+    body = {key: value for key, value in payload.items() if value is not None and key != "vlan"}
+    if payload.get("vlan") is not None and "defaultVlanId" not in body:
+        body.update(useVlanTagging=True, defaultVlanId=int(payload["vlan"]))
+    return body
+
+
+def ssid_update_action(network_id, ssid_number, payload):
+    """Build the action-batch action equivalent to updateNetworkWirelessSsid."""
+    return {
+        "resource": f"/networks/{network_id}/wireless/ssids/{ssid_number}",
+        "operation": "update",
+        "body": ssid_action_body(payload),
+    }
+
+
+class SsidBatcher:
+    """
+    Collects SSID changes for up to `window` seconds (or until `max_size` distinct SSIDs are pending)
+    and hands them to `submit` as one batch.
+
+    `submit` is a coroutine function taking a list of (network_id, ssid_number, payload) items and
+    returning a list of the same length holding None (applied) or the exception for each item.
+    Two changes for the same SSID within one window collapse into the later one. Each caller of add()
+    gets the outcome of the item that carried its change.
+    """
+
+    def __init__(self, submit, window=0.2, max_size=ACTION_BATCH_SYNC_LIMIT):
+        self.submit = submit
+        self.window = window
+        self.max_size = min(max_size, ACTION_BATCH_MAX_SIZE)
+        self._pending = {}     # (network_id, ssid_number) -> [item, [waiter futures]]
+        self._timer = None
+        self._tasks = set()
+        self.batches = 0
+        self.items = 0
+
+    async def add(self, network_id, ssid_number, payload):
+        """
+        Queue an SSID change and wait until its batch has been applied.
+
+        :raises Exception: the error reported for this change.
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        key = (network_id, str(ssid_number))
+        entry = self._pending.get(key)
+        if entry is None:
+            self._pending[key] = [(network_id, ssid_number, payload), [waiter]]
+        else:
+            entry[0] = (network_id, ssid_number, payload)
+            entry[1].append(waiter)
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+        return await waiter
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self._timer = None
+        self._flush()
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = list(self._pending.values()), {}
+        task = asyncio.create_task(self._submit(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _submit(self, batch):
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = await self.submit([item for item, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, waiters), error in zip(batch, results):
+            for waiter in waiters:
+                if waiter.done():
+                    continue
+                if error is None:
+                    waiter.set_result(None)
+                else:
+                    waiter.set_exception(error)
+
+    async def flush(self):
+        """Submit everything pending now and wait for in-flight batches to finish (used on shutdown)."""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from logrr import lm
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the Dashboard while the circuit breaker is open."""
+
+    def __init__(self, retry_in):
+        self.retry_in = retry_in
+        super().__init__(f"Dashboard unavailable, circuit breaker open (next probe in {retry_in:.1f}s)")
+
+
+def is_outage(e):
+    """
+    True if a failed Dashboard call means the Dashboard is unreachable or unhealthy: a timeout, a connection
+    error (an SDK error without an HTTP status) or a 5xx. 4xx responses, including 429, are answers.
+    """
+    if isinstance(e, (asyncio.TimeoutError, OSError)):
+        return True
+    if not hasattr(e, 'status'):
+        return False
+    return e.status is None or e.status >= 500
+
+
+def is_retryable(e):
+    """True if a failed SSID change may succeed unchanged later (outage, open breaker or 429), not a rejection."""
+    return isinstance(e, CircuitOpenError) or is_outage(e) or getattr(e, 'status', None) == 429
+
+
+class CircuitBreaker:
+    """
+    Fails Dashboard calls fast while the Dashboard is down, instead of letting every call wait out the
+    request timeout and the rate limiter's retries.
+
+    After `failure_threshold` consecutive outage failures (see is_outage) the breaker opens and before_call()
+    raises CircuitOpenError. After `reset_timeout` seconds one call is let through as a probe (half-open);
+    its success closes the breaker, its failure opens it again. Any answer from the Dashboard, including a
+    4xx, counts as a success. Callbacks added with on_close() run when the breaker closes again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._on_close = []
+        self.opened = 0
+        self.rejected = 0
+
+    def on_close(self, callback):
+        self._on_close.append(callback)
+
+    def retry_in(self):
+        """Seconds until the next probe may be made (0 unless open)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def check(self):
+        """Raise CircuitOpenError while open, without taking the probe slot (e.g. before waiting for a token)."""
+        if self.state != CLOSED and (self.retry_in() > 0 or self._probing):
+            self.rejected += 1
+            raise CircuitOpenError(self.retry_in() or self.reset_timeout)
+
+    def before_call(self):
+        """Admit a call: always when closed, as the single probe when the reset timeout has passed."""
+        self.check()
+        if self.state != CLOSED:
+            self.state = HALF_OPEN
+            self._probing = True
+
+    def record_success(self):
+        self._failures = 0
+        self._probing = False
+        if self.state != CLOSED:
+            self.state = CLOSED
+            lm.tsp("[bright_green]Dashboard reachable again, circuit breaker closed[/bright_green]")
+            for callback in self._on_close:
+                callback()
+
+    def record_cancelled(self):
+        """A call admitted by before_call() was cancelled before it got an answer; free the probe slot."""
+        self._probing = False
+
+    def record_failure(self, e):
+        """Count a failed call; only outages (see is_outage) count towards opening the breaker."""
+        self._probing = False
+        if not is_outage(e):
+            if self.state == HALF_OPEN:     # The probe got an answer: the Dashboard is up
+                self.record_success()
+            else:
+                self._failures = 0
+            return
+        self._failures += 1
+        if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opened += 1
+                lm.tsp(f"[bold red]Dashboard unavailable ({e}), circuit breaker open for "
+                       f"{self.reset_timeout:.0f}s[/bold red]")
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self):
+        return {'state': self.state, 'opened': self.opened, 'rejected': self.rejected}
@@ -9,11 +9,8 @@ import re
 
 # Adjust the path to load the .env file from the project root.
 env_path = pathlib.Path(__file__).parents[2] / '.env'
-print(f'env path: {env_path}')  # for debugging
 load_dotenv(dotenv_path=env_path)
 
-load_dotenv()
-
 
 class Config(BaseSettings):
     """
@@ -31,23 +28,82 @@ class Config(BaseSettings):
     # Construct the absolute path for dir
     DIR_PATH: ClassVar[pathlib.Path] = pathlib.Path(__file__).parents[2]
     ENV_FILE_PATH: ClassVar[str] = str(DIR_PATH / ".env")
-    BOATS_CSV: ClassVar[str] = str(DIR_PATH / "data" / "boats.csv")     # Construct the absolute path for boats.csv
-    CSV_DB: ClassVar[str] = str(DIR_PATH / "data" / "ms_120_device_list.csv")     # Construct the absolute path for boats.csv
     BOAT_NAMES: ClassVar[str] = str(DIR_PATH / "data" / "test.csv")
 
+    # Data files, overridable from the environment (e.g. by the load-test harness)
+    BOATS_CSV: str = str(DIR_PATH / "data" / "boats.csv")     # Construct the absolute path for boats.csv
+    CSV_DB: str = str(DIR_PATH / "data" / "ms_120_device_list.csv")     # Construct the absolute path for boats.csv
+    STATE_DB: str = str(DIR_PATH / "data" / "state.db")     # SQLite state store (STATE_BACKEND=sqlite)
+    STATE_DB_BUSY_TIMEOUT: float = 0.5  # Seconds a state write waits for another worker's write lock (blocks the event loop)
+
     # Meraki Integration settings
     MERAKI_API_KEY: str
     MERAKI_BASE_URL: str
     MERAKI_NETWORK_ID: str
+    MERAKI_NETWORK_IDS: List[str] = []  # Further networks (marinas) served, as a JSON list, e.g. '["N_2", "N_3"]'
     PSK: str
     MERAKI_SSID_NAME: str
 
+    # Meraki API client settings
+    MERAKI_BACKEND: str = 'sync'    # 'sync' (meraki.DashboardAPI) or 'async' (meraki.aio.AsyncDashboardAPI)
+    MERAKI_MAX_CONCURRENT_REQUESTS: int = 8     # Size of the shared aio connection pool
+    MERAKI_ORG_ID: Optional[str] = None    # Resolved from MERAKI_NETWORK_ID when not set
+    MERAKI_RATE_LIMIT: float = 10.0     # Dashboard calls per second per organization
+    MERAKI_RATE_BURST: int = 10
+    NETWORK_RATE_LIMIT: float = 0.0     # Dashboard calls per second per network (0: org budget split evenly)
+    MERAKI_MAX_RETRIES: int = 5     # Retries for 429/5xx responses
+    MERAKI_REQUEST_TIMEOUT: float = 60.0    # Seconds before a Dashboard request times out
+    BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive timeouts/5xx before Dashboard calls fail fast
+    BREAKER_RESET_TIMEOUT: float = 30.0     # Seconds before a call is let through to probe the Dashboard again
+    SSID_BATCH_ENABLED: bool = False    # Submit SSID changes as organization action batches
+    SSID_BATCH_WINDOW: float = 0.2      # Seconds to collect SSID changes into one batch
+    SSID_BATCH_MAX_SIZE: int = 20       # Up to 20 runs synchronously, up to 100 as an asynchronous batch
+
+    # Switch inventory
+    SWITCH_MODEL_PATTERNS: List[str] = ['MS*']  # Switch models handled, as a JSON list, e.g. '["MS120*", "MS320*"]'
+    INVENTORY_REFRESH_INTERVAL: float = 900.0   # Seconds between incremental inventory refreshes (0 disables)
+    INVENTORY_FULL_REFRESH_INTERVAL: float = 86400.0    # Seconds between full refreshes (drop removed switches)
+
+    # State settings
+    STATE_BACKEND: str = 'csv'      # 'csv' (rewrite ms_120_device_list.csv) or 'sqlite' (data/state.db)
+    APP_WORKERS: int = 1    # uvicorn worker processes; more than 1 requires STATE_BACKEND=sqlite
+    JOURNAL_ENABLED: bool = False   # Append-only journal of webhooks and actions (an fsync per event group), replayed at startup
+    JOURNAL_PATH: str = str(DIR_PATH / "data" / "journal.jsonl")
+    JOURNAL_COMPACT_INTERVAL: float = 3600.0    # Seconds between folding the journal into its snapshot (0 disables)
+    JOURNAL_BACKUPS: int = 3        # Compacted journal segments kept as journal.jsonl.1 ... .N
+    WARM_START_ENABLED: bool = True     # Snapshot the caches on shutdown and load them at the next start
+    WARM_START_PATH: str = str(DIR_PATH / "data" / "cache.snapshot")
+    WARM_START_MAX_AGE: float = 86400.0     # Seconds after which a cache snapshot is ignored
+    WARM_UP_ATTEMPTS: int = 3       # Tries to seed a network's SSID state before the app is ready without it
+    PENDING_ACTIONS_PATH: str = str(DIR_PATH / "data" / "pending_actions.json")     # SSID changes queued in outages
+
+    # Webhook processing settings
+    WEBHOOK_QUEUE_MODE: bool = False    # True: acknowledge with 202 and process on background workers
+    WEBHOOK_QUEUE_SIZE: int = 1000      # Queued events before the route answers 429
+    WEBHOOK_WORKERS: int = 4
+    WEBHOOK_DRAIN_TIMEOUT: float = 30.0     # Seconds to drain the queue on shutdown
+    PORT_COALESCE_WINDOW: float = 0.5   # Seconds to collapse bursts of events for the same switch port
+    LLDP_CACHE_TTL: float = 5.0     # Seconds a getDeviceLldpCdp response is reused for other ports of the switch
+    WEBHOOK_DEDUP_TTL: float = 300.0    # Seconds a re-delivered alert is recognised as a duplicate (0 disables)
+    WEBHOOK_DEDUP_MAX_SIZE: int = 10000     # Alert keys remembered in memory
+    RECONCILE_INTERVAL: float = 300.0   # Seconds between reconciliation sweeps (0 disables)
+    RECONCILE_PER_PAGE: int = 20        # Switches per page of the organization-wide port endpoints (3-20)
+
     # FastAPI Settings
     APP_NAME: Optional[str] = 'Update your app name in .env'
     APP_VERSION: Optional[str] = 'Update your ap'
     DEV_ENV: Optional[str] = 'development'
     IS_PRODUCTION: bool = DEV_ENV.lower() == 'production'  # True if FLASK_ENV is "production," otherwise False
     LOGGER_LEVEL: str = 'DEBUG'
+    LOG_NONBLOCKING: bool = False   # Queue console output and render it on a background thread
+    LOG_QUEUE_SIZE: int = 10000     # Queued console messages before new ones are dropped
+    LOG_SAMPLE_RATE: int = 10       # Above 3/4 of LOG_QUEUE_SIZE only every Nth message is kept
+    LOG_PRETTY_PAYLOADS: Optional[bool] = None  # Pretty-print webhook payloads; defaults to off in production
+    INTERACTIVE: Optional[bool] = None  # Start/exit panels and config table; defaults to on when stdout is a terminal
+    EVENT_LOG_ENABLED: bool = True  # Structured per-webhook records with stage timings
+    EVENT_LOG_PATH: str = 'logs/events.jsonl'
+    EVENT_LOG_MAX_BYTES: int = 10 * 1024 * 1024    # Rotation size; with APP_WORKERS > 1 rotate with logrotate
+    EVENT_LOG_BACKUPS: int = 5
 
     _instance: ClassVar[Optional['Config']] = None
 
@@ -59,8 +115,10 @@ class Config(BaseSettings):
 
     @field_validator('MERAKI_BASE_URL', mode='before')
     def validate_meraki_base_url(cls, v):
-        if not re.match(r'https://api.meraki\.com/api/v1', v):
-            raise ValueError('WEBEX_BASE_URL must be: https://api.meraki.com/api/v1/')
+        # A local http:// URL is accepted for the mock Dashboard used by loadtest.py
+        if not re.match(r'https://api.meraki\.com/api/v1', v) and \
+                not re.match(r'http://(localhost|127\.0\.0\.1)(:\d+)?/api/v1', v):
+            raise ValueError('MERAKI_BASE_URL must be: https://api.meraki.com/api/v1/')
         return v
 
     @field_validator('MERAKI_API_KEY', mode='before')
@@ -69,5 +127,25 @@ class Config(BaseSettings):
             raise ValueError('MREAKI_API_KEY must not be empty')
         return v
 
+    @field_validator('STATE_BACKEND', mode='before')
+    def validate_state_backend(cls, v):
+        v = str(v).lower()
+        if v not in ('csv', 'sqlite'):
+            raise ValueError("STATE_BACKEND must be 'csv' or 'sqlite'")
+        return v
+
+    @model_validator(mode='after')
+    def validate_app_workers(self):
+        if self.APP_WORKERS > 1 and self.STATE_BACKEND != 'sqlite':
+            raise ValueError("APP_WORKERS > 1 requires STATE_BACKEND=sqlite")
+        return self
+
+    @field_validator('MERAKI_BACKEND', mode='before')
+    def validate_meraki_backend(cls, v):
+        v = str(v).lower()
+        if v not in ('sync', 'async'):
+            raise ValueError("MERAKI_BACKEND must be 'sync' or 'async'")
+        return v
+
 
 config = Config.get_instance()
@@ -0,0 +1,89 @@
+import time
+from urllib.parse import quote
+from config import config
+from funcs import model_matches, query_params
+from inventory import SwitchInventory
+
+MAX_NETWORK_IDS = 100   # Above this many selected networks the whole organization is read and filtered locally
+
+
+def device_row(device):
+    """A newly discovered switch in the ms_120_device_list.csv row format (no boat docked)."""
+    return {"Serial Number": device["serial"], "Model": device["model"],
+            "switch_port_connected": False, "SystemName": "N/A"}
+
+
+class DiscoveryError(Exception):
+    """Raised when the organization to discover cannot be determined."""
+
+
+class FleetDiscovery:
+    """
+    Non-interactive discovery of the switches of an organization.
+
+    The network list is fetched page by page (filtered server-side to switch networks, and by
+    `network_tags`, then locally by the `network_names` patterns). The switches are then read with one
+    organization-wide, paginated SwitchInventory query filtered by `model_patterns`, and those that belong
+    to a selected network are added to the state store. Devices already in the store keep their port state.
+    """
+
+    def __init__(self, meraki_ops, store, network_tags=(), network_names=(), model_patterns=None):
+        self.meraki_ops = meraki_ops
+        self.store = store
+        self.network_tags = list(network_tags)
+        self.network_names = list(network_names)
+        self.inventory = SwitchInventory(meraki_ops, model_patterns=model_patterns or config.SWITCH_MODEL_PATTERNS)
+        self.switches = {}      # network id -> matching devices
+        self.added = 0
+
+    async def select_org(self, org=None):
+        """
+        Return the ID of the organization with ID or name `org`, or of the only organization the API key
+        can see when org is None.
+
+        :raises DiscoveryError: if there is no such organization, or several and no org was given.
+        """
+        orgs = await self.meraki_ops._call('organizations', 'getOrganizations')
+        if org is None:
+            if len(orgs) == 1:
+                return orgs[0]['id']
+            raise DiscoveryError("Several organizations found, select one with --org: " +
+                                 ", ".join(o['name'] for o in orgs))
+        for candidate in orgs:
+            if org in (candidate['id'], candidate['name']):
+                return candidate['id']
+        raise DiscoveryError(f"Organization '{org}' not found")
+
+    async def networks(self, org_id):
+        """Return the switch networks of org_id matching the tag and name filters."""
+        kwargs = {'productTypes': ['switch']}
+        if self.network_tags:
+            kwargs.update(tags=self.network_tags, tagsFilterType='withAnyTags')
+        networks = await self.meraki_ops._call_pages('getOrganizationNetworks',
+                                                     f"/organizations/{quote(str(org_id), safe='')}/networks",
+                                                     query_params(dict(kwargs, perPage=1000)))
+        return [network for network in networks if model_matches(network['name'], self.network_names)]
+
+    async def run(self, org_id):
+        """Discover the switches of org_id. Returns a summary of the run."""
+        started = time.perf_counter()
+        networks = {network['id']: network for network in await self.networks(org_id)}
+        filtered = bool(self.network_tags or self.network_names)
+
+        def add_switches(devices):
+            switches = [device for device in devices if device.get('networkId') in networks]
+            for device in switches:
+                self.switches.setdefault(device['networkId'], []).append(device)
+            if switches:
+                self.added += self.store.add_devices([device_row(device) for device in switches])
+
+        network_ids = list(networks) if filtered and len(networks) <= MAX_NETWORK_IDS else None
+        if networks:
+            await self.inventory.refresh(full=True, network_ids=network_ids, on_devices=add_switches)
+        return {
+            'networks': len(networks),
+            'networks_with_switches': len(self.switches),
+            'switches': sum(len(switches) for switches in self.switches.values()),
+            'added': self.added,
+            'seconds': round(time.perf_counter() - started, 2),
+        }
@@ -0,0 +1,71 @@
+import asyncio
+
+
+class PortDispatcher:
+    """
+    Keyed dispatcher that serializes work per switch port and coalesces bursts.
+
+    Events for the same key (deviceSerial, portNum) run one at a time and in order; different keys
+    run concurrently. While an event for a key is waiting (during the coalesce window or while an
+    earlier event for that port is still running) a newer event replaces it, so a
+    connect/disconnect/connect burst only runs the most recent state. Callers of superseded events
+    are resolved with the result of the event that replaced them.
+    """
+
+    def __init__(self, coalesce_window=0.0):
+        self.coalesce_window = coalesce_window
+        self._pending = {}     # key -> [factory, [waiter futures]]
+        self._runners = {}     # key -> runner task
+        self.submitted = 0
+        self.coalesced = 0
+        self.executed = 0
+
+    async def dispatch(self, key, factory):
+        """
+        Schedule factory() (a coroutine function) for key and wait until it, or a newer event for the
+        same key that superseded it, has run.
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        self.submitted += 1
+        pending = self._pending.get(key)
+        if pending is None:
+            self._pending[key] = [factory, [waiter]]
+        else:
+            self.coalesced += 1
+            pending[0] = factory
+            pending[1].append(waiter)
+        if key not in self._runners:
+            self._runners[key] = asyncio.create_task(self._run(key))
+        return await waiter
+
+    def in_flight(self):
+        """Number of ports with an event running or waiting."""
+        return len(self._runners)
+
+    async def _run(self, key):
+        waiters = []
+        try:
+            while key in self._pending:
+                if self.coalesce_window:
+                    await asyncio.sleep(self.coalesce_window)
+                factory, waiters = self._pending.pop(key)
+                self.executed += 1
+                try:
+                    result = await factory()
+                except Exception as e:
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_exception(e)
+                else:
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_result(result)
+        except BaseException:
+            # Cancelled (e.g. on shutdown): the callers of the running and the queued event must not wait forever
+            _, queued = self._pending.pop(key, (None, []))
+            for waiter in waiters + queued:
+                if not waiter.done():
+                    waiter.cancel()
+            raise
+        finally:
+            del self._runners[key]
@@ -0,0 +1,115 @@
+import glob
+import json
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from config import config
+from logrr import lm
+from metrics import WEBHOOKS, WEBHOOK_LATENCY
+
+# Stages timed for each webhook, in pipeline order
+STAGES = ("parse", "registry_lookup", "lldp_fetch", "boat_lookup", "ssid_update", "state_write")
+
+
+class WebhookEvent:
+    """
+    Structured record of one webhook: correlation id, serial/port/alert type, milliseconds spent in
+    each stage and the result. Written to the JSON-lines event log by finish().
+    """
+
+    __slots__ = ("correlation_id", "received_at", "serial", "port", "alert_type", "network_id",
+                 "stages", "result", "executed", "_started")
+
+    def __init__(self):
+        self.correlation_id = uuid.uuid4().hex
+        self.received_at = time.time()
+        self.serial = None
+        self.port = None
+        self.alert_type = None
+        self.network_id = None
+        self.stages = {}
+        self.result = None
+        self.executed = False   # False if the event was coalesced into a newer one for the same port
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block and add it to stage `name` (in milliseconds)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+    def to_dict(self):
+        return {
+            "correlation_id": self.correlation_id,
+            "received_at": self.received_at,
+            "serial": self.serial,
+            "port": self.port,
+            "alert_type": self.alert_type,
+            "network_id": self.network_id,
+            "stages_ms": {name: round(ms, 3) for name, ms in self.stages.items()},
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 3),
+            "coalesced": not self.executed and self.result not in ("unregistered", "ignored", "duplicate"),
+            "result": self.result,
+        }
+
+    def finish(self, result):
+        self.result = result
+        WEBHOOKS.inc(alert_type=self.alert_type or '', result=result)
+        WEBHOOK_LATENCY.observe(time.perf_counter() - self._started, alert_type=self.alert_type or '')
+        lm.log_event(self.to_dict())
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def read_events(path):
+    """Yield event records from path and its rotated backups (path.1, path.2, ...)."""
+    for file_path in sorted(glob.glob(f"{path}.*"), reverse=True) + [path]:
+        try:
+            with open(file_path) as file:
+                for line in file:
+                    line = line.strip()
+                    if line:
+                        yield json.loads(line)
+        except FileNotFoundError:
+            continue
+
+
+def summarize(path):
+    """Return {stage: {"count", "p50", "p95", "p99"}} over the event log, including "total"."""
+    samples = {}
+    for event in read_events(path):
+        for name, ms in event.get("stages_ms", {}).items():
+            samples.setdefault(name, []).append(ms)
+        samples.setdefault("total", []).append(event.get("total_ms", 0.0))
+    summary = {}
+    for name in [*STAGES, "total"]:
+        values = sorted(samples.get(name, []))
+        if values:
+            summary[name] = {"count": len(values), "p50": percentile(values, 50),
+                             "p95": percentile(values, 95), "p99": percentile(values, 99)}
+    return summary
+
+
+def print_summary(path):
+    from rich.table import Table
+    table = Table(title=f"Webhook stage latency (ms) - {path}")
+    for column in ("Stage", "Count", "p50", "p95", "p99"):
+        table.add_column(column, justify="left" if column == "Stage" else "right", style="bright_white")
+    for name, stats in summarize(path).items():
+        table.add_row(name, str(stats["count"]), f"{stats['p50']:.2f}", f"{stats['p95']:.2f}", f"{stats['p99']:.2f}")
+    lm.tsp(table)
+
+
+if __name__ == "__main__":
+    # python events.py [events.jsonl]
+    print_summary(sys.argv[1] if len(sys.argv) > 1 else config.EVENT_LOG_PATH)
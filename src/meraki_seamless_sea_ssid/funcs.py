@@ -1,9 +1,6 @@
 import csv
-from rich.console import Console
-from rich.panel import Panel
+import fnmatch
 from config import config
-import sys
-import json
 from logrr import lm
 
 
@@ -54,62 +51,71 @@ def save_devices_to_csv(serial_numbers, ms_list):
     lm.tsp(f"Devices saved to {csv_file_path}")
 
 
-def check_serial_in_csv(device_serial):
+def index_lldp_ports(response):
     """
-    Check if a given device serial number exists in the CSV file.
+    Index an LLDP/CDP response by port number.
 
-    :param csv_file_path: Path to the CSV file.
-    :param device_serial: The device serial number to search for.
-    :return: True if the serial number is found in the CSV, False otherwise.
+    :param response: The LLDP/CDP response data.
+    :return: Dict of port number (str) -> LLDP system name, for ports that report one.
     """
-    csv_file_path = config.CSV_DB
-    try:
-        with open(csv_file_path, mode="r", newline="") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if row["Serial Number"] == device_serial:
-                    return True
-    except FileNotFoundError:
-        print(f"CSV file not found at {csv_file_path}")
+    index = {}
+    for port_number, port_data in (response or {}).get("ports", {}).items():
+        system_name = (port_data.get("lldp") or {}).get("systemName")
+        if system_name:
+            index[str(port_number)] = system_name
+    return index
 
-    return False
+
+def response_items(response):
+    """
+    Return the list of records of a (paginated) organization-wide response, which is either a plain
+    list or a {"items": [...], "meta": {...}} object.
+    """
+    if isinstance(response, dict):
+        return response.get("items") or []
+    return response or []
 
 
-def update_csv_row(updated_rows, device_serial, switch_port_connected, system_name):
-    for row in updated_rows:
-        if row["Serial Number"] == device_serial:
-            row["switch_port_connected"] = switch_port_connected
-            row["SystemName"] = system_name
-            break
+def query_params(params):
+    """
+    Query parameters of a Dashboard API request, with list values sent as `name[]` like the SDK does,
+    e.g. {"networkIds": ["N_1"]} -> {"networkIds[]": ["N_1"]}.
+    """
+    return {f"{key}[]" if isinstance(value, (list, tuple)) else key: value for key, value in params.items()}
 
 
-def extract_system_name(response, port_number):
+def next_page_url(links, base_url):
     """
-    Extract the system name from the LLDP response for a specific port number.
+    Return the URL of the next page from the parsed Link header of a paginated response, or None on the
+    last page. A URL under base_url is made relative to it, since the SDK prefixes URLs of hosts other
+    than the Meraki domains with its base URL.
+    """
+    url = (links.get("next") or {}).get("url")
+    if url is None:
+        return None
+    url = str(url)
+    return url[len(base_url):] if url.startswith(base_url) else url
 
-    :param response: The LLDP/CDP response data.
-    :param port_number: The port number to extract the system name from.
-    :return: The system name if found, otherwise "N/A".
+
+def lldp_system_name(port):
+    """
+    Return the LLDP system name reported on a port record of an organization-wide switch port response,
+    or None. The LLDP data is either an object with "systemName" or a list of {"name", "value"} pairs.
     """
-    ports_data = response.get("ports", {})
-    port_data = ports_data.get(str(port_number))
+    lldp = port.get("lldp")
+    if isinstance(lldp, dict):
+        return lldp.get("systemName")
+    if isinstance(lldp, list):
+        for field in lldp:
+            if field.get("name") in ("systemName", "System name"):
+                return field.get("value")
+    return None
 
-    if port_data and "lldp" in port_data:
-        system_name = port_data["lldp"].get("systemName")
-        if system_name:
-            print(f"System name for port {port_number}: {system_name}")
-            return system_name
-    return "N/A"
-
-
-def check_boat_in_csv(boats_csv_path, system_name):
-    try:
-        with open(boats_csv_path, mode="r", newline="") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if row["SystemName"] == system_name:
-                    lm.tsp("System Name found in boats.csv", system_name)
-                    return row["ssid_number"], row["vlan"]
-    except FileNotFoundError:
-        print(f"Boats CSV file not found at {boats_csv_path}")
-    return None, None
+
+def model_matches(model, patterns):
+    """
+    Return True if a device model matches one of the shell-style patterns (e.g. "MS120*"), ignoring case.
+    An empty pattern list matches every model.
+    """
+    model = (model or "").upper()
+    return not patterns or any(fnmatch.fnmatchcase(model, pattern.upper()) for pattern in patterns)
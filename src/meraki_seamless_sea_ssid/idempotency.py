@@ -0,0 +1,60 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+
+def webhook_key(alert):
+    """
+    Idempotency key of a webhook (alerts.PortAlert): hash of alertId, occurredAt, deviceSerial and portNum.
+    Returns None for payloads without alertId/occurredAt (e.g. hand-made test payloads), which are never deduplicated.
+    """
+    fields = (alert.alert_id, alert.occurred_at, alert.device_serial, alert.port_number)
+    if fields[0] is None and fields[1] is None:
+        return None
+    return hashlib.sha1("|".join("" if field is None else str(field) for field in fields).encode()).hexdigest()
+
+
+class IdempotencyWindow:
+    """
+    Bounded, time-expiring set of webhook keys seen in the last `ttl` seconds, used to drop Meraki
+    re-deliveries of the same alert before any Dashboard call is made.
+
+    Keys are checked in memory first. When a `store` is given, new keys are also claimed in it
+    (StateStore.claim_event) so a retry delivered to another worker is dropped as well. The in-memory
+    set keeps at most `max_size` keys, evicting the oldest.
+    """
+
+    def __init__(self, ttl=300.0, max_size=10000, store=None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.store = store
+        self._seen = OrderedDict()     # key -> expiry (monotonic), in insertion (= expiry) order
+        self.duplicates = 0
+
+    def _expire(self, now):
+        while self._seen:
+            key, expires = next(iter(self._seen.items()))
+            if expires > now:
+                break
+            self._seen.popitem(last=False)
+
+    def is_duplicate(self, key):
+        """Return True (and count it) if key was seen within the window, otherwise record it."""
+        now = time.monotonic()
+        self._expire(now)
+        if key in self._seen or (self.store is not None and not self.store.claim_event(key, self.ttl)):
+            self.duplicates += 1
+            return True
+        self._seen[key] = now + self.ttl
+        if len(self._seen) > self.max_size:
+            self._seen.popitem(last=False)
+        return False
+
+    def forget(self, key):
+        """Remove key so a re-delivery is processed again (used when processing failed)."""
+        self._seen.pop(key, None)
+        if self.store is not None:
+            self.store.release_event(key)
+
+    def __len__(self):
+        return len(self._seen)
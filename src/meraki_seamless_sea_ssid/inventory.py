@@ -0,0 +1,172 @@
+import asyncio
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+from config import config
+from logrr import lm
+from funcs import model_matches, query_params
+
+_FAMILY_RE = re.compile(r'^([A-Z]+\d+)')
+_WILDCARDS = set('*?[')
+
+
+def model_family(model):
+    """Model family of a device model, e.g. MS120 for MS120-8FP. Models without that shape are their own family."""
+    model = (model or '').upper()
+    match = _FAMILY_RE.match(model)
+    return match.group(1) if match else model
+
+
+def model_query(patterns):
+    """
+    getOrganizationDevices parameters that narrow the result to the model patterns on the Dashboard side:
+    `models` (exact matches) when no pattern has a wildcard, `model` (substring) for a single "PREFIX*".
+    Results are always matched against the patterns locally as well.
+    """
+    if patterns and not any(_WILDCARDS & set(pattern) for pattern in patterns):
+        return {'models': list(patterns)}
+    if len(patterns) == 1 and patterns[0].endswith('*') and not _WILDCARDS & set(patterns[0][:-1]):
+        return {'model': patterns[0][:-1]}
+    return {}
+
+
+class SwitchInventory:
+    """
+    In-memory index of the organization's switches, indexed by serial, network and model family.
+
+    A full refresh reads every switch of the organization with one paginated getOrganizationDevices query
+    (productTypes=switch plus the model filter of model_query()) and replaces the index. An incremental
+    refresh only asks for devices whose configuration changed since the previous refresh started
+    (configurationUpdatedAfter) and updates their entries; switches removed from the organization are
+    dropped at the next full refresh.
+    """
+
+    CLOCK_SKEW = timedelta(minutes=1)   # Overlap between incremental refreshes
+
+    def __init__(self, meraki_ops, model_patterns=None, per_page=1000):
+        self.meraki_ops = meraki_ops
+        self.model_patterns = list(config.SWITCH_MODEL_PATTERNS if model_patterns is None else model_patterns)
+        self.per_page = per_page
+        self.by_serial = {}
+        self.by_network = {}    # network id -> set of serials
+        self.by_family = {}     # model family -> set of serials
+        self._updated_after = None
+        self._last_full = 0.0
+        self._task = None
+        self.refreshes = 0
+
+    def __len__(self):
+        return len(self.by_serial)
+
+    def __contains__(self, serial):
+        return serial in self.by_serial
+
+    def get(self, serial):
+        return self.by_serial.get(serial)
+
+    def network_of(self, serial):
+        device = self.by_serial.get(serial)
+        return device.get('networkId') if device else None
+
+    def switches(self, network_id=None, family=None):
+        """Devices in network_id and/or of a model family (all switches if neither is given)."""
+        serials = set(self.by_serial) if network_id is None else set(self.by_network.get(network_id, ()))
+        if family is not None:
+            serials &= self.by_family.get(family.upper(), set())
+        return [self.by_serial[serial] for serial in sorted(serials)]
+
+    def stats(self):
+        return {'switches': len(self.by_serial), 'networks': len(self.by_network),
+                'families': {family: len(serials) for family, serials in sorted(self.by_family.items())},
+                'refreshes': self.refreshes}
+
+    def _add(self, device):
+        serial = device['serial']
+        self._remove(serial)     # The switch may have moved to another network
+        self.by_serial[serial] = device
+        self.by_network.setdefault(device.get('networkId'), set()).add(serial)
+        self.by_family.setdefault(model_family(device.get('model')), set()).add(serial)
+
+    def _remove(self, serial):
+        device = self.by_serial.pop(serial, None)
+        if device is None:
+            return
+        for index, key in ((self.by_network, device.get('networkId')),
+                           (self.by_family, model_family(device.get('model')))):
+            index[key].discard(serial)
+            if not index[key]:
+                del index[key]
+
+    async def refresh(self, full=False, network_ids=None, on_devices=None):
+        """
+        Refresh the index; incremental unless full=True or there was no refresh yet. network_ids limits the
+        query to those networks, and on_devices is called with the matching switches of every page as it
+        arrives. Returns {"full", "switches", "changed"}.
+        """
+        started = datetime.now(timezone.utc)
+        full = full or self._updated_after is None
+        kwargs = {'productTypes': ['switch'], **model_query(self.model_patterns)}
+        if network_ids is not None:
+            kwargs['networkIds'] = list(network_ids)
+        if not full:
+            kwargs['configurationUpdatedAfter'] = self._updated_after
+
+        changed = []
+
+        def add_page(devices):
+            matching = [device for device in devices if model_matches(device.get('model'), self.model_patterns)]
+            changed.extend(matching)
+            if on_devices is not None and matching:
+                on_devices(matching)
+
+        await self.meraki_ops._call_pages('getOrganizationDevices',
+                                          f"/organizations/{quote(str(self.meraki_ops.org_id), safe='')}/devices",
+                                          query_params(dict(kwargs, perPage=self.per_page)), on_page=add_page)
+        if full:
+            self.by_serial, self.by_network, self.by_family = {}, {}, {}
+            self._last_full = time.monotonic()
+        for device in changed:
+            self._add(device)
+        self._updated_after = (started - self.CLOCK_SKEW).isoformat(timespec='seconds').replace('+00:00', 'Z')
+        self.refreshes += 1
+        return {'full': full, 'switches': len(self.by_serial), 'changed': len(changed)}
+
+    def snapshot(self):
+        """The indexed switches and refresh position for a warm start, or None before the first refresh."""
+        if self._updated_after is None:
+            return None
+        return {'devices': list(self.by_serial.values()), 'updated_after': self._updated_after,
+                'full_age': time.monotonic() - self._last_full}
+
+    def restore(self, snapshot, age=0.0):
+        """
+        Load a snapshot() taken `age` seconds ago. The next refresh is then incremental from where the
+        snapshot left off, and full only when the snapshot's last full refresh is older than full_interval.
+        """
+        self.by_serial, self.by_network, self.by_family = {}, {}, {}
+        for device in snapshot['devices']:
+            self._add(device)
+        self._updated_after = snapshot['updated_after']
+        self._last_full = time.monotonic() - snapshot['full_age'] - age
+        return True
+
+    def start(self, interval, full_interval):
+        """Refresh now and then every `interval` seconds in the background, fully every `full_interval`."""
+        self._task = asyncio.create_task(self._run(interval, full_interval))
+
+    async def _run(self, interval, full_interval):
+        while True:
+            try:
+                full = time.monotonic() - self._last_full >= full_interval
+                summary = await self.refresh(full=full)
+                lm.lnp(f"Switch inventory refreshed: {summary}")
+            except Exception as e:  # Retried at the next interval; the index keeps its previous contents
+                lm.tsp(f"[red]Switch inventory refresh failed: {e}[/red]")
+            await asyncio.sleep(interval)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,235 @@
+import asyncio
+import fcntl
+import json
+import os
+import sys
+import time
+from logrr import lm
+from metrics import JOURNAL_FSYNC_DURATION
+
+try:
+    import orjson
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:  # orjson is optional
+    _loads = json.loads
+
+    def _dumps(record):
+        return json.dumps(record, separators=(",", ":")).encode()
+
+
+class EventJournal:
+    """
+    Append-only journal of received webhooks and the actions taken, one JSON object per line:
+
+        {"ts": ..., "type": "webhook", "payload": {...}}
+        {"ts": ..., "type": "ssid", "network_id": ..., "ssid_number": ..., "payload": {...}, "result": ...}
+        {"ts": ..., "type": "state", "serial": ..., "switch_port_connected": ..., "SystemName": ...}
+
+    Records are buffered and written by one flusher task; everything appended while an fsync is running
+    goes out with the next write and fsync (group commit), so concurrent events share the fsync cost.
+    commit() waits until its record is on disk, which is used to write state changes ahead of the store.
+
+    compact() folds the journal into a snapshot of the device and SSID state (`<path>.snapshot`), moves the
+    journal contents to `<path>.1` (older ones to .2 ... .`backups`) and truncates it. Appends from other
+    worker processes hold a shared flock on the journal, compaction an exclusive one.
+    """
+
+    def __init__(self, path, backups=3):
+        self.path = path
+        self.snapshot_path = f"{path}.snapshot"
+        self.backups = backups
+        self._fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        self._pending = []  # Encoded lines not written yet
+        self._waiters = []  # Futures of commit() calls, resolved once the pending lines are fsynced
+        self._flusher = None
+        self._compactor = None
+        self.records = 0
+        self.fsyncs = 0
+        self._terminate_torn_line()
+
+    def _terminate_torn_line(self):
+        """After a crash in the middle of a write, end the partial line so the next record is not lost with it."""
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            size = os.fstat(self._fd).st_size
+            if size and os.pread(self._fd, 1, size - 1) != b"\n":
+                os.write(self._fd, b"\n")
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def append(self, record):
+        """Queue a record for the next group write; returns without waiting for the disk."""
+        self._pending.append(_dumps({"ts": time.time(), **record}) + b"\n")
+        self.records += 1
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:    # Outside the event loop (CLI), write through
+            self._write(self._take_pending())
+            return
+        if self._flusher is None or self._flusher.done():
+            self._flusher = loop.create_task(self._flush_loop())
+
+    async def commit(self, record):
+        """Append a record and wait until it (and everything queued before it) is fsynced."""
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.append(record)
+        await waiter
+
+    def _take_pending(self):
+        data, self._pending = b"".join(self._pending), []
+        return data
+
+    def _write(self, data):
+        started = time.perf_counter()
+        fcntl.flock(self._fd, fcntl.LOCK_SH)
+        try:
+            os.write(self._fd, data)
+            os.fsync(self._fd)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self.fsyncs += 1
+        JOURNAL_FSYNC_DURATION.observe(time.perf_counter() - started)
+
+    async def _flush_loop(self):
+        while self._pending:
+            data, waiters, self._waiters = self._take_pending(), self._waiters, []
+            try:
+                await asyncio.to_thread(self._write, data)
+            except Exception as e:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                continue
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    async def flush(self):
+        """Wait until every appended record is on disk."""
+        if self._pending:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            if self._flusher is None or self._flusher.done():
+                self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+            await waiter
+        elif self._flusher is not None:
+            await asyncio.gather(self._flusher, return_exceptions=True)
+
+    # State rebuilt from the snapshot and the journal
+
+    @staticmethod
+    def empty_state():
+        return {"devices": {}, "ssids": {}, "records": 0}
+
+    @staticmethod
+    def apply(state, record):
+        """Fold one journal record into state (see empty_state())."""
+        kind = record.get("type")
+        if kind == "state":
+            state["devices"][record["serial"]] = {"switch_port_connected": record["switch_port_connected"],
+                                                  "SystemName": record["SystemName"], "ts": record.get("ts", 0)}
+        elif kind == "ssid":
+            key = f"{record['network_id']}|{record['ssid_number']}"
+            if record.get("result") == "applied":
+                state["ssids"][key] = {**state["ssids"].get(key, {}), **record["payload"]}
+            else:
+                state["ssids"].pop(key, None)   # Unknown after a failed update
+        state["records"] += 1
+
+    @staticmethod
+    def read_records(path):
+        """Yield the records of a journal file. A torn last line (crash during a write) is skipped."""
+        try:
+            with open(path, "rb") as file:
+                for line in file:
+                    try:
+                        yield _loads(line)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            return
+
+    def _read_snapshot(self):
+        try:
+            with open(self.snapshot_path, "rb") as file:
+                return _loads(file.read())
+        except FileNotFoundError:
+            return self.empty_state()
+
+    def load(self):
+        """Return the state recorded by the snapshot plus the journal tail written after it."""
+        state = self._read_snapshot()
+        for record in self.read_records(self.path):
+            self.apply(state, record)
+        return state
+
+    def compact(self):
+        """Fold the journal into the snapshot and truncate it. Blocking; run it in a thread from the loop."""
+        fd = os.open(self.path, os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size == 0:
+                return False
+            state = self.load()
+            temp_path = f"{self.snapshot_path}.tmp"
+            with open(temp_path, "wb") as file:
+                file.write(_dumps(state))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.snapshot_path)
+            self._archive()
+            os.ftruncate(fd, 0)
+            os.fsync(fd)
+            return True
+        finally:
+            os.close(fd)    # Releases the lock
+
+    def _archive(self):
+        if self.backups < 1:
+            return
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        with open(self.path, "rb") as source, open(f"{self.path}.1", "wb") as target:
+            while chunk := source.read(1024 * 1024):
+                target.write(chunk)
+
+    # Scheduled compaction
+
+    def start(self, compact_interval):
+        if compact_interval > 0:
+            self._compactor = asyncio.create_task(self._compact_loop(compact_interval))
+
+    async def _compact_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+                if await asyncio.to_thread(self.compact):
+                    lm.lnp(f"Journal compacted into {self.snapshot_path}")
+            except Exception as e:  # Retried at the next interval; the journal keeps growing meanwhile
+                lm.tsp(f"[red]Journal compaction failed: {e}[/red]")
+
+    async def close(self):
+        if self._compactor is not None:
+            self._compactor.cancel()
+            await asyncio.gather(self._compactor, return_exceptions=True)
+        await self.flush()
+        os.close(self._fd)
+
+
+if __name__ == "__main__":
+    # python journal.py state|compact [journal_path]
+    from config import config
+    if len(sys.argv) < 2 or sys.argv[1] not in ('state', 'compact'):
+        print("Usage: python journal.py state|compact [journal_path]")
+        sys.exit(1)
+    journal = EventJournal(sys.argv[2] if len(sys.argv) > 2 else config.JOURNAL_PATH,
+                           backups=config.JOURNAL_BACKUPS)
+    if sys.argv[1] == 'compact':
+        print("Compacted" if journal.compact() else "Nothing to compact")
+    else:
+        print(json.dumps(journal.load(), indent=2))
+    asyncio.run(journal.close())
@@ -0,0 +1,104 @@
+import asyncio
+import time
+from funcs import index_lldp_ports
+
+
+class LldpCache:
+    """
+    Per-serial TTL cache of getDeviceLldpCdp responses, indexed by port number.
+
+    Concurrent lookups for the same switch share a single in-flight fetch. A lookup for a port that
+    the cached entry has no system name for (e.g. the boat was plugged in after the fetch) refetches,
+    so a fresh port_connected is never answered from data that predates it. Port events invalidate their
+    port (see invalidate()), so a boat swapped within the TTL is not answered with the previous boat.
+    """
+
+    def __init__(self, fetch, ttl=5.0):
+        self.fetch = fetch    # coroutine function: serial -> getDeviceLldpCdp response
+        self.ttl = ttl
+        self._entries = {}    # serial -> (expires_at, {port: system_name})
+        self._inflight = {}   # serial -> fetch task
+        self._stale = {}      # serial -> ports invalidated while its fetch is in flight
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.fetch_seconds = 0.0
+        self.fetch_seconds_max = 0.0
+
+    def _cached(self, device_serial):
+        entry = self._entries.get(device_serial)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    async def _fetch(self, device_serial):
+        started = time.perf_counter()
+        self._stale.pop(device_serial, None)
+        try:
+            response = await self.fetch(device_serial)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.fetches += 1
+            self.fetch_seconds += elapsed
+            self.fetch_seconds_max = max(self.fetch_seconds_max, elapsed)
+        ports = index_lldp_ports(response)
+        stale = self._stale.pop(device_serial, set())
+        for port in stale:
+            ports.pop(port, None)   # Invalidated after the fetch was sent
+        self._entries[device_serial] = (time.monotonic() + self.ttl, ports)
+        return ports, stale
+
+    def _fetch_shared(self, device_serial):
+        """Return the in-flight fetch for device_serial, starting one if needed."""
+        task = self._inflight.get(device_serial)
+        if task is None:
+            task = asyncio.create_task(self._fetch(device_serial))
+            self._inflight[device_serial] = task
+            task.add_done_callback(lambda t: self._inflight.pop(device_serial, None))
+        return task
+
+    def prefetch(self, device_serial, port_number=None):
+        """
+        Start fetching device_serial in the background unless it is cached (with port_number, if given) or
+        already being fetched.
+        """
+        ports = self._cached(device_serial)
+        if ports is None or (port_number is not None and str(port_number) not in ports):
+            task = self._fetch_shared(device_serial)
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def get_system_name(self, device_serial, port_number):
+        """
+        Return the LLDP system name seen on port_number of device_serial, or "N/A".
+        """
+        ports = self._cached(device_serial)
+        if ports is not None and str(port_number) in ports:
+            self.hits += 1
+            return ports[str(port_number)]
+        self.misses += 1
+        ports, stale = await asyncio.shield(self._fetch_shared(device_serial))
+        if str(port_number) in stale:
+            ports, _ = await asyncio.shield(self._fetch_shared(device_serial))
+        return ports.get(str(port_number), "N/A")
+
+    def invalidate(self, device_serial, port_number):
+        """
+        Forget the system name of port_number of device_serial, on a port event: another boat may be docked
+        there now. A fetch of the switch already in flight does not bring it back either.
+        """
+        ports = self._cached(device_serial)
+        if ports is not None:
+            ports.pop(str(port_number), None)
+        if device_serial in self._inflight:
+            self._stale.setdefault(device_serial, set()).add(str(port_number))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "fetches": self.fetches,
+            "fetch_avg_seconds": self.fetch_seconds / self.fetches if self.fetches else 0.0,
+            "fetch_max_seconds": self.fetch_seconds_max,
+        }
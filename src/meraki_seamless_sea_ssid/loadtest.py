@@ -0,0 +1,614 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import pathlib
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import aiohttp
+from rich.console import Console
+from rich.table import Table
+from mock_dashboard import MOCK_MODEL, MOCK_NETWORK_ID, MOCK_ORG_ID, add_mock_arguments, mock_network_id, \
+    synthetic_boat, synthetic_serial
+
+MODULE_DIR = pathlib.Path(__file__).parent
+RESULTS_PATH = MODULE_DIR.parents[1] / "bench" / "results.jsonl"
+STARTUP_RESULTS_PATH = MODULE_DIR.parents[1] / "bench" / "startup.jsonl"
+
+console = Console()
+
+
+def write_fixtures(workdir, switches, ports):
+    """Write the synthetic device list and boats.csv (one boat per switch port) used by the app under test."""
+    devices_csv = workdir / "ms_120_device_list.csv"
+    boats_csv = workdir / "boats.csv"
+    with open(devices_csv, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Serial Number", "Model", "switch_port_connected", "SystemName"])
+        for index in range(switches):
+            writer.writerow([synthetic_serial(index), MOCK_MODEL, "False", "N/A"])
+    with open(boats_csv, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["SystemName", "ssid_number", "vlan"])
+        for index in range(switches):
+            for port in range(1, ports + 1):
+                boat = index * ports + port - 1
+                writer.writerow([synthetic_boat(index, port), boat, 1000 + boat])
+    return devices_csv, boats_csv
+
+
+NOISE_ALERT_TYPES = ("settings_changed", "power_supply_down", "udld_error", "new_dhcp_server", "uplink_flapping")
+
+
+def webhook_payload(serial, port, alert_type_id, network_id=MOCK_NETWORK_ID):
+    """A webhook as sent by the Dashboard (port_connected/port_disconnected or one of NOISE_ALERT_TYPES)."""
+    now = time.strftime("%Y-%m-%dT%H:%M:%S.000000Z", time.gmtime())
+    return {
+        "version": "0.1",
+        "sharedSecret": "",
+        "sentAt": now,
+        "organizationId": MOCK_ORG_ID,
+        "organizationName": "Mock organization",
+        "networkId": network_id,
+        "networkName": "Mock network",
+        "deviceSerial": serial,
+        "deviceMac": "00:18:0a:00:00:00",
+        "deviceName": f"mock-switch-{serial}",
+        "deviceModel": MOCK_MODEL,
+        "alertId": f"{random.getrandbits(63)}",
+        "alertType": alert_type_id.replace("_", " ").capitalize(),
+        "alertTypeId": alert_type_id,
+        "alertLevel": "informational",
+        "occurredAt": now,
+        "alertData": {"portNum": port, "description": "", "portDescription": ""},
+    }
+
+
+class TrafficGenerator:
+    """
+    Open-loop webhook generator: sends `rate` webhooks per second for `duration` seconds, picking a random
+    switch port for each one and alternating port_connected/port_disconnected per port like a boat docking
+    and leaving. Latency is measured from the scheduled send time, so a slow server is not hidden by the
+    generator backing off. At most `concurrency` requests are outstanding. A fraction `noise` of the
+    webhooks are unrelated alerts (see NOISE_ALERT_TYPES). Switches are spread over `networks` networks
+    like on the mock Dashboard.
+    """
+
+    def __init__(self, url, rate, duration, switches, ports, concurrency=200, noise=0.0, seed=None, networks=1):
+        self.url = url
+        self.rate = rate
+        self.duration = duration
+        self.switches = switches
+        self.ports = ports
+        self.concurrency = concurrency
+        self.noise = noise
+        self.networks = max(1, networks)
+        self.random = random.Random(seed)
+        self.connected = set()
+        self.latencies = []
+        self.statuses = {}
+
+    def next_event(self):
+        index, port = self.random.randrange(self.switches), self.random.randint(1, self.ports)
+        serial, network_id = synthetic_serial(index), mock_network_id(index % self.networks)
+        if self.random.random() < self.noise:
+            return webhook_payload(serial, port, self.random.choice(NOISE_ALERT_TYPES), network_id)
+        key = (index, port)
+        if key in self.connected:
+            self.connected.discard(key)
+            return webhook_payload(serial, port, "port_disconnected", network_id)
+        self.connected.add(key)
+        return webhook_payload(serial, port, "port_connected", network_id)
+
+    async def _send(self, session, semaphore, scheduled, payload):
+        async with semaphore:
+            try:
+                async with session.post(self.url, json=payload) as response:
+                    await response.read()
+                    status = str(response.status)
+            except aiohttp.ClientError as e:
+                status = type(e).__name__
+        self.latencies.append(time.perf_counter() - scheduled)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    async def run(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        total = int(self.rate * self.duration)
+        tasks = []
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=120)) as session:
+            started = time.perf_counter()
+            for sent in range(total):
+                scheduled = started + sent / self.rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(self._send(session, semaphore, scheduled, self.next_event())))
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - started
+        return total, elapsed
+
+
+def _start(args, workdir, log_name, env=None):
+    log_file = open(workdir / log_name, "w")
+    return subprocess.Popen(args, cwd=workdir, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+
+async def _wait_until_up(url, timeout=30.0, poll_interval=0.2):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(poll_interval)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+async def _get_json(url):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as response:
+            return await response.json()
+
+
+async def _wait_until_idle(metrics_url, timeout):
+    """
+    Wait until the app reports no queued or in-flight events (queue mode acknowledges before processing) and
+    no SSID changes pending after a Dashboard outage.
+    """
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            async with session.get(metrics_url) as response:
+                text = await response.text()
+            busy = [line for line in text.splitlines()
+                    if line.startswith(("sea_ssid_events_queued", "sea_ssid_events_in_flight",
+                                        "sea_ssid_pending_actions"))
+                    and float(line.rsplit(" ", 1)[1]) > 0]
+            if not busy:
+                return
+            await asyncio.sleep(0.2)
+
+
+async def simulate_outage(mock_url, outage):
+    """Take the mock Dashboard down for an --outage of "START:LENGTH[:MODE]" seconds into the run."""
+    start, length, mode = (outage.split(":") + ["error"])[:3]
+    await asyncio.sleep(float(start))
+    async with aiohttp.ClientSession() as session:
+        await session.post(f"{mock_url}/_mock/outage", params={"mode": mode})
+        console.print(f"Mock Dashboard down ({mode}) for {float(length):.0f}s")
+        await asyncio.sleep(float(length))
+        await session.post(f"{mock_url}/_mock/outage", params={"mode": "off"})
+        console.print("Mock Dashboard back")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=MODULE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def app_events(app_env):
+    """
+    The app's events module, for its percentile() and event log summary. The app reads its settings on import,
+    so those of the app under test are applied to this process first.
+    """
+    os.environ.update(app_env)
+    import events
+    return events
+
+
+def app_environment(workdir, mock_url, devices_csv, boats_csv, networks=1):
+    """Settings of the app under test, pointed at the mock Dashboard and the fixtures in workdir."""
+    return {
+        "MERAKI_NETWORK_IDS": json.dumps([mock_network_id(index) for index in range(1, networks)]),
+        "MERAKI_API_KEY": "mock-api-key",
+        "MERAKI_BASE_URL": f"{mock_url}/api/v1/",
+        "MERAKI_NETWORK_ID": MOCK_NETWORK_ID,
+        "MERAKI_ORG_ID": MOCK_ORG_ID,
+        "PSK": "mock-psk-12345",
+        "MERAKI_SSID_NAME": "Mock SSID",
+        "BOATS_CSV": str(boats_csv),
+        "CSV_DB": str(devices_csv),
+        "STATE_DB": str(workdir / "state.db"),
+        "JOURNAL_PATH": str(workdir / "journal.jsonl"),
+        "WARM_START_PATH": str(workdir / "cache.snapshot"),
+        "PENDING_ACTIONS_PATH": str(workdir / "pending_actions.json"),
+        "EVENT_LOG_PATH": str(workdir / "events.jsonl"),
+        "EVENT_LOG_MAX_BYTES": str(1024 ** 3),
+    }
+
+
+def start_mock(args, workdir):
+    return _start([sys.executable, str(MODULE_DIR / "mock_dashboard.py"), "--port", str(args.mock_port),
+                   "--switches", str(args.switches), "--ports", str(args.ports),
+                   "--latency", str(args.latency), "--jitter", str(args.jitter), "--rate-429", str(args.rate_429),
+                   "--error-rate", str(args.error_rate), "--rate-limit", str(args.rate_limit),
+                   "--docked", str(args.docked), "--networks", str(args.networks)],
+                  workdir, "mock.log")
+
+
+async def run_benchmark(args):
+    workdir = pathlib.Path(tempfile.mkdtemp(prefix="sea-ssid-loadtest-"))
+    devices_csv, boats_csv = write_fixtures(workdir, args.switches, args.ports)
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+
+    app_env = app_environment(workdir, mock_url, devices_csv, boats_csv, args.networks)
+    if args.workers > 1:
+        app_env.update(APP_WORKERS=str(args.workers), STATE_BACKEND="sqlite")
+    overrides = dict(setting.partition("=")[::2] for setting in args.set)
+    app_env.update(overrides)
+
+    mock = start_mock(args, workdir)
+    app = None
+    try:
+        await _wait_until_up(f"{mock_url}/_mock/stats")
+        app = _start([sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(MODULE_DIR),
+                      "--port", str(args.app_port), "--workers", str(args.workers), "--log-level", "warning"],
+                     workdir, "app.log", env={**os.environ, **app_env})
+        await _wait_until_up(f"{app_url}/metrics")
+        async with aiohttp.ClientSession() as session:
+            await session.post(f"{mock_url}/_mock/reset")
+
+        console.print(f"Sending {int(args.rate * args.duration)} webhooks at {args.rate}/s "
+                      f"to {args.switches} switches x {args.ports} ports (workdir {workdir})")
+        generator = TrafficGenerator(f"{app_url}/webhook", args.rate, args.duration, args.switches, args.ports,
+                                     concurrency=args.concurrency, noise=args.noise, seed=args.seed,
+                                     networks=args.networks)
+        started = time.perf_counter()
+        outage = asyncio.create_task(simulate_outage(mock_url, args.outage)) if args.outage else None
+        sent, elapsed = await generator.run()
+        if outage is not None:
+            await outage
+        await _wait_until_idle(f"{app_url}/metrics", timeout=args.drain_timeout)
+        processing_elapsed = time.perf_counter() - started
+        dashboard = await _get_json(f"{mock_url}/_mock/stats")
+    finally:
+        for process in (app, mock):
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=60)
+
+    events = app_events(app_env)
+    latencies = sorted(generator.latencies)
+    stages = events.summarize(str(workdir / "events.jsonl"))
+    processed = stages.get("total", {}).get("count", 0)
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "label": args.label,
+        "commit": git_commit(),
+        "params": {"rate": args.rate, "duration": args.duration, "switches": args.switches, "ports": args.ports,
+                   "workers": args.workers, "concurrency": args.concurrency, "noise": args.noise, "latency": args.latency, "jitter": args.jitter,
+                   "rate_429": args.rate_429, "error_rate": args.error_rate, "rate_limit": args.rate_limit,
+                   "docked": args.docked, "networks": args.networks, "outage": args.outage},
+        "app_settings": overrides,
+        "sent": sent,
+        "statuses": generator.statuses,
+        "processed": processed,
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "processed_per_second": round(processed / processing_elapsed, 2) if processing_elapsed else 0.0,
+        "response_ms": {f"p{pct}": round(events.percentile(latencies, pct) * 1000, 2) for pct in (50, 95, 99)},
+        "stages_ms": stages,
+        "results": event_results(events, workdir / "events.jsonl"),
+        "dashboard_calls": dashboard["calls"],
+        "api_calls_per_event": round(dashboard["total_calls"] / sent, 3) if sent else 0.0,
+        "dashboard_429": dashboard["injected_429"] + dashboard["rate_limited"],
+        "dashboard_errors": dashboard["injected_errors"],
+        "dashboard_outage_rejected": dashboard["outage_rejected"],
+        "workdir": str(workdir),
+    }
+
+
+def measure_import(module, env):
+    """Seconds to import `module` of the app in a fresh interpreter."""
+    code = (f"import sys, time; sys.path.insert(0, {str(MODULE_DIR)!r}); started = time.perf_counter(); "
+            f"import {module}; print(time.perf_counter() - started)")
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+async def run_startup(args):
+    """
+    Time-to-first-request: start the app `--runs` times against the mock Dashboard and time each start from
+    spawning the process until /metrics answers, until a first port_connected webhook is answered and until
+    /ready reports warm caches. Every run but the first starts from the cache snapshot of the previous one,
+    unless --cold removes it. The import time of main is measured separately in a fresh interpreter.
+    """
+    workdir = pathlib.Path(tempfile.mkdtemp(prefix="sea-ssid-startup-"))
+    devices_csv, boats_csv = write_fixtures(workdir, args.switches, args.ports)
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    app_env = app_environment(workdir, mock_url, devices_csv, boats_csv, args.networks)
+    app_env.update(RECONCILE_INTERVAL="0", INVENTORY_REFRESH_INTERVAL="0")
+    overrides = dict(setting.partition("=")[::2] for setting in args.set)
+    app_env.update(overrides)
+    env = {**os.environ, **app_env}
+
+    imports, ready, first_webhook, warm = [], [], [], []
+    mock = start_mock(args, workdir)
+    try:
+        await _wait_until_up(f"{mock_url}/_mock/stats")
+        for run in range(args.runs):
+            if args.cold:
+                pathlib.Path(app_env["WARM_START_PATH"]).unlink(missing_ok=True)
+            imports.append(measure_import("main", env))
+            started = time.perf_counter()
+            app = _start([sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(MODULE_DIR),
+                          "--port", str(args.app_port), "--log-level", "warning"],
+                         workdir, f"app-{run}.log", env=env)
+            try:
+                await _wait_until_up(f"{app_url}/metrics", poll_interval=0.005)
+                ready.append(time.perf_counter() - started)
+                async with aiohttp.ClientSession() as session:
+                    async with session.post(f"{app_url}/webhook",
+                                            json=webhook_payload(synthetic_serial(0), 1, "port_connected")) as response:
+                        await response.read()
+                first_webhook.append(time.perf_counter() - started)
+                await _wait_until_up(f"{app_url}/ready", poll_interval=0.005)
+                warm.append(time.perf_counter() - started)
+            finally:
+                app.terminate()
+                app.wait(timeout=60)
+    finally:
+        mock.terminate()
+        mock.wait(timeout=60)
+
+    percentile = app_events(app_env).percentile
+
+    def stats(values):
+        values = sorted(values)
+        return {"min": round(values[0] * 1000, 1), "p50": round(percentile(values, 50) * 1000, 1),
+                "max": round(values[-1] * 1000, 1)}
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "label": args.label,
+        "commit": git_commit(),
+        "runs": args.runs,
+        "app_settings": overrides,
+        "import_main_ms": stats(imports),
+        "ready_ms": stats(ready),
+        "first_webhook_ms": stats(first_webhook),
+        "warm_ms": stats(warm),
+        "cold": args.cold,
+        "workdir": str(workdir),
+    }
+
+
+def print_startup_result(result):
+    table = Table(title=" ".join(filter(None, ("Startup", result["label"], f"({result['commit'] or 'no commit'})"))))
+    for column in ("Measure", "min ms", "p50 ms", "max ms"):
+        table.add_column(column, justify="left" if column == "Measure" else "right", style="bright_white")
+    for name, key in (("import main", "import_main_ms"), ("first request (/metrics)", "ready_ms"),
+                      ("first webhook answered", "first_webhook_ms"), ("caches warm (/ready)", "warm_ms")):
+        stats = result[key]
+        table.add_row(name, f"{stats['min']:.1f}", f"{stats['p50']:.1f}", f"{stats['max']:.1f}")
+    console.print(table)
+
+
+def read_webhooks(paths):
+    """
+    Webhook payloads to replay: the "webhook" records of event journals (journal.py), and files with one
+    webhook per line, either the payload itself or a request record with the payload in "body".
+    """
+    for path in paths:
+        with open(path, "rb") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(record, dict):
+                    continue
+                if "type" in record:
+                    if record["type"] == "webhook":
+                        yield record["payload"]
+                    continue
+                body = record.get("body", record)
+                if isinstance(body, str):
+                    try:
+                        body = json.loads(body)
+                    except ValueError:
+                        continue
+                if isinstance(body, dict) and "alertTypeId" in body:
+                    yield body
+
+
+def event_results(events, events_path):
+    results = {}
+    for event in events.read_events(str(events_path)):
+        results[event.get("result")] = results.get(event.get("result"), 0) + 1
+    return results
+
+
+async def run_replay(args):
+    """
+    Feed recorded webhooks through handle_webhook() in this process, against the mock Dashboard, as fast as
+    `concurrency` allows. Serials must exist on the mock (e.g. a journal recorded during a load test).
+    """
+    payloads = list(read_webhooks(args.paths))
+    workdir = pathlib.Path(tempfile.mkdtemp(prefix="sea-ssid-replay-"))
+    devices_csv, boats_csv = write_fixtures(workdir, args.switches, args.ports)
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    app_env = app_environment(workdir, mock_url, devices_csv, boats_csv, args.networks)
+    app_env.update(JOURNAL_ENABLED="false", RECONCILE_INTERVAL="0", LOGGER_LEVEL="WARNING")
+    overrides = dict(setting.partition("=")[::2] for setting in args.set)
+    app_env.update(overrides)
+    os.environ.update(app_env)
+    os.chdir(workdir)   # The app writes logs/ relative to the working directory
+
+    mock = start_mock(args, workdir)
+    try:
+        await _wait_until_up(f"{mock_url}/_mock/stats")
+        from meraki_funcs import create_meraki_ops     # Reads the settings above on import
+        meraki_ops = create_meraki_ops()
+        await meraki_ops.open()
+        await asyncio.gather(*(meraki_ops.seed_ssid_cache(shard.network_id) for shard in meraki_ops.shards))
+        async with aiohttp.ClientSession() as session:
+            await session.post(f"{mock_url}/_mock/reset")
+
+        console.print(f"Replaying {len(payloads)} webhooks (workdir {workdir})")
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def replay(payload):
+            async with semaphore:
+                await meraki_ops.handle_webhook(payload)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(replay(payload) for payload in payloads))
+        await meraki_ops.shards.flush_batches()
+        elapsed = time.perf_counter() - started
+        await meraki_ops.close()
+        dashboard = await _get_json(f"{mock_url}/_mock/stats")
+    finally:
+        mock.terminate()
+        mock.wait(timeout=60)
+
+    events = app_events(app_env)
+    table = Table(title=" ".join(filter(None, ("Replay", args.label))))
+    table.add_column("Metric", style="bright_white")
+    table.add_column("Value", justify="right", style="bright_white")
+    table.add_row("Webhooks replayed", str(len(payloads)))
+    table.add_row("Elapsed (s)", f"{elapsed:.2f}")
+    table.add_row("Webhooks/s", f"{len(payloads) / elapsed:.1f}" if elapsed else "-")
+    table.add_row("Results", ", ".join(f"{k}: {v}" for k, v in sorted(event_results(events, workdir / "events.jsonl").items())))
+    for name, stats in events.summarize(str(workdir / "events.jsonl")).items():
+        table.add_row(f"{name} p50/p95/p99 (ms)", f"{stats['p50']:.2f} / {stats['p95']:.2f} / {stats['p99']:.2f}")
+    table.add_row("Dashboard calls", ", ".join(f"{k}: {v}" for k, v in sorted(dashboard["calls"].items())))
+    table.add_row("Dashboard 429s / errors",
+                  f"{dashboard['injected_429'] + dashboard['rate_limited']} / {dashboard['injected_errors']}")
+    console.print(table)
+
+
+def store_result(result, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as file:
+        file.write(json.dumps(result) + "\n")
+
+
+def print_result(result):
+    table = Table(title=" ".join(filter(None, ("Load test", result["label"], f"({result['commit'] or 'no commit'})"))))
+    table.add_column("Metric", style="bright_white")
+    table.add_column("Value", justify="right", style="bright_white")
+    table.add_row("Webhooks sent", str(result["sent"]))
+    table.add_row("HTTP statuses", ", ".join(f"{k}: {v}" for k, v in sorted(result["statuses"].items())))
+    table.add_row("Throughput (responses/s)", f"{result['throughput']:.1f}")
+    table.add_row("Processed events/s", f"{result['processed_per_second']:.1f}")
+    for name, value in result["response_ms"].items():
+        table.add_row(f"Response {name} (ms)", f"{value:.2f}")
+    for name in ("lldp_fetch", "ssid_update", "state_write", "total"):
+        if name in result["stages_ms"]:
+            stats = result["stages_ms"][name]
+            table.add_row(f"{name} p50/p95/p99 (ms)", f"{stats['p50']:.2f} / {stats['p95']:.2f} / {stats['p99']:.2f}")
+    table.add_row("Dashboard calls per event", f"{result['api_calls_per_event']:.3f}")
+    table.add_row("Dashboard calls", ", ".join(f"{k}: {v}" for k, v in sorted(result["dashboard_calls"].items())))
+    table.add_row("Dashboard 429s / errors", f"{result['dashboard_429']} / {result['dashboard_errors']}")
+    if result["params"].get("outage"):
+        table.add_row("Event results", ", ".join(f"{k}: {v}" for k, v in sorted(result["results"].items())))
+        table.add_row("Dashboard outage 503s", str(result["dashboard_outage_rejected"]))
+    console.print(table)
+
+
+def print_history(path, limit):
+    table = Table(title=f"Load test history - {path}")
+    for column in ("When", "Label", "Commit", "Rate", "Throughput", "p50 ms", "p95 ms", "p99 ms", "Calls/event",
+                   "429s"):
+        table.add_column(column, justify="left" if column in ("When", "Label", "Commit") else "right",
+                         style="bright_white")
+    try:
+        with open(path) as file:
+            results = [json.loads(line) for line in file if line.strip()]
+    except FileNotFoundError:
+        results = []
+    for result in results[-limit:]:
+        response = result["response_ms"]
+        table.add_row(result["timestamp"], result["label"] or "", result["commit"] or "",
+                      str(result["params"]["rate"]), f"{result['throughput']:.1f}", f"{response['p50']:.1f}",
+                      f"{response['p95']:.1f}", f"{response['p99']:.1f}", f"{result['api_calls_per_event']:.3f}",
+                      str(result["dashboard_429"]))
+    console.print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /webhook against a local mock Dashboard")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run a load test and append the result to the results file")
+    run.add_argument("--rate", type=float, default=50.0, help="Webhooks per second")
+    run.add_argument("--duration", type=float, default=30.0, help="Seconds of traffic")
+    run.add_argument("--workers", type=int, default=1, help="uvicorn worker processes (uses the SQLite store)")
+    run.add_argument("--concurrency", type=int, default=200, help="Maximum outstanding webhook requests")
+    run.add_argument("--noise", type=float, default=0.0, help="Fraction of unrelated (non-port) alerts")
+    run.add_argument("--outage", metavar="START:LENGTH[:MODE]",
+                     help="Dashboard outage, e.g. 2:5 (503s from 2s to 7s) or 2:5:hang (requests time out)")
+    run.add_argument("--seed", type=int, default=None)
+    run.add_argument("--app-port", type=int, default=8090)
+    run.add_argument("--mock-port", type=int, default=8091)
+    run.add_argument("--drain-timeout", type=float, default=120.0,
+                     help="Seconds to wait for queued events after the traffic stops")
+    run.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                     help="App setting for this run, e.g. --set MERAKI_BACKEND=async (repeatable)")
+    run.add_argument("--label", default="", help="Free-form label stored with the result")
+    run.add_argument("--results", type=pathlib.Path, default=RESULTS_PATH)
+    add_mock_arguments(run)
+
+    replay = commands.add_parser("replay", help="Replay recorded webhooks through handle_webhook as fast as possible")
+    replay.add_argument("paths", nargs="+", type=pathlib.Path,
+                        help="Event journals (data/journal.jsonl*) or files with one webhook per line")
+    replay.add_argument("--concurrency", type=int, default=100, help="Webhooks processed at the same time")
+    replay.add_argument("--mock-port", type=int, default=8091)
+    replay.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="App setting for the replay, e.g. --set MERAKI_RATE_LIMIT=1000 (repeatable)")
+    replay.add_argument("--label", default="")
+    add_mock_arguments(replay)
+
+    startup = commands.add_parser("startup", help="Measure the app's time to first request")
+    startup.add_argument("--runs", type=int, default=5, help="App starts to measure")
+    startup.add_argument("--cold", action="store_true", help="Remove the cache snapshot before every start")
+    startup.add_argument("--app-port", type=int, default=8090)
+    startup.add_argument("--mock-port", type=int, default=8091)
+    startup.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                         help="App setting for the measured starts (repeatable)")
+    startup.add_argument("--label", default="")
+    startup.add_argument("--results", type=pathlib.Path, default=STARTUP_RESULTS_PATH)
+    add_mock_arguments(startup)
+
+    history = commands.add_parser("history", help="Compare stored results")
+    history.add_argument("--results", type=pathlib.Path, default=RESULTS_PATH)
+    history.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args()
+    if args.command == "history":
+        print_history(args.results, args.limit)
+        return
+    if args.command == "replay":
+        asyncio.run(run_replay(args))
+        return
+    if args.command == "startup":
+        result = asyncio.run(run_startup(args))
+        store_result(result, args.results)
+        print_startup_result(result)
+        console.print(f"Result appended to {args.results}")
+        return
+    result = asyncio.run(run_benchmark(args))
+    store_result(result, args.results)
+    print_result(result)
+    console.print(f"Result appended to {args.results}")
+
+
+if __name__ == "__main__":
+    # python loadtest.py run --rate 100 --duration 30 --set MERAKI_BACKEND=async
+    # python loadtest.py history
+    # python loadtest.py replay ../../data/journal.jsonl --set MERAKI_RATE_LIMIT=1000
+    # python loadtest.py startup --runs 5
+    main()
@@ -12,24 +12,16 @@ IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
 or implied.
 """
 
-from rich.console import Console
-
-from rich.table import Table
-from rich.panel import Panel
-from rich.pretty import Pretty
+# rich is imported where it is used: the console, logging listener thread and log files are only set up on
+# first use, so importing this module (and every module using lm) has no side effects
 import logging
 from config import config
 import json
 import logging.handlers
 import queue
-from rich.logging import RichHandler
-from rich import inspect
-from rich.theme import Theme
-from rich.layout import Layout
-from rich.align import Align
-from rich.text import Text
-from rich.markdown import Markdown
-from threading import Lock
+import sys
+from threading import Lock, RLock
+import atexit
 import re
 import os
 
@@ -37,7 +29,7 @@ import os
 # Global variable to hold the table's state
 log_table = []
 
-custom_theme = Theme(
+custom_theme = (
     {
         'info': 'bright_white',
         'error': 'bold italic red',
@@ -48,7 +40,7 @@ custom_theme = Theme(
         'success': 'bright_green',
 
     }
-)
+)   # Styles of the rich Theme of lm.console
 
 
 def extract_readme_sections():
@@ -79,6 +71,50 @@ def extract_readme_sections():
     return "Relevant sections not found."
 
 
+class ConsoleRenderHandler(logging.Handler):
+    """
+    Renders console records queued by LoggerManager.tsp in non-blocking mode. Runs on the console
+    QueueListener thread, so rich formatting and terminal I/O stay off the event loop.
+    """
+
+    def __init__(self, manager):
+        super().__init__()
+        self.manager = manager
+        self.reported_dropped = 0
+
+    def emit(self, record):
+        dropped = self.manager.console_dropped
+        if dropped != self.reported_dropped:
+            self.manager.console.print(f"[orange1]... {dropped - self.reported_dropped} console message(s) dropped[/orange1]")
+            self.reported_dropped = dropped
+        self.manager.console.print(*record.console_args, **record.console_kwargs)
+
+
+EVENT_LOGGER_NAME = f"{__name__}.events"
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats structured event records (passed as extra={'event': {...}}) as one JSON object per line."""
+
+    def format(self, record):
+        return json.dumps(record.event, default=str, separators=(',', ':'))
+
+
+def _is_event_record(record):
+    return record.name == EVENT_LOGGER_NAME
+
+
+def _is_not_event_record(record):
+    return record.name != EVENT_LOGGER_NAME
+
+
+class ConsoleQueueListener(logging.handlers.QueueListener):
+    """QueueListener for the bounded console queue: waits for room for the stop sentinel instead of failing."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
 class LoggerManager:
     _instance = None
     _lock = Lock()
@@ -91,24 +127,83 @@ class LoggerManager:
 
     def __init__(self):
         self.listener = None
-        self.console = Console(theme=custom_theme)
+        self._console = None
+        self._logger = None
         self.log_queue = queue.Queue(-1)  # No limit on size
         self.queue_handler = logging.handlers.QueueHandler(self.log_queue)
-        self.logger = self.setup()
-        self.original_log_level = self.logger.level
         self.session_logs = {}  # This will store all the logs per session
-        self.logger.propagate = False
         self.lock = Lock()
+        self._setup_lock = RLock()   # setup() creates the console under it
+
+        # Full pretty-printing of payloads defaults to off in production
+        self.pretty_payloads = (config.LOG_PRETTY_PAYLOADS if config.LOG_PRETTY_PAYLOADS is not None
+                                else (config.DEV_ENV or '').lower() != 'production')
+        # Presentation (panels, config table) only when a person is watching
+        self.interactive = config.INTERACTIVE if config.INTERACTIVE is not None else sys.stdout.isatty()
+
+        # Non-blocking console mode: tsp() only enqueues, a listener thread (started on first use) renders
+        self.console_queue = None
+        self.console_listener = None
+        self.console_dropped = 0
+        self._console_sampled = 0
+        if config.LOG_NONBLOCKING:
+            self.console_queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+            self._console_high_water = max(1, config.LOG_QUEUE_SIZE * 3 // 4)
+        atexit.register(self.shutdown)
+
+    @property
+    def console(self):
+        """The rich Console, created on first use."""
+        if self._console is None:
+            with self._setup_lock:
+                if self._console is None:
+                    from rich.console import Console
+                    from rich.theme import Theme
+                    self._console = Console(theme=Theme(custom_theme))
+        return self._console
+
+    @property
+    def logger(self):
+        """The app logger; the log files and the listener thread are set up on first use."""
+        if self._logger is None:
+            with self._setup_lock:
+                if self._logger is None:
+                    self._logger = self.setup()
+                    self.original_log_level = self._logger.level
+                    self._logger.propagate = False
+        return self._logger
+
+    def _start_console_listener(self):
+        with self._setup_lock:
+            if self.console_listener is None:
+                listener = ConsoleQueueListener(self.console_queue, ConsoleRenderHandler(self))
+                listener.start()
+                self.console_listener = listener
 
     def tsp(self, *args, **kwargs):
-        """Thread safe print."""
-        with self.lock:
-            self.console.print(*args, **kwargs)
+        """Thread safe print. In non-blocking mode the arguments are queued and rendered by a listener thread."""
+        if self.console_queue is None:
+            with self.lock:
+                self.console.print(*args, **kwargs)
+            return
+        if self.console_listener is None:
+            self._start_console_listener()
+
+        # Under overload keep only every LOG_SAMPLE_RATE-th message, and drop when the queue is full
+        if self.console_queue.qsize() >= self._console_high_water:
+            self._console_sampled += 1
+            if self._console_sampled % config.LOG_SAMPLE_RATE:
+                self.console_dropped += 1
+                return
+        try:
+            self.console_queue.put_nowait(logging.makeLogRecord({'console_args': args, 'console_kwargs': kwargs}))
+        except queue.Full:
+            self.console_dropped += 1
 
     def pp(self, obj):
-        """ Pretty printing json with thread safe print. """
-        pretty = Pretty(locals())
-        self.tsp(obj)
+        """ Pretty printing json with thread safe print. Disabled unless pretty_payloads is set. """
+        if self.pretty_payloads:
+            self.tsp(obj)
 
     def lnp(self, message, style="info", level="info"):
         """ Log n' print the message
@@ -120,10 +215,12 @@ class LoggerManager:
 
     def p_panel(self, *args, **kwargs):
         """Create and print a Rich Panel in a thread-safe manner."""
+        from rich.panel import Panel
         panel = Panel(*args, **kwargs)
         self.tsp(panel)
     def setup(self):
         """Set up the logger with handlers for both console and file output."""
+        from rich.logging import RichHandler
         log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
         log_directory = "logs"
@@ -133,29 +230,69 @@ class LoggerManager:
         file_handler = logging.FileHandler("logs/app.log")
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(logging.Formatter(log_format))
+        file_handler.addFilter(_is_not_event_record)
 
         console_handler = RichHandler(console=self.console)
         console_handler.setLevel(logging.WARNING)
+        console_handler.addFilter(_is_not_event_record)
+
+        # Structured per-webhook events go to a size-rotated JSON-lines file through the same listener.
+        # With APP_WORKERS > 1 the app does NOT rotate it: every worker appends to the same file and a
+        # worker rotating it would leave the others writing to the renamed one. Rotate it with logrotate
+        # instead; each worker reopens the file once logrotate has moved it away.
+        if config.APP_WORKERS == 1:
+            event_handler = logging.handlers.RotatingFileHandler(
+                config.EVENT_LOG_PATH, maxBytes=config.EVENT_LOG_MAX_BYTES, backupCount=config.EVENT_LOG_BACKUPS
+            )
+        else:
+            event_handler = logging.handlers.WatchedFileHandler(config.EVENT_LOG_PATH)
+        event_handler.setLevel(logging.INFO)
+        event_handler.setFormatter(JsonLinesFormatter())
+        event_handler.addFilter(_is_event_record)
 
         self.listener = logging.handlers.QueueListener(
-            self.log_queue, console_handler, file_handler, respect_handler_level=True
+            self.log_queue, console_handler, file_handler, event_handler, respect_handler_level=True
         )
         self.listener.start()
 
+        self._event_logger = logging.getLogger(EVENT_LOGGER_NAME)
+        self._event_logger.setLevel(logging.INFO)
+        self._event_logger.propagate = False
+        self._event_logger.addHandler(self.queue_handler)
+
         logger = logging.getLogger(__name__)
         logger.setLevel(logging.DEBUG)
         logger.addHandler(self.queue_handler)
 
         return logger
 
+    @property
+    def event_logger(self):
+        self.logger    # Sets up the event log as well
+        return self._event_logger
+
+    def log_event(self, event):
+        """Queue a structured event (a JSON-serialisable dict) for the JSON-lines event log."""
+        if config.EVENT_LOG_ENABLED:
+            self.event_logger.info("event", extra={"event": event})
+
     def shutdown(self):
-        """Stop the logging listener."""
-        self.listener.stop()
+        """
+        Stop the logging listeners, flushing any queued records. The listeners are only set once started and
+        are forgotten here, so each is stopped once (the atexit hook also runs after an explicit shutdown).
+        """
+        with self._setup_lock:
+            listeners = (self.console_listener, self.listener)
+            self.console_listener = self.listener = None
+        for listener in listeners:
+            if listener is not None:
+                listener.stop()
 
     def display_2_column_rich_table(self, data, title):
         """
         Display data in a rich table format.
         """
+        from rich.table import Table
         table = Table(title=title)
         table.add_column("Variable", justify="left", style="bright_white", width=30)
         table.add_column("Value", style="bright_white", width=60)
@@ -166,6 +303,7 @@ class LoggerManager:
 
     def display_list_as_rich_table(self, data_list, title, headers=None):
         """Display a list of dictionaries in a rich table format."""
+        from rich.table import Table
         if not data_list or not all(isinstance(item, dict) for item in data_list):
             self.tsp("Invalid data provided for the table.")
             return
@@ -186,6 +324,7 @@ class LoggerManager:
             json_data (str/dict/list): JSON data to be displayed in the table.
             title (str): Title of the table.
         """
+        from rich.table import Table
         # Parse JSON if it's a string
         if isinstance(json_data, str):
             try:
@@ -240,6 +379,7 @@ class LoggerManager:
         Returns:
             Table: A rich table object.
         """
+        from rich.table import Table
         table = Table()
         table.add_column("Variable", justify="left", style="bright_white")
         table.add_column("Value", style="bright_white")
@@ -252,13 +392,16 @@ class LoggerManager:
         return table
 
     def print_start_panel(self, app_name=config.APP_NAME):
+        from rich.panel import Panel
         self.lnp(Panel.fit(f'[bold bright_white]{app_name}[/bold bright_white]', title='Start', style='webex'))
 
     def print_finished_panel(self):
+        from rich.panel import Panel
         # Mostly used for non-flask apps
         self.lnp(Panel.fit("[bold bright_green]All operations completed successfully. Exiting the application.[/bold bright_green]"))
 
     def print_exit_panel(self):
+        from rich.panel import Panel
         self.lnp("\n")
         self.lnp(Panel.fit('Shutting down...', title='[bright_red]Exit[/bright_red]', border_style='red'))
 
@@ -269,6 +412,7 @@ class LoggerManager:
         Args:
             obj: The object to be inspected.
         """
+        from rich import inspect
         self.lnp(f"Inspecting object: {type(obj).__name__}")
         inspect(obj, methods=True, help=True, private=True, docs=True)
 
@@ -276,6 +420,7 @@ class LoggerManager:
         """
         Inspect an object using Rich and log the representation.
         """
+        from rich import inspect
         inspect(obj, console=self.console, methods=True)
         self.tsp(f"Inspected object: {type(obj).__name__}", style="debug", level="debug")
 
@@ -295,6 +440,11 @@ class LoggerManager:
         self.logger.exception(message)
 
     def print_start_layout(self):
+        from rich.align import Align
+        from rich.layout import Layout
+        from rich.markdown import Markdown
+        from rich.panel import Panel
+        from rich.text import Text
         layout = Layout()
 
         # Define the size of header & footer
@@ -372,6 +522,7 @@ class LoggerManager:
         Args:
             xsi_user_map (dict): A dictionary containing user mapping information.
         """
+        from rich.table import Table
         table = Table(title="XSI User Mapping")
         table.add_column("User ID", style="magenta")
         table.add_column("Details", style="green")
@@ -405,6 +556,7 @@ class LoggerManager:
 
     def print_event_details(self, events_data):
         """Print event details in a table format."""
+        from rich.table import Table
         table = Table(show_header=True, header_style="bold magenta")
 
         if events_data and isinstance(events_data[0], dict):
@@ -418,6 +570,7 @@ class LoggerManager:
 
     def log_flattened_event_data(self, event):
         """Log individual event data in a two-column table: Key, Value."""
+        from rich.table import Table
 
         table = Table(show_header=True, header_style="bold magenta", title="Call Receieved Details")
         table.add_column("Key", width=100)
@@ -16,32 +16,127 @@ __author__ = "Mark Orszycki  <morszyck@cisco.com>"
 __copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
 __license__ = "Cisco Sample Code License, Version 1.1"
 
+import asyncio
 from fastapi import FastAPI
-import uvicorn
 from routes import router as webhook_router
 # from meraki_funcs import *
-from meraki_funcs import MerakiOps
+from meraki_funcs import create_meraki_ops
+from reconciler import Reconciler
+from metrics import register_app_metrics
+from warmstart import CacheSnapshot
 
 from logrr import lm
 from config import config
 
 
+async def warm_up(fastapi_app, retry_interval=5.0, attempts=3):
+    """
+    Load the device list and boat table and seed the SSID cache of every network from the Dashboard, then
+    mark the app ready. Networks that still fail after `attempts` tries do not hold the app back: it is
+    marked ready, /ready lists them in fastapi_app.state.unseeded_networks (their SSID updates are simply
+    not skipped as unchanged) and they are retried every retry_interval seconds until they seed. After a
+    warm start the app is ready already and this only refreshes the caches.
+    """
+    meraki_operations = fastapi_app.state.meraki_operations
+    len(meraki_operations.registry)     # Loads the store unless the snapshot was current
+    len(meraki_operations.boats)
+    pending = [shard.network_id for shard in meraki_operations.shards]
+    attempt = 0
+    while True:
+        seeded = await asyncio.gather(*(meraki_operations.seed_ssid_cache(network_id) for network_id in pending))
+        pending = [network_id for network_id, ok in zip(pending, seeded) if not ok]
+        fastapi_app.state.unseeded_networks = pending
+        attempt += 1
+        if not pending or attempt == attempts:
+            if not fastapi_app.state.ready:
+                lm.lnp("Caches warm, ready" if not pending else
+                       f"[orange1]Ready without the SSID state of {', '.join(pending)}, retrying[/orange1]")
+            fastapi_app.state.ready = True
+        if not pending:
+            break
+        await asyncio.sleep(retry_interval)
+
+
 def create_app() -> FastAPI:
     fastapi_app = FastAPI()
 
     @fastapi_app.on_event("startup")
     async def on_startup():
-        lm.print_start_panel(config.APP_NAME)
-        lm.display_config_table(config)
+        if lm.interactive:
+            lm.print_start_panel(config.APP_NAME)
+            lm.display_config_table(config)
 
         # Initialize Meraki Dashboard
         # fastapi_app.state.meraki_dashboard = get_meraki_dashboard()
-        fastapi_app.state.meraki_operations = MerakiOps()
+        fastapi_app.state.meraki_operations = create_meraki_ops()
+        await fastapi_app.state.meraki_operations.open()
+        meraki_operations = fastapi_app.state.meraki_operations
+
+        # Warm start: serve from the caches saved at the last shutdown while they are refreshed in the
+        # background; /ready answers 200 once the caches are warm
+        fastapi_app.state.cache_snapshot = None
+        fastapi_app.state.ready = False
+        fastapi_app.state.unseeded_networks = []
+        if config.WARM_START_ENABLED:
+            fastapi_app.state.cache_snapshot = CacheSnapshot(config.WARM_START_PATH, max_age=config.WARM_START_MAX_AGE)
+            fastapi_app.state.ready = await asyncio.to_thread(fastapi_app.state.cache_snapshot.load, meraki_operations)
+        await fastapi_app.state.meraki_operations.restore_from_journal()
+        fastapi_app.state.warm_up = asyncio.create_task(warm_up(fastapi_app, attempts=config.WARM_UP_ATTEMPTS))
+        if fastapi_app.state.meraki_operations.journal is not None:
+            fastapi_app.state.meraki_operations.journal.start(config.JOURNAL_COMPACT_INTERVAL)
+
+        # Optional background processing of webhooks, with a queue and worker pool per network
+        if config.WEBHOOK_QUEUE_MODE:
+            await meraki_operations.shards.start_queues(meraki_operations.handle_webhook,
+                                                        maxsize=config.WEBHOOK_QUEUE_SIZE,
+                                                        workers=config.WEBHOOK_WORKERS)
+
+        register_app_metrics(meraki_operations)
+
+        # SSID changes queued while the Dashboard was unavailable are applied when the circuit breaker closes,
+        # and the ones left from before a restart right away
+        meraki_operations.pending.start(meraki_operations.drain_pending_actions, interval=config.BREAKER_RESET_TIMEOUT)
+        if len(meraki_operations.pending):
+            meraki_operations.pending.wake()
+
+        # Org-wide switch inventory, read now (incrementally after a warm start) and refreshed in the background
+        if config.INVENTORY_REFRESH_INTERVAL > 0:
+            meraki_operations.inventory.start(config.INVENTORY_REFRESH_INTERVAL,
+                                                                config.INVENTORY_FULL_REFRESH_INTERVAL)
 
+        # Periodic sweep per network that repairs SSIDs left wrong by lost webhooks
+        fastapi_app.state.reconcilers = []
+        if config.RECONCILE_INTERVAL > 0:
+            fastapi_app.state.reconcilers = [
+                Reconciler(meraki_operations, interval=config.RECONCILE_INTERVAL, network_id=shard.network_id)
+                for shard in meraki_operations.shards]
+            for reconciler in fastapi_app.state.reconcilers:
+                reconciler.start()
 
     @fastapi_app.on_event("shutdown")
     async def on_shutdown():
-        lm.print_exit_panel()
+        for reconciler in fastapi_app.state.reconcilers:
+            await reconciler.stop()
+        fastapi_app.state.warm_up.cancel()
+        await asyncio.gather(fastapi_app.state.warm_up, return_exceptions=True)
+        await fastapi_app.state.meraki_operations.inventory.stop()
+        await fastapi_app.state.meraki_operations.pending.stop()
+        await fastapi_app.state.meraki_operations.shards.stop_queues(timeout=config.WEBHOOK_DRAIN_TIMEOUT)
+        await fastapi_app.state.meraki_operations.shards.flush_batches()
+        if fastapi_app.state.cache_snapshot is not None:
+            try:
+                size = fastapi_app.state.cache_snapshot.save(fastapi_app.state.meraki_operations)
+                if size is not None:
+                    lm.lnp(f"Caches saved to {fastapi_app.state.cache_snapshot.path} ({size} bytes)")
+            except Exception as e:  # The next start is cold, nothing else is lost
+                lm.tsp(f"[red]Failed to save the cache snapshot: {e}[/red]")
+        if fastapi_app.state.meraki_operations.journal is not None:
+            await fastapi_app.state.meraki_operations.journal.close()
+        lm.lnp(f"SSID cache: {fastapi_app.state.meraki_operations.ssid_cache.stats()}")
+        lm.lnp(f"LLDP cache: {fastapi_app.state.meraki_operations.lldp_cache.stats()}")
+        await fastapi_app.state.meraki_operations.close()
+        if lm.interactive:
+            lm.print_exit_panel()
 
     fastapi_app.include_router(webhook_router)
     return fastapi_app
@@ -50,4 +145,7 @@ def create_app() -> FastAPI:
 app = create_app()
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, log_level="warning", reload=True)
+    import uvicorn
+    # Reload only works with a single process
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, log_level="warning",
+                reload=config.APP_WORKERS == 1, workers=config.APP_WORKERS)
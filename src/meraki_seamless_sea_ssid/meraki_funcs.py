@@ -1,23 +1,637 @@
-from rich.prompt import Prompt
-from rich.panel import Panel
-from meraki.exceptions import APIError
-import meraki
+# The meraki SDK and rich are imported by the code that needs them, so importing this module stays cheap
+from contextlib import AsyncExitStack
+from urllib.parse import quote
+import asyncio
+import time
 from config import config
 import sys
 from logrr import lm
-from funcs import read_csv_data, write_to_csv, check_serial_in_csv, extract_system_name, check_boat_in_csv, update_csv_row
-import csv
+from lldp_cache import LldpCache
+from events import WebhookEvent
+from alerts import PortAlert
+from idempotency import IdempotencyWindow, webhook_key
+from journal import EventJournal
+from metrics import DASHBOARD_LATENCY, DASHBOARD_CALLS
+from registry import DeviceRegistry, BoatCatalogue
+from dispatcher import PortDispatcher
+from portlock import PortLocks
+from ssid_cache import SsidStateCache
+from ratelimit import get_rate_limiter, get_network_rate_limiter, PRIORITY_HIGH, PRIORITY_LOW
+from batching import SsidBatcher, ActionBatchError, ssid_update_action, ssid_action_body, is_rejection, \
+    ACTION_BATCH_SYNC_LIMIT
+from funcs import response_items, lldp_system_name, model_matches, next_page_url
+from inventory import SwitchInventory
+from shards import NetworkShard, ShardRouter, configured_network_ids, current_shard
+from breaker import CircuitBreaker, is_retryable, CLOSED
+from pending import PendingActions
 
 
-class MerakiOps:
+class BaseMerakiOps:
+    """
+    Webhook handling shared by the sync and async backends. Subclasses provide the Dashboard client
+    through open()/close() and _request(); every webhook-path API call goes through _call(), which
+    applies the rate limiter of the network being processed (see shards), or the organization's, and the
+    circuit breaker. SSID changes that fail while the Dashboard is unavailable are queued in `pending` and
+    applied by drain_pending_actions() once it is back.
+    """
+    def __init__(self):
+        self.org_id = config.MERAKI_ORG_ID
+        self.rate_limiter = get_rate_limiter(self.org_id)
+        self.registry = DeviceRegistry()
+        self.boats = BoatCatalogue()
+        self.dispatcher = PortDispatcher(coalesce_window=config.PORT_COALESCE_WINDOW)
+        self.ssid_cache = SsidStateCache(store=self.registry.store)
+        # With a shared store several worker processes may receive events for the same port
+        self.port_locks = PortLocks(f"{config.STATE_DB}-locks") if self.registry.store.shared else None
+        self.lldp_cache = LldpCache(lambda serial: self._call('devices', 'getDeviceLldpCdp', serial),
+                                    ttl=config.LLDP_CACHE_TTL)
+        self.dedup = None
+        if config.WEBHOOK_DEDUP_TTL > 0:
+            # Shared through the state store so a retry delivered to another worker is dropped too
+            self.dedup = IdempotencyWindow(ttl=config.WEBHOOK_DEDUP_TTL, max_size=config.WEBHOOK_DEDUP_MAX_SIZE,
+                                           store=self.registry.store)
+        self.last_event_at = {}     # serial -> time.monotonic() of its last port event (see Reconciler)
+        self.inventory = SwitchInventory(self)
+        self.journal = None
+        if config.JOURNAL_ENABLED:
+            self.journal = EventJournal(config.JOURNAL_PATH, backups=config.JOURNAL_BACKUPS)
+        self.shards = ShardRouter()    # Served networks, built by open()
+        self.breaker = CircuitBreaker(failure_threshold=config.BREAKER_FAILURE_THRESHOLD,
+                                      reset_timeout=config.BREAKER_RESET_TIMEOUT)
+        self.pending = PendingActions(config.PENDING_ACTIONS_PATH)
+        self.breaker.on_close(self.pending.wake)
+
+    async def open(self, resolve_org=True):
+        raise NotImplementedError
+
+    async def close(self):
+        raise NotImplementedError
+
+    async def _request(self, section, operation, *args, **kwargs):
+        raise NotImplementedError
+
+    async def _request_page(self, operation, url, params=None):
+        raise NotImplementedError
+
+    def _current_rate_limiter(self):
+        shard = current_shard.get()
+        return shard.rate_limiter if shard is not None else self.rate_limiter
+
+    async def _call(self, section, operation, *args, priority=PRIORITY_LOW, **kwargs):
+        """
+        Invoke a Dashboard API operation under the rate limiter of the current shard (the org's outside of
+        one), e.g. _call('devices', 'getDeviceLldpCdp', serial).
+
+        :raises breaker.CircuitOpenError: while the Dashboard is unavailable, without waiting for a token.
+        """
+        self.breaker.check()
+        return await self._current_rate_limiter().call(priority, self._timed_request, operation, self._request,
+                                                       section, operation, *args, **kwargs)
+
+    async def _call_pages(self, operation, path, params, on_page=None):
+        """
+        Fetch every page of a paginated list operation, e.g. _call_pages('getOrganizationDevices',
+        f'/organizations/{org_id}/devices', {'perPage': 1000}), following the Link `next` URL of each response.
+        Every page is a request of its own under the rate limiter and the circuit breaker, like a _call(), so
+        a 429 only repeats that page. on_page, if given, is called with the records of each page as it arrives.
+
+        :return: The records of all pages, from plain lists or {"items": [...], "meta": {...}} responses.
+        """
+        records, url = [], path
+        while url is not None:
+            self.breaker.check()
+            body, url = await self._current_rate_limiter().call(PRIORITY_LOW, self._timed_request, operation,
+                                                                self._request_page, operation, url, params)
+            params = None   # The Link URL carries the query of the next page
+            page = response_items(body)
+            records.extend(page)
+            if on_page is not None:
+                on_page(page)
+        return records
+
+    async def _timed_request(self, operation, request, *args, **kwargs):
+        """ Await request(*args, **kwargs) through the circuit breaker, with per-operation latency and outcome metrics. """
+        self.breaker.before_call()
+        started = time.perf_counter()
+        outcome = 'ok'
+        try:
+            try:
+                result = await request(*args, **kwargs)
+            except asyncio.CancelledError:
+                # aiohttp can raise CancelledError for a request whose connection was closed under it (e.g. after a
+                # timeout) although nothing cancelled this task; that is a failed request, not a cancellation
+                if getattr(asyncio.current_task(), 'cancelling', lambda: 1)():
+                    self.breaker.record_cancelled()
+                    raise
+                raise ConnectionAbortedError(f"{operation} - request aborted") from None
+        except Exception as e:
+            outcome = str(getattr(e, 'status', None) or 'error')
+            self.breaker.record_failure(e)
+            raise
+        else:
+            self.breaker.record_success()
+            return result
+        finally:
+            DASHBOARD_LATENCY.observe(time.perf_counter() - started, operation=operation)
+            DASHBOARD_CALLS.inc(operation=operation, outcome=outcome)
+
+    async def _resolve_org_id(self):
+        """
+        Determine the organization of MERAKI_NETWORK_ID (unless MERAKI_ORG_ID is set) and bind its rate limiter.
+        """
+        if not self.org_id:
+            try:
+                network = await self._request('networks', 'getNetwork', config.MERAKI_NETWORK_ID)
+                self.org_id = network['organizationId']
+            except Exception as e:
+                lm.tsp(f"[red]Failed to resolve organization for {config.MERAKI_NETWORK_ID}. Error: {e}[/red]")
+                return
+        self.bind_org(self.org_id)
+
+    def bind_org(self, org_id):
+        """ Send subsequent calls through the rate limiter of org_id. """
+        self.org_id = org_id
+        self.rate_limiter = get_rate_limiter(org_id)
+
+    async def _open_shards(self):
+        """
+        Build a NetworkShard for every served network (MERAKI_NETWORK_ID and MERAKI_NETWORK_IDS). The
+        organization of each additional network is looked up with getNetwork; networks that cannot be
+        resolved are not served.
+        """
+        async def resolve(network_id):
+            if network_id == config.MERAKI_NETWORK_ID:
+                return network_id, self.org_id
+            try:
+                return network_id, (await self._request('networks', 'getNetwork', network_id))['organizationId']
+            except Exception as e:
+                lm.tsp(f"[red]Failed to resolve organization for {network_id}, not serving it. Error: {e}[/red]")
+                return network_id, None
+
+        orgs = {}
+        for network_id, org_id in await asyncio.gather(*(resolve(n) for n in configured_network_ids())):
+            if org_id is not None or network_id == config.MERAKI_NETWORK_ID:
+                orgs.setdefault(org_id, []).append(network_id)
+        for org_id, network_ids in orgs.items():
+            for network_id in network_ids:
+                batcher = None
+                if config.SSID_BATCH_ENABLED and org_id:
+                    batcher = SsidBatcher(lambda items, org_id=org_id: self._apply_ssid_updates(items, org_id),
+                                          window=config.SSID_BATCH_WINDOW, max_size=config.SSID_BATCH_MAX_SIZE)
+                self.shards.add(NetworkShard(network_id, org_id,
+                                             get_network_rate_limiter(org_id, len(network_ids)), batcher))
+
+    def org_of(self, network_id):
+        """Return the organization of a served network (the default organization for any other)."""
+        shard = self.shards.get(network_id)
+        return shard.org_id if shard is not None else self.org_id
+
+    async def seed_ssid_cache(self, network_id):
+        """
+        Seed the SSID desired-state cache with the current SSID configuration of network_id.
+
+        :return: True if the cache was seeded, False if the SSIDs could not be read.
+        """
+        try:
+            ssids = await self._call('wireless', 'getNetworkWirelessSsids', network_id)
+        except Exception as e:
+            lm.tsp(f"[red]Failed to seed SSID cache for {network_id}. Error: {e}[/red]")
+            return False
+        self.ssid_cache.seed(network_id, ssids)
+        return True
+
+    async def restore_from_journal(self):
+        """
+        Bring the device rows in line with the state recorded by the journal snapshot and tail, e.g. after
+        a crash between journaling a port change and writing it to the store. A row the store wrote after
+        its last journal record (saved normally, or reset by setup.py) is left alone. SSID state is not
+        restored; it is seeded from the Dashboard.
+        """
+        if self.journal is None:
+            return
+        state = await asyncio.to_thread(self.journal.load)
+        restored = 0
+        for serial, row in state['devices'].items():
+            current = self.registry.get(serial)
+            if current is None:
+                continue
+            modified = self.registry.store.modified(serial)
+            if modified is not None and modified >= row.get('ts', 0):
+                continue
+            if str(current.get('switch_port_connected')) != str(row['switch_port_connected']) or \
+                    current.get('SystemName') != row['SystemName']:
+                self.registry.update(serial, switch_port_connected=row['switch_port_connected'],
+                                     system_name=row['SystemName'])
+                self.registry.save(serial)
+                restored += 1
+        lm.lnp(f"Journal replayed: {state['records']} records, {restored} device rows restored")
+
+    async def save_port_state(self, device_serial, switch_port_connected, system_name):
+        """
+        Persist the port state of device_serial (already set with registry.update()). With the journal
+        enabled the change is fsynced to the journal first, so the store can be rebuilt after a crash.
+        """
+        if self.journal is not None:
+            try:
+                await self.journal.commit({'type': 'state', 'serial': device_serial,
+                                           'switch_port_connected': switch_port_connected,
+                                           'SystemName': system_name})
+            except OSError as e:
+                lm.tsp(f"[red]Failed to write the journal: {e}[/red]")
+        self.registry.save(device_serial)
+
+    def _journal_ssid(self, network_id, ssid_number, ssid_payload, result):
+        if self.journal is not None:
+            self.journal.append({'type': 'ssid', 'network_id': network_id, 'ssid_number': str(ssid_number),
+                                 'payload': {k: v for k, v in ssid_payload.items() if k != 'psk'},
+                                 'result': result})
+
+    async def get_meraki_switch_port_status(self, network_id):
+        """
+        Port statuses of every switch in network_id from the organization-wide, paginated
+        getOrganizationSwitchPortsStatusesBySwitch (RECONCILE_PER_PAGE switches per page).
+
+        :return: Dict of serial -> list of port records ({"portId", "status", ...}).
+        """
+        switches = await self._call_pages('getOrganizationSwitchPortsStatusesBySwitch',
+                                          f"/organizations/{quote(str(self.org_of(network_id)), safe='')}"
+                                          f"/switch/ports/statuses/bySwitch",
+                                          {'networkIds[]': [network_id], 'perPage': config.RECONCILE_PER_PAGE})
+        return {switch['serial']: switch.get('ports') or [] for switch in switches}
+
+    async def get_meraki_switch_lldp(self, network_id):
+        """
+        Most recent LLDP neighbour per switch port in network_id, from the organization-wide, paginated
+        getOrganizationSwitchPortsTopologyDiscoveryByDevice.
+
+        :return: Dict of serial -> {port id (str): LLDP system name}.
+        """
+        devices = await self._call_pages('getOrganizationSwitchPortsTopologyDiscoveryByDevice',
+                                         f"/organizations/{quote(str(self.org_of(network_id)), safe='')}"
+                                         f"/switch/ports/topology/discovery/byDevice",
+                                         {'networkIds[]': [network_id], 'perPage': config.RECONCILE_PER_PAGE})
+        index = {}
+        for device in devices:
+            ports = index.setdefault(device['serial'], {})
+            for port in device.get('ports') or []:
+                system_name = lldp_system_name(port)
+                if system_name:
+                    ports[str(port.get('portId'))] = system_name
+        return index
+
+    async def setup_meraki_network(self, ssid_number, meraki_network_id, psk, vlan):
+        """
+        Set up a Meraki network with the given SSID and VLAN.
+        """
+        return await self.change_ssid_status(ssid_number, meraki_network_id, True, psk, vlan)
+
+    async def teardown_meraki_network(self, ssid_number, meraki_network_id):
+        """
+        Tear down a Meraki network with the given SSID.
+        """
+        return await self.change_ssid_status(ssid_number, meraki_network_id, False)
+
+    async def change_ssid_status(self, ssid_number, meraki_network_id, status, psk=None, vlan=None):
+        """
+        Change the status of a specific SSID.
+        Returns 'applied', 'unchanged' (already in that state), 'pending' (queued until the Dashboard is
+        available, see drain_pending_actions()) or 'failed' (rejected by the Dashboard).
+        """
+        ssid_payload = {
+            'name': f"{config.MERAKI_SSID_NAME}",
+            'enabled': status,
+            'authMode': "psk" if status else "open",
+        }
+        # Include the key, its encryption and the boat's VLAN only when enabling the SSID
+        if status:
+            ssid_payload['encryptionMode'] = 'wpa'
+            if psk is not None:
+                ssid_payload['psk'] = psk
+            if vlan is not None:
+                ssid_payload['useVlanTagging'] = True
+                ssid_payload['defaultVlanId'] = int(vlan)
+
+        # Skip the API call if the SSID already has exactly this configuration
+        if self.ssid_cache.matches(meraki_network_id, ssid_number, ssid_payload):
+            lm.tsp(f"SSID {ssid_number} already {'enabled' if status else 'disabled'}, skipping update")
+            return 'unchanged'
+
+        # Queued changes of this SSID are applied in order by the drain; this one replaces them
+        if (meraki_network_id, ssid_number) in self.pending:
+            return await self._queue_ssid_change(meraki_network_id, ssid_number, ssid_payload,
+                                                 "a change of this SSID is pending")
+
+        submitted_at = time.time()
+        try:
+            await self._submit_ssid_update(meraki_network_id, ssid_number, ssid_payload)
+            self.ssid_cache.record(meraki_network_id, ssid_number, ssid_payload)
+            # A change of this SSID queued (by another worker) while this one was applied is older; drop it
+            await self.pending.discard(meraki_network_id, ssid_number, before=submitted_at)
+            self._journal_ssid(meraki_network_id, ssid_number, ssid_payload, 'applied')
+            lm.tsp(f"[bright_green]Successfully {'enabled' if status else 'disabled'} SSID settings for {ssid_number}[/bright_green]")
+            return 'applied'
+        except Exception as e:
+            if is_retryable(e):
+                return await self._queue_ssid_change(meraki_network_id, ssid_number, ssid_payload, e)
+            self.ssid_cache.invalidate(meraki_network_id, ssid_number)
+            self._journal_ssid(meraki_network_id, ssid_number, ssid_payload, 'failed')
+            lm.tsp(f"[red]Failed to {'enable' if status else 'disable'} SSID settings for {ssid_number}. Error: {e}[/red]")
+            return 'failed'
+
+
+    async def _submit_ssid_update(self, network_id, ssid_number, ssid_payload):
+        """Apply an SSID change through the network's action batcher, or directly without one."""
+        shard = self.shards.get(network_id)
+        if shard is not None and shard.batcher is not None:
+            await shard.batcher.add(network_id, ssid_number, ssid_payload)
+        else:
+            await self._update_ssid(network_id, ssid_number, ssid_payload)
+
+    async def _queue_ssid_change(self, network_id, ssid_number, ssid_payload, reason):
+        """Queue an SSID change that cannot be applied now in the pending actions. Returns 'pending' or 'failed'."""
+        self.ssid_cache.invalidate(network_id, ssid_number)     # Unknown until the change is applied
+        try:
+            await self.pending.put(network_id, ssid_number, ssid_payload)
+        except OSError as e:
+            self._journal_ssid(network_id, ssid_number, ssid_payload, 'failed')
+            lm.tsp(f"[red]Failed to queue the change of SSID {ssid_number} ({reason}). Error: {e}[/red]")
+            return 'failed'
+        self._journal_ssid(network_id, ssid_number, ssid_payload, 'pending')
+        lm.tsp(f"[orange1]Change of SSID {ssid_number} queued until the Dashboard is available ({reason})[/orange1]")
+        if self.breaker.state == CLOSED:
+            self.pending.wake()
+        return 'pending'
+
+    async def drain_pending_actions(self):
+        """
+        Apply the queued SSID changes, each under the rate limiter of its network. Changes that fail again
+        while the Dashboard is unavailable stay queued; changes the Dashboard rejects are dropped.
+        Returns the number of changes applied.
+        """
+        entries = self.pending.entries()
+        if self.breaker.state != CLOSED:
+            # Only the oldest change probes the Dashboard; when it succeeds the breaker closes and wakes the drain
+            entries = entries[:1]
+        lm.tsp(f"Applying {len(entries)} pending SSID changes")
+        return sum(await asyncio.gather(*(self._drain_entry(entry) for entry in entries)))
+
+    async def _drain_entry(self, entry):
+        network_id, ssid_number = entry['network_id'], entry['ssid_number']
+        payload = dict(entry['payload'])
+        if payload.get('enabled') and payload.get('authMode') == 'psk':
+            payload['psk'] = config.PSK     # Not written to the pending actions file
+        shard_token = current_shard.set(self.shards.get(network_id))
+        try:
+            await self._submit_ssid_update(network_id, ssid_number, payload)
+        except Exception as e:
+            if is_retryable(e):
+                return 0
+            self._journal_ssid(network_id, ssid_number, payload, 'failed')
+            lm.tsp(f"[red]Dropping the pending change of SSID {ssid_number} in {network_id}. Error: {e}[/red]")
+            await self.pending.remove(entry)
+            return 0
+        finally:
+            current_shard.reset(shard_token)
+        self.ssid_cache.record(network_id, ssid_number, payload)
+        self._journal_ssid(network_id, ssid_number, payload, 'applied')
+        await self.pending.remove(entry)
+        lm.tsp(f"[bright_green]Applied the pending change of SSID {ssid_number} in {network_id}[/bright_green]")
+        return 1
+
+    async def _update_ssid(self, network_id, ssid_number, ssid_payload):
+        await self._call('wireless', 'updateNetworkWirelessSsid', network_id, ssid_number,
+                         priority=PRIORITY_HIGH, **ssid_action_body(ssid_payload))
+
+    async def _apply_ssid_updates(self, items, org_id=None):
+        """
+        Apply a batch of (network_id, ssid_number, payload) SSID updates as one action batch of org_id (all
+        networks of a batch belong to it). Returns one entry per item: None if applied, otherwise the exception.
+
+        Action batches are atomic, so if the Dashboard rejects a multi-action batch (see is_rejection) each
+        update is retried on its own to find out which ones are at fault. Any other failure (an outage, 429,
+        the open circuit breaker) is returned for every item, to be queued with the pending actions.
+        """
+        org_id = org_id or self.org_id
+        actions = [ssid_update_action(*item) for item in items]
+        try:
+            batch = await self._call('organizations', 'createOrganizationActionBatch', org_id, actions,
+                                     confirmed=True, synchronous=len(actions) <= ACTION_BATCH_SYNC_LIMIT,
+                                     priority=PRIORITY_HIGH)
+            status = (await self._wait_for_action_batch(batch, org_id)).get('status', {})
+            if not status.get('failed'):
+                return [None] * len(items)
+            error = ActionBatchError(status.get('errors'))
+        except Exception as e:
+            error = e
+        if len(items) == 1 or not is_rejection(error):
+            return [error] * len(items)
+
+        lm.tsp(f"[red]Action batch of {len(items)} SSID updates failed ({error}), retrying individually[/red]")
+        results = []
+        for network_id, ssid_number, payload in items:
+            try:
+                await self._update_ssid(network_id, ssid_number, payload)
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def _wait_for_action_batch(self, batch, org_id, poll_interval=1.0, max_polls=60):
+        """Poll an asynchronous action batch until the Dashboard reports it completed or failed."""
+        for _ in range(max_polls):
+            status = batch.get('status', {})
+            if status.get('completed') or status.get('failed'):
+                return batch
+            await asyncio.sleep(poll_interval)
+            batch = await self._call('organizations', 'getOrganizationActionBatch', org_id, batch['id'],
+                                     priority=PRIORITY_HIGH)
+        # Not a rejection: the batch may still complete, and applying it again is harmless
+        raise asyncio.TimeoutError(f"Action batch {batch.get('id')} did not complete in time")
+
+    async def handle_webhook(self, data):
+        """
+        Process one webhook, given as an alerts.PortAlert (as parsed by the route) or a decoded payload dict.
+        """
+        event = WebhookEvent()
+        with event.stage("parse"):
+            alert = data if isinstance(data, PortAlert) else PortAlert.from_dict(data)
+            device_serial = alert.device_serial
+            alertTypeId = alert.alert_type_id
+            networkId = alert.network_id
+            port_number = alert.port_number
+            dedup_key = webhook_key(alert) if self.dedup is not None else None
+        event.serial, event.alert_type, event.network_id, event.port = device_serial, alertTypeId, networkId, port_number
+
+        # Meraki re-sends alerts when we are slow to answer; drop re-deliveries before they are journaled
+        # or cause any Dashboard call
+        if dedup_key is not None and self.dedup.is_duplicate(dedup_key):
+            lm.tsp(f"Duplicate webhook dropped: {device_serial} port {port_number}")
+            event.finish("duplicate")
+            return
+
+        if self.journal is not None:
+            # Secrets stay out of the journal
+            self.journal.append({'type': 'webhook',
+                                 'payload': {k: v for k, v in alert.payload.items() if k != 'sharedSecret'}})
+        lm.tsp("Webhook received:", style="webhook")
+        lm.pp(alert.payload)  # pretty print received webhook
+
+        lm.tsp("Device Serial: ", device_serial)
+        lm.tsp("Alert TypeId: ", alertTypeId)
+        lm.tsp("Network Id: ", networkId)
+        lm.tsp("PortNum: ", port_number)
+
+        with event.stage("registry_lookup"):
+            serial_found = device_serial in self.registry
+            # Alerts without a networkId go to the network the inventory knows the switch in, or the default one
+            shard = self.shards.route(networkId or self.inventory.network_of(device_serial))
+        if serial_found and shard is None and len(self.shards):
+            lm.tsp(f"Network {networkId} of {device_serial} is not served, ignoring the alert")
+            event.finish("unknown_network")
+            return
+        if serial_found:
+            self.last_event_at[device_serial] = time.monotonic()
+            lm.tsp(f"Serial found in CSV: {device_serial}")
+            network_id = shard.network_id if shard is not None else config.MERAKI_NETWORK_ID
+            # Dashboard calls made for this event (also by tasks it starts) use the network's rate budget
+            shard_token = current_shard.set(shard)
+            # The boat on the port may have changed; its cached LLDP neighbour is not used again
+            self.lldp_cache.invalidate(device_serial, port_number)
+            if alertTypeId == 'port_connected':
+                # Start the LLDP fetch now so it overlaps the per-port coalescing window
+                self.lldp_cache.prefetch(device_serial, port_number)
+            # Serialize per switch port; queued events for the same port collapse into the latest one
+            result = "error"
+            try:
+                port_key = (device_serial, str(port_number))
+                result = await self.dispatcher.dispatch(
+                    port_key,
+                    lambda: self._process_alert_locked(port_key, device_serial, alertTypeId, port_number, event,
+                                                       network_id),
+                )
+            finally:
+                current_shard.reset(shard_token)
+                if result in ("error", "failed", "lldp_unavailable") and dedup_key is not None:
+                    self.dedup.forget(dedup_key)    # Let Meraki's retry run again
+                event.finish(result)
+        else:
+            lm.tsp(f"Serial does not exist in CSV: {device_serial}")
+            event.finish("unregistered")
+
+    async def _process_alert_locked(self, port_key, device_serial, alert_type_id, port_number, event, network_id):
+        """ process_alert() while holding the cross-process lock of the port, if there is one. """
+        if self.port_locks is None:
+            return await self.process_alert(device_serial, alert_type_id, port_number, event=event,
+                                            network_id=network_id)
+        async with self.port_locks.hold(port_key):
+            return await self.process_alert(device_serial, alert_type_id, port_number, event=event,
+                                            network_id=network_id)
+
+    async def process_alert(self, device_serial, alert_type_id, port_number, event=None, network_id=None):
+        """
+        Apply a port event in network_id (default MERAKI_NETWORK_ID): set up the boat's SSID on port_connected,
+        tear it down on port_disconnected.
+        Returns the result recorded in the event log, e.g. 'enabled', 'disabled', 'unchanged', 'pending', 'failed',
+        'lldp_unavailable', 'unknown_boat', 'no_boat' or 'ignored'. Stage timings are added to `event` when given.
+        """
+        event = event or WebhookEvent()
+        event.executed = True
+        result = 'ignored'
+        update_needed = False
+        port_state = None
+        network_id = network_id or config.MERAKI_NETWORK_ID
+        psk = config.PSK
+
+        if alert_type_id == 'port_connected':
+            with event.stage("lldp_fetch"):
+                try:
+                    system_name = await self.lldp_cache.get_system_name(device_serial, port_number)
+                except Exception as e:
+                    if not is_retryable(e):
+                        raise
+                    # The boat cannot be identified while the Dashboard is down; a re-delivery of the alert
+                    # or the next reconciliation sweep applies the port
+                    lm.tsp(f"[red]LLDP of {device_serial} unavailable, port {port_number} not applied: {e}[/red]")
+                    return 'lldp_unavailable'
+            lm.tsp(f"System name for port {port_number}: {system_name}")
+            with event.stage("boat_lookup"):
+                ssid_number, vlan = self.boats.lookup(system_name, network_id)
+            lm.tsp(f"Using system name:{system_name} \n"
+                   f"Using ssid_number: {ssid_number} \n"
+                   f"Using vlan: {vlan}")
+            result = 'unknown_boat'
+            if system_name and ssid_number and vlan:
+                port_state = (True, system_name)
+                self.registry.update(device_serial, switch_port_connected=True, system_name=system_name)
+                with event.stage("ssid_update"):
+                    outcome = await self.setup_meraki_network(ssid_number=ssid_number, meraki_network_id=network_id, psk=psk, vlan=vlan)
+                result = 'enabled' if outcome == 'applied' else outcome
+                update_needed = True
+
+        elif alert_type_id == 'port_disconnected':
+            result = 'no_boat'
+            with event.stage("registry_lookup"):
+                system_name = self.get_system_name_for_serial(device_serial)
+            if system_name:
+                with event.stage("boat_lookup"):
+                    ssid_number, vlan = self.boats.lookup(system_name, network_id)
+                if ssid_number:
+                    with event.stage("ssid_update"):
+                        outcome = await self.teardown_meraki_network(ssid_number=ssid_number, meraki_network_id=network_id)
+                    result = 'disabled' if outcome == 'applied' else outcome
+                    update_needed = True
+            if update_needed:
+                port_state = (False, "N/A")
+                self.registry.update(device_serial, switch_port_connected=False, system_name="N/A")
+
+        if update_needed:
+            with event.stage("state_write"):
+                await self.save_port_state(device_serial, *port_state)
+        return result
+
+    def get_system_name_for_serial(self, device_serial):
+        """
+        Retrieve system_name for the given device_serial from the device registry.
+        """
+        return self.registry.get_system_name(device_serial)
+
+
+class MerakiOps(BaseMerakiOps):
     """ Class that encapsulates all the Meraki operations"""
     def __init__(self):
+        super().__init__()
+        import meraki
         try:
-            self.dashboard = meraki.DashboardAPI(api_key=config.MERAKI_API_KEY, suppress_logging=True)
+            # Retries are scheduled by the org rate limiter, not by the SDK
+            self.dashboard = meraki.DashboardAPI(api_key=config.MERAKI_API_KEY, base_url=config.MERAKI_BASE_URL,
+                                                 suppress_logging=True, maximum_retries=1,
+                                                 single_request_timeout=config.MERAKI_REQUEST_TIMEOUT)
         except Exception as e:
             lm.tsp(f"[bold red]Error initializing Meraki Dashboard: {e}[/bold red]")
             raise e
 
+    async def open(self, resolve_org=True):
+        """ The synchronous client needs no session setup; only the organizations and network shards are set up. """
+        if resolve_org:
+            await self._resolve_org_id()
+            await self._open_shards()
+
+    async def close(self):
+        """ The synchronous client holds no session to release. """
+
+    async def _request(self, section, operation, *args, **kwargs):
+        """
+        Invoke a Dashboard API operation on the synchronous client.
+        The synchronous SDK blocks the event loop for the duration of the round trip.
+        """
+        return getattr(getattr(self.dashboard, section), operation)(*args, **kwargs)
+
+    async def _request_page(self, operation, url, params=None):
+        """ GET one page of a paginated operation on the synchronous client. Returns (body, next page URL or None). """
+        session = self.dashboard._session
+        response = session.request({'tags': ['pages'], 'operation': operation}, 'GET', url, params=params)
+        return response.json(), next_page_url(response.links, session._base_url)
+
     def get_org_id(self):
         """
         Fetch the org ID based on org name, or prompt the user to select
@@ -25,6 +639,8 @@ class MerakiOps:
         organization, it selects that organization automatically. Exits the script if
         the organization is not found or if there's an error fetching the organizations.
         """
+        from meraki.exceptions import APIError
+        from rich.prompt import Prompt
 
         with lm.console.status("[bold green]Fetching Meraki Organizations....", spinner="dots"):
             try:
@@ -61,6 +677,7 @@ class MerakiOps:
         """
         Collect existing Meraki network names / IDs
         """
+        from rich.panel import Panel
         lm.tsp(Panel.fit("[bold bright_green]Retrieving Network(s) Information[/bold bright_green]", title="Step 3"))
         # Fetching the networks before applying any filter.
         try:
@@ -76,123 +693,75 @@ class MerakiOps:
         print(f"Found {len(response)} network(s).")
         return response
 
-    """ NEW """
-
     def get_meraki_network_switches(self, network_id):
-        response = self.dashboard.networks.getNetworkDevices(network_id)
-        switch_List = []
-        for device in response:
-            if 'MS320' in device['model']:
-                switch_List.append(device)
-        return switch_List
-
-    def get_meraki_switch_port_status(self, serial_number):
-        response = self.dashboard.switch.getDeviceSwitchPortsStatuses(serial_number)
-
-    def setup_meraki_network(self, ssid_number, meraki_network_id, psk, vlan):
         """
-        Set up a Meraki network with the given SSID and VLAN.
+        Devices of network_id whose model matches config.SWITCH_MODEL_PATTERNS.
         """
-        self.change_ssid_status(ssid_number, meraki_network_id, True, psk, vlan)
+        response = self.dashboard.networks.getNetworkDevices(network_id)
+        return [device for device in response if model_matches(device['model'], config.SWITCH_MODEL_PATTERNS)]
 
-    def teardown_meraki_network(self, ssid_number, meraki_network_id):
-        """
-        Tear down a Meraki network with the given SSID.
-        """
-        self.change_ssid_status(ssid_number, meraki_network_id, False)
 
-    def change_ssid_status(self, ssid_number, meraki_network_id, status, psk=None, vlan=None):
+class AsyncMerakiOps(BaseMerakiOps):
+    """
+    Meraki operations on top of meraki.aio. A single AsyncDashboardAPI (and therefore a single pooled
+    aiohttp session) is opened on FastAPI startup and shared by all webhooks until shutdown.
+    """
+    def __init__(self):
+        super().__init__()
+        self.dashboard = None
+        self._stack = None
+
+    async def open(self, resolve_org=True):
         """
-        Change the status of a specific SSID.
+        Open the shared aio Dashboard session, resolve the organization of MERAKI_NETWORK_ID and build the network
+        shards (skipped with resolve_org=False, e.g. by discovery, which selects the organization itself and
+        calls bind_org()).
         """
-        ssid_payload = {
-            'name': f"{config.MERAKI_SSID_NAME}",
-            'enabled': status,
-            'authMode': "psk" if status else "open",
-            'vlan': vlan if status else None,
-            'encryptionMode': 'wpa'
-        }
-        # Include 'psk' only when enabling the SSID
-        if status and psk is not None:
-            ssid_payload['psk'] = psk
-
+        if self.dashboard is not None:
+            return
+        import meraki.aio
+        self._stack = AsyncExitStack()
         try:
-            self.dashboard.wireless.updateNetworkWirelessSsid(meraki_network_id, ssid_number, **ssid_payload)
-            lm.tsp(f"[bright_green]Successfully {'enabled' if status else 'disabled'} SSID settings for {ssid_number}[/bright_green]")
+            self.dashboard = await self._stack.enter_async_context(
+                meraki.aio.AsyncDashboardAPI(
+                    api_key=config.MERAKI_API_KEY,
+                    base_url=config.MERAKI_BASE_URL,
+                    suppress_logging=True,
+                    maximum_concurrent_requests=config.MERAKI_MAX_CONCURRENT_REQUESTS,
+                    maximum_retries=1,  # Retries are scheduled by the org rate limiter
+                    single_request_timeout=config.MERAKI_REQUEST_TIMEOUT,
+                )
+            )
         except Exception as e:
-            lm.tsp(f"[red]Failed to {'enable' if status else 'disable'} SSID settings for {ssid_number}. Error: {e}[/red]")
-
-
-    async def handle_webhook(self, data):
-        lm.tsp("Webhook received:", style="webhook")
-        lm.pp(data)  # pretty print received webhook
-
-        device_serial = data.get("deviceSerial")
-        alertTypeId = data.get("alertTypeId")
-        networkId = data.get("networkId")
-        port_number = data.get("alertData", {}).get('portNum', {})
-
-        lm.tsp("Device Serial: ", device_serial)
-        lm.tsp("Alert TypeId: ", alertTypeId)
-        lm.tsp("Network Id: ", networkId)
-        lm.tsp("PortNum: ", port_number)
+            lm.tsp(f"[bold red]Error initializing Meraki Dashboard: {e}[/bold red]")
+            raise e
+        if resolve_org:
+            await self._resolve_org_id()
+            await self._open_shards()
 
-        serial_found = check_serial_in_csv(device_serial)
-        # alertTypeId = "port_connected"    # For testing
-        if serial_found:
-            lm.tsp(f"Serial found in CSV: {device_serial}")
-            await self.process_alert(device_serial, alertTypeId, port_number)
-        else:
-            lm.tsp(f"Serial does not exist in CSV: {device_serial}")
+    async def close(self):
+        """ Close the shared aio Dashboard session. """
+        if self._stack is not None:
+            await self._stack.aclose()
+        self.dashboard = None
+        self._stack = None
 
-    async def process_alert(self, device_serial, alert_type_id, port_number):
-        csv_file_path = config.CSV_DB
-        boats_csv_path = config.BOATS_CSV
-        updated_rows, fieldnames = read_csv_data(csv_file_path)
-        update_needed = False
-        network_id = config.MERAKI_NETWORK_ID
-        psk = config.PSK
+    async def _request(self, section, operation, *args, **kwargs):
+        """ Await a Dashboard API operation on the shared aio session. """
+        return await getattr(getattr(self.dashboard, section), operation)(*args, **kwargs)
 
-        # FOR TESTING WITHOUT HAVING TO WAIT FOR MERAKI WEBHOOK TO COME THROUGH (5 min...)
-        # TO USE COMMENT OUT LINES 169 (system_name = extract_system_name(response, port_number) & 170 (ssid_number, vlan = check_boat_in_csv(boats_csv_path, system_name)
-        # alert_type_id = 'port_connected'    # SET TO 'port_connected' TO TEST WIFI NETWORK SETUP, 'port_disconnected' TO TEST NETWORK TEARDOWN
-        # system_name = "SOME_SYSTEM_NAME"     # TO USE, COMMENT OUT LINE 166 "system_name = extract_system_name(response, port_number)"
-        # ssid_number = 1
-        # vlan = 10
-        # TO USE WITH MERAKI WEBHOOK COMMENT OUT 158-161 and uncomment 169 & 170
-        # MAKE SURE THE SERIAL NUMBERS YOU ARE USING FOR TESTING ARE IN data/ms_120_device_list.csv
+    async def _request_page(self, operation, url, params=None):
+        """ GET one page of a paginated operation on the shared aio session. Returns (body, next page URL or None). """
+        session = self.dashboard._session
+        async with await session.request({'tags': ['pages'], 'operation': operation}, 'GET', url,
+                                         params=params) as response:
+            return await response.json(content_type=None), next_page_url(response.links, session._base_url)
 
-        if alert_type_id == 'port_connected':
-            response = self.dashboard.devices.getDeviceLldpCdp(device_serial)
-            lm.tsp("LLDP CDP Response: ", response)
 
-            system_name = extract_system_name(response, port_number)
-            ssid_number, vlan = check_boat_in_csv(boats_csv_path, system_name)
-            lm.tsp(f"Using system name:{system_name} \n"
-                   f"Using ssid_number: {ssid_number} \n"
-                   f"Using vlan: {vlan}")
-            if system_name and ssid_number and vlan:
-                update_csv_row(updated_rows, device_serial, switch_port_connected=True, system_name=system_name)
-                self.setup_meraki_network(ssid_number=ssid_number, meraki_network_id=network_id, psk=psk, vlan=vlan)
-                update_needed = True
-
-        elif alert_type_id == 'port_disconnected':
-            system_name = self.get_system_name_for_serial(updated_rows, device_serial)
-            if system_name:
-                ssid_number, vlan = check_boat_in_csv(boats_csv_path, system_name)
-                if ssid_number:
-                    self.teardown_meraki_network(ssid_number=ssid_number, meraki_network_id=network_id)
-                    update_needed = True
-            update_csv_row(updated_rows, device_serial, switch_port_connected=False, system_name="N/A")
-
-        if update_needed:
-            write_to_csv(csv_file_path, updated_rows, fieldnames)
-
-    def get_system_name_for_serial(self, updated_rows, device_serial):
-        """
-        Retrieve system_name for the given device_serial from the updated_rows.
-        """
-        for row in updated_rows:
-            if row["Serial Number"] == device_serial:
-                return row.get("SystemName")
-        return None
+def create_meraki_ops():
+    """
+    Build the MerakiOps backend selected by config.MERAKI_BACKEND ('sync' or 'async').
+    """
+    if config.MERAKI_BACKEND == 'async':
+        return AsyncMerakiOps()
+    return MerakiOps()
@@ -0,0 +1,191 @@
+from bisect import bisect_left
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(labelnames, values), *extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, '') for name in self.labelnames), 0)
+
+    def samples(self):
+        for key, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}    # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        series = self._values.get(key)
+        if series is None:
+            series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self):
+        for key, series in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), series[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, (('le', bound),))} {cumulative}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]}"
+
+
+class CallbackMetric:
+    """A gauge or counter whose samples are produced by fn() -> [(labels dict, value), ...] at scrape time."""
+
+    def __init__(self, name, documentation, kind, fn):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.fn = fn
+
+    def samples(self):
+        for labels, value in self.fn():
+            yield f"{self.name}{_format_labels(labels.keys(), labels.values())} {value}"
+
+
+class MetricsRegistry:
+    """
+    Minimal Prometheus-style registry rendering the text exposition format (0.0.4), no external dependency.
+
+    Counters and histograms are plain dicts updated from the event loop, so recording is a dict update
+    with no locking. Values owned by other components (queue depth, cache counters, ...) are read by
+    callbacks only when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Register (or replace, e.g. on app restart) a metric by name."""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, kind, fn):
+        return self.register(CallbackMetric(name, documentation, kind, fn))
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            try:
+                lines.extend(metric.samples())
+            except Exception as e:  # A failing callback must not break the whole scrape
+                lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+WEBHOOKS = REGISTRY.counter(
+    'sea_ssid_webhooks_total', 'Webhooks handled, by alert type and outcome.', ('alert_type', 'result'))
+WEBHOOK_LATENCY = REGISTRY.histogram(
+    'sea_ssid_webhook_duration_seconds', 'Time spent in handle_webhook.', ('alert_type',))
+DASHBOARD_LATENCY = REGISTRY.histogram(
+    'sea_ssid_dashboard_call_duration_seconds', 'Latency of individual Dashboard API requests.', ('operation',))
+DASHBOARD_CALLS = REGISTRY.counter(
+    'sea_ssid_dashboard_calls_total', 'Dashboard API requests, by operation and outcome.', ('operation', 'outcome'))
+RECONCILE_DURATION = REGISTRY.histogram(
+    'sea_ssid_reconcile_duration_seconds', 'Duration of reconciliation sweeps.',
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+RECONCILE_CHANGES = REGISTRY.counter(
+    'sea_ssid_reconcile_changes_total', 'SSID changes issued by reconciliation sweeps, by outcome.', ('result',))
+
+JOURNAL_FSYNC_DURATION = REGISTRY.histogram(
+    'sea_ssid_journal_fsync_duration_seconds', 'Duration of event journal group writes (write + fsync).',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+
+
+def _limiters(meraki_ops):
+    """Labels and rate limiter of every served network (one entry per org when networks share its limiter)."""
+    seen = {}
+    for shard in meraki_ops.shards:
+        limiter = shard.rate_limiter
+        if id(limiter) not in seen:
+            labels = {'org': str(shard.org_id)}
+            if limiter.parent is not None:
+                labels['network'] = shard.network_id
+            seen[id(limiter)] = (labels, limiter)
+    return list(seen.values()) or [({'org': str(meraki_ops.org_id)}, meraki_ops.rate_limiter)]
+
+
+def register_app_metrics(meraki_ops):
+    """Register scrape-time metrics that read the state of a running app."""
+    REGISTRY.callback(
+        'sea_ssid_events_in_flight', 'Switch ports with an event running or waiting in the dispatcher.', 'gauge',
+        lambda: [({}, meraki_ops.dispatcher.in_flight())])
+    REGISTRY.callback(
+        'sea_ssid_events_queued', 'Webhooks waiting in the background work queue of each network.', 'gauge',
+        lambda: [({'network': shard.network_id}, shard.queue.qsize() if shard.queue is not None else 0)
+                 for shard in meraki_ops.shards])
+    REGISTRY.callback(
+        'sea_ssid_events_coalesced_total', 'Port events superseded by a newer event for the same port.', 'counter',
+        lambda: [({}, meraki_ops.dispatcher.coalesced)])
+    REGISTRY.callback(
+        'sea_ssid_webhooks_duplicate_total', 'Re-delivered webhooks dropped by the idempotency window.', 'counter',
+        lambda: [({}, meraki_ops.dedup.duplicates if meraki_ops.dedup is not None else 0)])
+    REGISTRY.callback(
+        'sea_ssid_dashboard_rate_limited_total', 'Dashboard 429 responses.', 'counter',
+        lambda: [(labels, limiter.rate_limited) for labels, limiter in _limiters(meraki_ops)])
+    REGISTRY.callback(
+        'sea_ssid_dashboard_retries_total', 'Dashboard requests retried by the rate limiter.', 'counter',
+        lambda: [(labels, limiter.retries) for labels, limiter in _limiters(meraki_ops)])
+    REGISTRY.callback(
+        'sea_ssid_dashboard_breaker_open', 'Whether Dashboard calls fail fast (1: circuit breaker open or probing).',
+        'gauge', lambda: [({}, int(meraki_ops.breaker.state != 'closed'))])
+    REGISTRY.callback(
+        'sea_ssid_dashboard_breaker_rejected_total', 'Dashboard calls failed fast by the circuit breaker.', 'counter',
+        lambda: [({}, meraki_ops.breaker.rejected)])
+    REGISTRY.callback(
+        'sea_ssid_pending_actions', 'SSID changes queued until the Dashboard is available.', 'gauge',
+        lambda: [({}, len(meraki_ops.pending))])
+    REGISTRY.callback(
+        'sea_ssid_cache_hits_total', 'Cache hits.', 'counter',
+        lambda: [({'cache': 'ssid'}, meraki_ops.ssid_cache.hits), ({'cache': 'lldp'}, meraki_ops.lldp_cache.hits)])
+    REGISTRY.callback(
+        'sea_ssid_cache_misses_total', 'Cache misses.', 'counter',
+        lambda: [({'cache': 'ssid'}, meraki_ops.ssid_cache.misses), ({'cache': 'lldp'}, meraki_ops.lldp_cache.misses)])
+    REGISTRY.callback(
+        'sea_ssid_journal_records_total', 'Records appended to the event journal.', 'counter',
+        lambda: [({}, meraki_ops.journal.records if meraki_ops.journal is not None else 0)])
+    REGISTRY.callback(
+        'sea_ssid_inventory_switches', 'Switches in the organization inventory by model family.', 'gauge',
+        lambda: [({'family': family}, count) for family, count in meraki_ops.inventory.stats()['families'].items()])
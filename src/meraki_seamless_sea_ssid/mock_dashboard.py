@@ -0,0 +1,400 @@
+import argparse
+import asyncio
+import itertools
+import random
+import secrets
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import uvicorn
+
+MOCK_ORG_ID = "mock-org"
+MOCK_NETWORK_ID = "N_mock"
+MOCK_MODEL = "MS120-8"
+
+
+def synthetic_serial(index):
+    """Serial number of synthetic switch `index`, e.g. QMCK-0000-0042."""
+    return f"QMCK-{index // 10000:04d}-{index % 10000:04d}"
+
+
+def mock_network_id(index):
+    """ID of synthetic network `index`; the first one is MOCK_NETWORK_ID."""
+    return MOCK_NETWORK_ID if index == 0 else f"{MOCK_NETWORK_ID}-{index}"
+
+
+def synthetic_boat(index, port):
+    """LLDP SystemName of the boat docked on `port` of synthetic switch `index`."""
+    return f"BOAT-{index:05d}-{port:02d}"
+
+
+# Parameters of updateNetworkWirelessSsid the mock accepts (a subset of the real API's)
+SSID_FIELDS = frozenset(("name", "enabled", "authMode", "encryptionMode", "wpaEncryptionMode", "psk",
+                         "ipAssignmentMode", "useVlanTagging", "defaultVlanId", "vlanId"))
+
+
+def ssid_errors(body):
+    """Validation errors of an SSID update body, as the Dashboard reports them."""
+    errors = [f"'{key}' is not a valid parameter" for key in body if key not in SSID_FIELDS]
+    errors += [f"'{key}' must not be null" for key, value in body.items() if key in SSID_FIELDS and value is None]
+    vlan = body.get("defaultVlanId")
+    if vlan is not None and not (isinstance(vlan, int) and 1 <= vlan <= 4094):
+        errors.append("'defaultVlanId' must be an integer between 1 and 4094")
+    return errors
+
+
+def public_ssid(ssid):
+    """An SSID as the Dashboard reports it: without the PSK."""
+    return {k: v for k, v in ssid.items() if k != "psk"}
+
+
+class MockDashboard:
+    """
+    In-memory stand-in for the Meraki Dashboard API used by the load-test harness.
+
+    Serves the operations on the webhook path (getDeviceLldpCdp, updateNetworkWirelessSsid,
+    getNetworkWirelessSsids, action batches) plus getNetwork, getNetworkDevices, getOrganizations and the
+    paginated organization-wide port status and LLDP discovery endpoints for `switches` synthetic MS
+    switches with `ports` ports each, of which a fraction `docked` have their boat connected. The switches
+    are spread round-robin over `networks` networks (getOrganizationNetworks). Every request waits
+    `latency` (+/- `jitter`) seconds; a fraction `rate_429` is answered with 429 + Retry-After and
+    `error_rate` with 500. With `rate_limit` > 0 requests above that many per second are also answered
+    with 429, like the per-organization limit of the real Dashboard. POST /_mock/outage?mode=error answers
+    every request with 503 until mode=off, mode=hang holds every request until then (client timeouts).
+    Counters are served at GET /_mock/stats.
+    """
+
+    MAX_WALKS = 1000    # Paginated walks whose cursors are kept until their last page is served
+
+    def __init__(self, switches=1000, ports=8, latency=0.05, jitter=0.02, rate_429=0.0, error_rate=0.0,
+                 rate_limit=0.0, retry_after=1, docked=0.0, networks=1, seed=None):
+        self.switches = switches
+        self.ports = ports
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.serials = {synthetic_serial(i): i for i in range(switches)}
+        self.network_ids = [mock_network_id(i) for i in range(max(1, networks))]
+        self.configuration_updated_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self.docked = {(index, port) for index in range(switches) for port in range(1, ports + 1)
+                       if self.random.random() < docked}
+        self.ssids = {}
+        self.action_batches = {}
+        self._cursors = {}     # startingAfter cursor -> (walk id, key of the last record of the page it follows)
+        self._walks = {}       # walk id -> cursors issued for the walk, oldest walk first
+        self._walk_ids = itertools.count(1)
+        self._batch_ids = itertools.count(1)
+        self._tokens = float(rate_limit)
+        self._refilled = time.monotonic()
+        self.outage = None  # None, 'error' or 'hang'
+        self.reset()
+
+    def reset(self):
+        self.calls = {}
+        self.injected_429 = 0
+        self.rate_limited = 0
+        self.injected_errors = 0
+        self.outage_rejected = 0
+
+    def stats(self):
+        return {
+            "calls": dict(self.calls),
+            "total_calls": sum(self.calls.values()),
+            "injected_429": self.injected_429,
+            "rate_limited": self.rate_limited,
+            "injected_errors": self.injected_errors,
+            "outage": self.outage,
+            "outage_rejected": self.outage_rejected,
+        }
+
+    def _take_token(self):
+        now = time.monotonic()
+        self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    async def simulate(self, operation):
+        """Count the call, apply latency and fault injection. Returns an error response or None."""
+        self.calls[operation] = self.calls.get(operation, 0) + 1
+        if self.outage is not None:
+            while self.outage == 'hang':
+                await asyncio.sleep(0.1)
+            self.outage_rejected += 1
+            return JSONResponse(status_code=503, content={"errors": ["Service unavailable"]})
+        if self.rate_limit and not self._take_token():
+            self.rate_limited += 1
+            return self._too_many_requests()
+        await asyncio.sleep(max(0.0, self.random.gauss(self.latency, self.jitter)))
+        roll = self.random.random()
+        if roll < self.rate_429:
+            self.injected_429 += 1
+            return self._too_many_requests()
+        if roll < self.rate_429 + self.error_rate:
+            self.injected_errors += 1
+            return JSONResponse(status_code=500, content={"errors": ["Injected server error"]})
+        return None
+
+    def _too_many_requests(self):
+        return JSONResponse(status_code=429, content={"errors": ["API rate limit exceeded for organization"]},
+                            headers={"Retry-After": str(self.retry_after)})
+
+    def lldp_cdp(self, serial):
+        index = self.serials[serial]
+        return {"sourceMac": "00:18:0a:00:00:00", "ports": {
+            str(port): {"lldp": {"systemName": synthetic_boat(index, port), "portId": str(port),
+                                 "sourcePort": str(port)}}
+            for port in range(1, self.ports + 1)}}
+
+    def page(self, request, records, key, items=False):
+        """
+        Paginate records (sorted by `key`) like the Dashboard: `perPage` records per page and a Link header
+        pointing at the next page. The next page's startingAfter is an opaque cursor issued here; a cursor the
+        mock did not issue is answered with 400, as clients must follow the Link header instead of building one.
+        The cursors of a walk expire once its last page is served; of walks abandoned halfway only the latest
+        MAX_WALKS are kept.
+        With items=True the page is an {"items": [...], "meta": {...}} object, like the organization-wide
+        switch port endpoints, instead of a plain list.
+        """
+        per_page = int(request.query_params.get("perPage", 10))
+        cursor = request.query_params.get("startingAfter")
+        total = len(records)
+        if cursor is not None:
+            if cursor not in self._cursors:
+                return JSONResponse(status_code=400, content={"errors": [f"Invalid startingAfter: {cursor}"]})
+            walk, after = self._cursors[cursor]
+            records = [record for record in records if record[key] > after]
+        else:
+            walk = next(self._walk_ids)
+        page, headers = records[:per_page], {}
+        if len(records) > per_page:
+            next_cursor = secrets.token_urlsafe(12)
+            self._cursors[next_cursor] = (walk, page[-1][key])
+            self._walks.setdefault(walk, []).append(next_cursor)
+            headers["Link"] = f'<{request.url.include_query_params(startingAfter=next_cursor)}>; rel=next'
+            while len(self._walks) > self.MAX_WALKS:
+                self._expire(next(iter(self._walks)))
+        else:
+            self._expire(walk)
+        if items:
+            page = {"items": page, "meta": {"counts": {"items": {"total": total,
+                                                                 "remaining": len(records) - len(page)}}}}
+        return JSONResponse(page, headers=headers)
+
+    def _expire(self, walk):
+        for cursor in self._walks.pop(walk, ()):
+            del self._cursors[cursor]
+
+    def network_switches(self, network_ids):
+        """(serial, index) of the switches in network_ids (all switches if empty), sorted by serial."""
+        return [(serial, index) for serial, index in sorted(self.serials.items())
+                if not network_ids or self.network_ids[index % len(self.network_ids)] in network_ids]
+
+    def port_statuses(self, network_ids):
+        return [{"serial": serial, "name": f"mock-switch-{index}", "model": MOCK_MODEL,
+                 "network": {"id": self.network_ids[index % len(self.network_ids)], "name": "Mock network"},
+                 "ports": [{"portId": str(port), "enabled": True, "isUplink": False,
+                            "status": "Connected" if (index, port) in self.docked else "Disconnected"}
+                           for port in range(1, self.ports + 1)]}
+                for serial, index in self.network_switches(network_ids)]
+
+    def lldp_discovery(self, network_ids):
+        return [{"serial": serial, "name": f"mock-switch-{index}", "model": MOCK_MODEL,
+                 "network": {"id": self.network_ids[index % len(self.network_ids)], "name": "Mock network"},
+                 "ports": [{"portId": str(port), "lldp": {"systemName": synthetic_boat(index, port)}}
+                           for port in range(1, self.ports + 1) if (index, port) in self.docked]}
+                for serial, index in self.network_switches(network_ids)]
+
+    def networks(self):
+        return [{"id": network_id, "organizationId": MOCK_ORG_ID, "name": f"Mock network {i}",
+                 "productTypes": ["switch", "wireless"], "tags": ["mock"]}
+                for i, network_id in sorted(enumerate(self.network_ids), key=lambda item: item[1])]
+
+    def device(self, serial, index):
+        return {"serial": serial, "model": MOCK_MODEL, "name": f"mock-switch-{index}", "productType": "switch",
+                "networkId": self.network_ids[index % len(self.network_ids)],
+                "configurationUpdatedAt": self.configuration_updated_at}
+
+    def network_devices(self, network_id):
+        return [device for device in (self.device(serial, index) for serial, index in self.serials.items())
+                if device["networkId"] == network_id]
+
+    def organization_devices(self, query):
+        """Devices of the organization filtered like getOrganizationDevices, sorted by serial."""
+        def values(name):
+            return query.getlist(f"{name}[]") + query.getlist(name)
+        devices = [self.device(serial, index) for serial, index in sorted(self.serials.items())]
+        if values("productTypes"):
+            devices = [device for device in devices if device["productType"] in values("productTypes")]
+        if values("models"):
+            devices = [device for device in devices if device["model"] in values("models")]
+        if query.get("model"):
+            devices = [device for device in devices if query["model"] in device["model"]]
+        if values("networkIds"):
+            devices = [device for device in devices if device["networkId"] in values("networkIds")]
+        if query.get("configurationUpdatedAfter"):
+            devices = [device for device in devices
+                       if device["configurationUpdatedAt"] > query["configurationUpdatedAfter"]]
+        return devices
+
+    def ssid(self, network_id, number):
+        return self.ssids.get((network_id, str(number)),
+                              {"number": int(number), "name": f"Unconfigured SSID {number}", "enabled": False})
+
+    def update_ssid(self, network_id, number, body):
+        ssid = {**self.ssid(network_id, number), **(body or {})}
+        self.ssids[(network_id, str(number))] = ssid
+        return public_ssid(ssid)
+
+    def apply_action_batch(self, body):
+        # Batches are atomic: nothing is applied if any action is invalid
+        errors, updates = [], []
+        for action in body.get("actions", []):
+            parts = action.get("resource", "").strip("/").split("/")
+            if len(parts) == 5 and parts[0] == "networks" and parts[2:4] == ["wireless", "ssids"]:
+                errors += ssid_errors(action.get("body") or {})
+                updates.append((parts[1], parts[4], action.get("body")))
+            else:
+                errors.append(f"Unsupported action resource: {action.get('resource')}")
+        if not errors:
+            for network_id, number, update in updates:
+                self.update_ssid(network_id, number, update)
+        batch_id = str(next(self._batch_ids))
+        batch = {"id": batch_id, "confirmed": body.get("confirmed", False),
+                 "synchronous": body.get("synchronous", False), "actions": body.get("actions", []),
+                 "status": {"completed": not errors, "failed": bool(errors), "errors": errors}}
+        self.action_batches[batch_id] = batch
+        return batch
+
+
+def create_mock_app(mock):
+    mock_app = FastAPI()
+
+    @mock_app.get("/api/v1/organizations")
+    async def get_organizations():
+        return await mock.simulate("getOrganizations") or [{"id": MOCK_ORG_ID, "name": "Mock organization"}]
+
+    @mock_app.get("/api/v1/organizations/{organization_id}/networks")
+    async def get_organization_networks(organization_id: str, request: Request):
+        error = await mock.simulate("getOrganizationNetworks")
+        if error is not None:
+            return error
+        return mock.page(request, mock.networks(), "id")
+
+    @mock_app.get("/api/v1/organizations/{organization_id}/devices")
+    async def get_organization_devices(organization_id: str, request: Request):
+        error = await mock.simulate("getOrganizationDevices")
+        if error is not None:
+            return error
+        return mock.page(request, mock.organization_devices(request.query_params), "serial")
+
+    @mock_app.get("/api/v1/networks/{network_id}")
+    async def get_network(network_id: str):
+        return await mock.simulate("getNetwork") or {
+            "id": network_id, "organizationId": MOCK_ORG_ID, "name": "Mock network"}
+
+    @mock_app.get("/api/v1/networks/{network_id}/devices")
+    async def get_network_devices(network_id: str):
+        return await mock.simulate("getNetworkDevices") or mock.network_devices(network_id)
+
+    @mock_app.get("/api/v1/devices/{serial}/lldpCdp")
+    async def get_device_lldp_cdp(serial: str):
+        error = await mock.simulate("getDeviceLldpCdp")
+        if error is not None:
+            return error
+        if serial not in mock.serials:
+            return JSONResponse(status_code=404, content={"errors": ["Device not found"]})
+        return mock.lldp_cdp(serial)
+
+    @mock_app.get("/api/v1/organizations/{organization_id}/switch/ports/statuses/bySwitch")
+    async def get_organization_switch_ports_statuses_by_switch(organization_id: str, request: Request):
+        error = await mock.simulate("getOrganizationSwitchPortsStatusesBySwitch")
+        if error is not None:
+            return error
+        network_ids = request.query_params.getlist("networkIds[]") + request.query_params.getlist("networkIds")
+        return mock.page(request, mock.port_statuses(network_ids), "serial", items=True)
+
+    @mock_app.get("/api/v1/organizations/{organization_id}/switch/ports/topology/discovery/byDevice")
+    async def get_organization_switch_ports_topology_discovery_by_device(organization_id: str, request: Request):
+        error = await mock.simulate("getOrganizationSwitchPortsTopologyDiscoveryByDevice")
+        if error is not None:
+            return error
+        network_ids = request.query_params.getlist("networkIds[]") + request.query_params.getlist("networkIds")
+        return mock.page(request, mock.lldp_discovery(network_ids), "serial", items=True)
+
+    @mock_app.get("/api/v1/networks/{network_id}/wireless/ssids")
+    async def get_network_wireless_ssids(network_id: str):
+        return await mock.simulate("getNetworkWirelessSsids") or [
+            public_ssid(ssid) for (network, _), ssid in mock.ssids.items() if network == network_id]
+
+    @mock_app.put("/api/v1/networks/{network_id}/wireless/ssids/{number}")
+    async def update_network_wireless_ssid(network_id: str, number: str, request: Request):
+        error = await mock.simulate("updateNetworkWirelessSsid")
+        if error is not None:
+            return error
+        body = await request.json()
+        if ssid_errors(body):
+            return JSONResponse(status_code=400, content={"errors": ssid_errors(body)})
+        return mock.update_ssid(network_id, number, body)
+
+    @mock_app.post("/api/v1/organizations/{organization_id}/actionBatches", status_code=201)
+    async def create_organization_action_batch(organization_id: str, request: Request):
+        return await mock.simulate("createOrganizationActionBatch") or mock.apply_action_batch(await request.json())
+
+    @mock_app.get("/api/v1/organizations/{organization_id}/actionBatches/{batch_id}")
+    async def get_organization_action_batch(organization_id: str, batch_id: str):
+        error = await mock.simulate("getOrganizationActionBatch")
+        if error is not None:
+            return error
+        if batch_id not in mock.action_batches:
+            return JSONResponse(status_code=404, content={"errors": ["Action batch not found"]})
+        return mock.action_batches[batch_id]
+
+    @mock_app.get("/_mock/stats")
+    async def get_stats():
+        return mock.stats()
+
+    @mock_app.post("/_mock/outage")
+    async def set_outage(mode: str = "error"):
+        mock.outage = None if mode == "off" else mode
+        return mock.stats()
+
+    @mock_app.post("/_mock/reset")
+    async def reset_stats():
+        mock.reset()
+        return mock.stats()
+
+    return mock_app
+
+
+def add_mock_arguments(parser):
+    parser.add_argument("--switches", type=int, default=1000, help="Synthetic MS switches")
+    parser.add_argument("--ports", type=int, default=8, help="Ports (docked boats) per switch")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Latency standard deviation in seconds")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="Requests per second before answering 429 (0 = unlimited)")
+    parser.add_argument("--networks", type=int, default=1, help="Networks the switches are spread over")
+    parser.add_argument("--docked", type=float, default=0.0,
+                        help="Fraction of ports reported Connected to their boat by the port status endpoints")
+
+
+if __name__ == "__main__":
+    # python mock_dashboard.py --port 8081 --latency 0.05 --rate-429 0.01
+    parser = argparse.ArgumentParser(description="Local mock Meraki Dashboard API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    dashboard = MockDashboard(switches=args.switches, ports=args.ports, latency=args.latency, jitter=args.jitter,
+                              rate_429=args.rate_429, error_rate=args.error_rate, rate_limit=args.rate_limit,
+                              docked=args.docked, networks=args.networks)
+    uvicorn.run(create_mock_app(dashboard), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,182 @@
+import asyncio
+import fcntl
+import json
+import os
+import time
+from logrr import lm
+
+
+class PendingActions:
+    """
+    Durable queue of SSID changes that could not be applied because the Dashboard was unavailable,
+    coalesced per SSID: a newer change for the same (network_id, ssid_number) replaces the queued one, so
+    only the latest desired state is applied when the Dashboard is back.
+
+    Entries live in a JSON file (`path`), rewritten atomically under an exclusive flock on `<path>.lock` on
+    every change, so queued changes survive a restart and several worker processes can share the file.
+    PSKs are not written to disk; the drain adds config.PSK back to changes that enable an SSID.
+
+    start() runs `drain` (a coroutine function) whenever wake() is called, e.g. when the circuit breaker
+    closes, and every `interval` seconds while entries are queued. Of several processes sharing the file only
+    the one holding the lock on `<path>.drain` drains it, so each change is applied once; the others try
+    to take the lock at each wake-up in case it exits.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock_path = f"{path}.lock"
+        self._leader_fd = None
+        self._entries = {}      # "network_id|ssid_number" -> {"network_id", "ssid_number", "payload", ...}
+        self._mtime = None
+        self._wake = asyncio.Event()
+        self._task = None
+        self.queued = 0
+        self.drained = 0
+        self._refresh()
+
+    @staticmethod
+    def _key(network_id, ssid_number):
+        return f"{network_id}|{ssid_number}"
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        self._refresh()
+        return self._key(*key) in self._entries
+
+    def entries(self):
+        """The queued changes, oldest first."""
+        self._refresh()
+        return sorted(self._entries.values(), key=lambda entry: entry['queued_at'])
+
+    def _current_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _refresh(self):
+        """Reload the entries if another process changed the file."""
+        mtime = self._current_mtime()
+        if mtime != self._mtime:
+            self._entries = self._read()
+            self._mtime = mtime
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            lm.tsp(f"[red]Ignoring unreadable pending actions file {self.path}: {e}[/red]")
+            return {}
+
+    def _write(self, entries):
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump(entries, file, separators=(',', ':'))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+
+    def _modify(self, change):
+        """Apply change(entries) to the entries on disk under the file lock (blocking)."""
+        with open(self._lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = self._read()
+            if change(entries) is not False:
+                self._write(entries)
+            self._entries, self._mtime = entries, self._current_mtime()
+
+    async def put(self, network_id, ssid_number, payload):
+        """Queue an SSID change, replacing any change queued for the same SSID."""
+        key, now = self._key(network_id, ssid_number), time.time()
+        entry = {'network_id': network_id, 'ssid_number': str(ssid_number),
+                 'payload': {k: v for k, v in payload.items() if k != 'psk'}, 'queued_at': now, 'updated_at': now}
+
+        def change(entries):
+            previous = entries.get(key)
+            if previous is not None:
+                entry['queued_at'] = previous['queued_at']    # Keep the SSID's place in the queue
+            entry['version'] = (previous or {}).get('version', 0) + 1
+            entries[key] = entry
+
+        await asyncio.to_thread(self._modify, change)
+        self.queued += 1
+        return entry
+
+    async def remove(self, entry):
+        """Remove a drained entry, unless a newer change for its SSID was queued in the meantime."""
+        key = self._key(entry['network_id'], entry['ssid_number'])
+
+        def change(entries):
+            current = entries.get(key)
+            if current is None or current.get('version') != entry.get('version'):
+                return False
+            del entries[key]
+
+        await asyncio.to_thread(self._modify, change)
+
+    async def discard(self, network_id, ssid_number, before):
+        """
+        Forget the queued change of an SSID if it was queued before `before` (a time.time()), e.g. by another
+        worker while a newer change of the SSID was being applied directly, so it is not replayed over it.
+        """
+        key = self._key(network_id, ssid_number)
+
+        def change(entries):
+            current = entries.get(key)
+            if current is None or current.get('updated_at', current['queued_at']) >= before:
+                return False
+            del entries[key]
+
+        self._refresh()
+        if key in self._entries:
+            await asyncio.to_thread(self._modify, change)
+
+    def wake(self):
+        self._wake.set()
+
+    def _is_leader(self):
+        """Only one process sharing the file drains it; the lock is kept until stop() or the process exits."""
+        if self._leader_fd is not None:
+            return True
+        fd = os.open(f"{self.path}.drain", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (BlockingIOError, PermissionError):
+            os.close(fd)
+            return False
+        self._leader_fd = fd
+        return True
+
+    def start(self, drain, interval=30.0):
+        self._task = asyncio.create_task(self._run(drain, interval))
+
+    async def _run(self, drain, interval):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not self.entries() or not self._is_leader():
+                continue
+            try:
+                self.drained += await drain()
+            except Exception as e:  # Retried at the next wake-up or interval
+                lm.tsp(f"[red]Draining pending SSID changes failed: {e}[/red]")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._leader_fd is not None:
+            os.close(self._leader_fd)
+            self._leader_fd = None
+
+    def stats(self):
+        return {'pending': len(self._entries), 'queued': self.queued, 'drained': self.drained}
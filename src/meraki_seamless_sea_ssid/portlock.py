@@ -0,0 +1,57 @@
+import asyncio
+import fcntl
+import os
+import zlib
+from contextlib import asynccontextmanager
+
+
+class PortLocks:
+    """
+    Advisory per-port locks shared by all app processes on the host (uvicorn --workers N).
+
+    Each (deviceSerial, portNum) key hashes to one of `slots` bytes of a lock file, locked with
+    fcntl.lockf. POSIX record locks are owned by the process, so within a process a slot is guarded by
+    an asyncio.Lock as well; different ports sharing a slot only serialize, never interleave.
+    Waiting polls the lock without blocking so the event loop keeps running.
+    """
+
+    def __init__(self, path, slots=4096, poll_interval=0.01, max_poll_interval=0.1):
+        self.path = path
+        self.slots = slots
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._local = {}    # slot -> asyncio.Lock, at most `slots` entries
+        self.contended = 0
+
+    def _slot(self, key):
+        return zlib.crc32(repr(key).encode()) % self.slots
+
+    def _try_lock(self, slot):
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, slot)
+            return True
+        except (BlockingIOError, PermissionError):
+            return False
+
+    @asynccontextmanager
+    async def hold(self, key):
+        """Hold the lock for key across all processes for the duration of the block."""
+        slot = self._slot(key)
+        local = self._local.get(slot)
+        if local is None:
+            local = self._local[slot] = asyncio.Lock()
+        async with local:
+            delay = self.poll_interval
+            if not self._try_lock(slot):
+                self.contended += 1
+                while not self._try_lock(slot):
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.max_poll_interval)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, slot)
+
+    def close(self):
+        os.close(self._fd)
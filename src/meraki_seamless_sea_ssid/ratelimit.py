@@ -0,0 +1,168 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from config import config
+from logrr import lm
+
+# Lower value = served first. SSID setup/teardown goes ahead of informational reads (LLDP, SSID lists).
+PRIORITY_HIGH = 0
+PRIORITY_LOW = 1
+
+_limiters = {}
+
+
+def get_rate_limiter(org_id):
+    """
+    Return the process-wide rate limiter for org_id, creating it on first use. The org's budget is split
+    evenly between the APP_WORKERS processes.
+    """
+    limiter = _limiters.get(org_id)
+    if limiter is None:
+        workers = max(1, config.APP_WORKERS)
+        limiter = _limiters[org_id] = OrgRateLimiter(
+            rate=config.MERAKI_RATE_LIMIT / workers,
+            burst=max(1, config.MERAKI_RATE_BURST // workers),
+            max_retries=config.MERAKI_MAX_RETRIES,
+        )
+    return limiter
+
+
+def get_network_rate_limiter(org_id, networks_in_org):
+    """
+    Return a rate limiter for one network of org_id, drawing its tokens from the org's limiter as well.
+    Its rate is NETWORK_RATE_LIMIT, or the org's budget split evenly between its `networks_in_org` served
+    networks, so a busy network cannot use up the budget of the others. A network that is the only one
+    served in its organization uses the org's limiter directly.
+    """
+    org_limiter = get_rate_limiter(org_id)
+    if networks_in_org <= 1 and not config.NETWORK_RATE_LIMIT:
+        return org_limiter
+    rate = config.NETWORK_RATE_LIMIT / max(1, config.APP_WORKERS) or org_limiter.rate / networks_in_org
+    return OrgRateLimiter(rate=rate, burst=max(1, min(org_limiter.burst, round(rate))),
+                          max_retries=config.MERAKI_MAX_RETRIES, parent=org_limiter)
+
+
+def _retry_after(e):
+    """Return the Retry-After value (seconds) of a failed Dashboard call, if the response carried one."""
+    headers = getattr(getattr(e, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class OrgRateLimiter:
+    """
+    Async token bucket sized to a Meraki organization's API budget, plus a retry scheduler.
+
+    Callers wait for a token in priority order (then FIFO). A 429 pauses the whole bucket for the
+    Retry-After period so every caller for the org backs off together; 429s and 5xx responses are
+    retried with jittered exponential backoff, other errors are raised to the caller.
+
+    With a `parent` (the org's limiter) this is the bucket of one network: a call takes a token from
+    this bucket first and then from the parent, and a 429 pauses both.
+    """
+
+    def __init__(self, rate=10.0, burst=10, max_retries=5, base_backoff=0.5, max_backoff=30.0, parent=None):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.parent = parent
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._pump_task = None
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_take(self):
+        if time.monotonic() < self._paused_until:
+            return False
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def _delay(self):
+        """Seconds until the next token may become available."""
+        return max(self._paused_until - time.monotonic(), (1 - self._tokens) / self.rate, 0.001)
+
+    async def acquire(self, priority=PRIORITY_LOW):
+        """Wait until a token is available for a call of the given priority (and one of the parent's)."""
+        if self._waiters or not self._try_take():
+            waiter = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+            if self._pump_task is None or self._pump_task.done():
+                self._pump_task = asyncio.create_task(self._pump())
+            await waiter
+        if self.parent is not None:
+            await self.parent.acquire(priority)
+
+    async def _pump(self):
+        """Hand out tokens to queued waiters as the bucket refills."""
+        while self._waiters:
+            if not self._try_take():
+                await asyncio.sleep(self._delay())
+                continue
+            _, _, waiter = heapq.heappop(self._waiters)
+            if waiter.done():   # Caller was cancelled; return the token
+                self._tokens += 1
+                continue
+            waiter.set_result(None)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for `seconds` (e.g. the Retry-After of a 429)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+        if self.parent is not None:
+            self.parent.pause(seconds)
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+
+    async def call(self, priority, fn, *args, **kwargs):
+        """
+        Await fn(*args, **kwargs) under the rate limit, retrying 429 and 5xx responses.
+        """
+        attempt = 0
+        while True:
+            await self.acquire(priority)
+            self.calls += 1
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                status = getattr(e, 'status', None)
+                if not status or (status != 429 and status < 500) or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                if status == 429:
+                    self.rate_limited += 1
+                    retry_after = _retry_after(e)
+                    if retry_after:
+                        self.pause(retry_after)
+                        delay = max(delay, retry_after)
+                attempt += 1
+                self.retries += 1
+                lm.tsp(f"[orange1]Dashboard returned {status}, retry {attempt}/{self.max_retries} in {delay:.2f}s[/orange1]")
+                await asyncio.sleep(delay)
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "queued": len(self._waiters),
+        }
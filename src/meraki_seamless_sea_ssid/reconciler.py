@@ -0,0 +1,176 @@
+import asyncio
+import fcntl
+import os
+import time
+from config import config
+from logrr import lm
+from funcs import lldp_system_name
+from metrics import RECONCILE_CHANGES, RECONCILE_DURATION
+from shards import current_shard
+
+
+class Reconciler:
+    """
+    Background safety net for lost webhooks.
+
+    Every `interval` seconds one sweep pulls the port status of all switches in the network with the
+    organization-wide, paginated port endpoints (one request per page of switches, not per switch),
+    re-reads the SSID list, and works out which boats from boats.csv are docked on a registered switch.
+    Docked boats get their SSID set up, SSIDs that are enabled without their boat are torn down, and
+    device rows are corrected. A boat is not torn down while a connected port it may be docked on has no
+    known LLDP neighbour. Only differences are applied, through the same cached, batched and
+    rate-limited path as the webhooks. Serials with a webhook during the sweep are left to the webhook.
+
+    There is one Reconciler per served network, sweeping under that network's rate budget. With several
+    worker processes only the one holding the <state db>-reconciler file lock sweeps.
+    """
+
+    def __init__(self, meraki_ops, interval=300.0, network_id=None):
+        self.meraki_ops = meraki_ops
+        self.interval = interval
+        self.network_id = network_id or config.MERAKI_NETWORK_ID
+        self._task = None
+        self._leader_fd = None
+        self.sweeps = 0
+        self.last_summary = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._leader_fd is not None:
+            os.close(self._leader_fd)
+            self._leader_fd = None
+
+    def _is_leader(self):
+        """Only one process sharing the state store sweeps; the others retry each interval in case it exits."""
+        if not self.meraki_ops.registry.store.shared or self._leader_fd is not None:
+            return True
+        fd = os.open(f"{config.STATE_DB}-reconciler", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (BlockingIOError, PermissionError):
+            os.close(fd)
+            return False
+        self._leader_fd = fd
+        return True
+
+    async def _run(self):
+        current_shard.set(self.meraki_ops.shards.get(self.network_id))
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self._is_leader():
+                continue
+            try:
+                await self.sweep()
+            except Exception as e:  # A failed sweep is retried at the next interval
+                lm.tsp(f"[red]Reconciliation sweep failed: {e}[/red]")
+
+    async def _docked_boats(self, statuses):
+        """
+        Return ({SystemName: serial} for boats.csv boats on a connected port of a registered switch, the set of
+        (serial, port id) of connected ports whose LLDP neighbour is still unknown after the discovery lookup).
+        """
+        ops = self.meraki_ops
+        docked, missing_lldp = {}, []
+        boats = set(ops.boats.names(self.network_id))
+        for serial, ports in statuses.items():
+            if serial not in ops.registry:
+                continue
+            for port in ports:
+                if port.get('status') != 'Connected' or port.get('isUplink'):
+                    continue
+                system_name = lldp_system_name(port)
+                if system_name is None:
+                    missing_lldp.append((serial, str(port.get('portId'))))
+                elif system_name in boats:
+                    docked[system_name] = serial
+        unresolved = set()
+        if missing_lldp:
+            # The status records carry no LLDP data: one more paginated sweep of the discovery endpoint
+            neighbours = await ops.get_meraki_switch_lldp(self.network_id)
+            for serial, port_id in missing_lldp:
+                system_name = neighbours.get(serial, {}).get(port_id)
+                if system_name is None:
+                    unresolved.add((serial, port_id))
+                elif system_name in boats:
+                    docked[system_name] = serial
+        return docked, unresolved
+
+    async def sweep(self):
+        """Run one reconciliation sweep and return a summary of the changes made."""
+        ops = self.meraki_ops
+        started = time.monotonic()
+        statuses = await ops.get_meraki_switch_port_status(self.network_id)
+        await ops.seed_ssid_cache(self.network_id)
+        docked, unresolved = await self._docked_boats(statuses)
+        unresolved_serials = {serial for serial, _ in unresolved}
+        if unresolved:
+            lm.tsp(f"[orange1]LLDP neighbour unknown on {len(unresolved)} connected ports of {self.network_id}, "
+                   f"not tearing down the SSIDs of boats that may be docked there[/orange1]")
+
+        def busy(serial):
+            return serial is not None and ops.last_event_at.get(serial, 0.0) >= started
+
+        # Where the stored state says each boat is docked
+        boats = set(ops.boats.names(self.network_id))
+        recorded = {}
+        for serial in statuses:
+            row = ops.registry.get(serial)
+            if row and str(row.get('switch_port_connected')) == 'True' and row.get('SystemName') in boats:
+                recorded[row['SystemName']] = serial
+
+        changes = []
+        for system_name, serial in docked.items():
+            if busy(serial):
+                continue
+            ssid_number, vlan = ops.boats.lookup(system_name, self.network_id)
+            if ssid_number and vlan:
+                changes.append((serial, system_name, ops.setup_meraki_network(
+                    ssid_number=ssid_number, meraki_network_id=self.network_id, psk=config.PSK, vlan=vlan)))
+        docked_serials = set(docked.values())
+        for system_name in boats - docked.keys():
+            serial = recorded.get(system_name)
+            if busy(serial):
+                continue
+            # The boat may be docked on a port whose neighbour is not known yet (anywhere, if it has no recorded
+            # switch); it is torn down by a later sweep once the neighbour is known
+            if serial in unresolved_serials or (serial is None and unresolved):
+                continue
+            if serial in docked_serials:
+                serial = None   # Another boat is docked there now; its setup records the row
+            ssid_number, _ = ops.boats.lookup(system_name, self.network_id)
+            cached = ops.ssid_cache.get(self.network_id, ssid_number) if ssid_number else None
+            if cached and cached.get('enabled'):
+                changes.append((serial, None, ops.teardown_meraki_network(
+                    ssid_number=ssid_number, meraki_network_id=self.network_id)))
+            elif serial is not None:
+                await self._record(serial, None)  # SSID already off, only the stored state is stale
+
+        summary = {'switches': len(statuses), 'docked': len(docked), 'unresolved': len(unresolved), 'applied': 0,
+                   'unchanged': 0, 'failed': 0}
+        outcomes = await asyncio.gather(*(change for _, _, change in changes), return_exceptions=True)
+        for (serial, system_name, _), outcome in zip(changes, outcomes):
+            outcome = 'failed' if isinstance(outcome, Exception) else outcome
+            summary[outcome] = summary.get(outcome, 0) + 1
+            RECONCILE_CHANGES.inc(result=outcome)
+            if outcome != 'failed' and serial is not None and not busy(serial):
+                await self._record(serial, system_name)
+
+        RECONCILE_DURATION.observe(time.monotonic() - started)
+        self.sweeps += 1
+        self.last_summary = summary
+        lm.lnp(f"Reconciliation sweep of {self.network_id}: {summary}")
+        return summary
+
+    async def _record(self, serial, system_name):
+        """Bring the device row of serial in line with the boat found docked on it (None: no boat)."""
+        ops = self.meraki_ops
+        connected = system_name is not None
+        if ops.registry.get_system_name(serial) != (system_name or "N/A"):
+            ops.registry.update(serial, switch_port_connected=connected, system_name=system_name or "N/A")
+            await ops.save_port_state(serial, connected, system_name or "N/A")
@@ -0,0 +1,245 @@
+import os
+from threading import Lock
+from config import config
+from logrr import lm
+from funcs import read_csv_data
+from state_store import create_state_store
+
+
+class BoatCatalogueError(ValueError):
+    """Raised when boats.csv contains duplicate SystemNames or conflicting SSID/VLAN assignments."""
+
+
+class _WatchedCsv:
+    """
+    Base class for CSV-backed in-memory indexes that reload themselves when the file's mtime changes.
+    Subclasses implement _load(rows, fieldnames) and _clear().
+    """
+
+    def __init__(self, csv_file_path):
+        self.csv_file_path = csv_file_path
+        self._mtime = None
+        self._lock = Lock()
+
+    def _current_mtime(self):
+        try:
+            return os.stat(self.csv_file_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _refresh(self):
+        """Reload the index if the CSV changed on disk since the last load/save."""
+        mtime = self._current_mtime()
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            if mtime is None:
+                lm.tsp(f"CSV file not found at {self.csv_file_path}")
+                self._clear()
+            else:
+                rows, fieldnames = read_csv_data(self.csv_file_path)
+                self._load(rows, fieldnames)
+            self._mtime = mtime
+
+    def _load(self, rows, fieldnames):
+        raise NotImplementedError
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def _dump(self):
+        raise NotImplementedError
+
+    def _restore(self, index):
+        raise NotImplementedError
+
+    def snapshot(self):
+        """The loaded index and the mtime of its file, for a warm start (see warmstart); None before the first load."""
+        if self._mtime is None:
+            return None
+        return {"mtime": self._mtime, "index": self._dump()}
+
+    def restore(self, snapshot):
+        """Take the index from a snapshot() if the file has not changed since. Returns True if it was used."""
+        with self._lock:
+            if snapshot["mtime"] != self._current_mtime():
+                return False
+            self._restore(snapshot["index"])
+            self._mtime = snapshot["mtime"]
+            return True
+
+
+class DeviceRegistry:
+    """
+    In-memory index of the registered MS devices keyed by serial number, backed by a StateStore
+    (ms_120_device_list.csv or SQLite, see config.STATE_BACKEND).
+
+    The device list is loaded once; membership, SystemName lookups and row updates are dict operations.
+    The index is reloaded when the store reports an outside change (e.g. setup.py rewrote the CSV),
+    and save() persists a single device row.
+
+    With a shared store (several uvicorn workers) rows are read through by primary key instead, so a
+    port connected in one worker is seen by the worker handling its disconnect, and writes by other
+    workers never force a reload of the whole table.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or create_state_store()
+        self._rows = {}
+        self._loaded = False
+
+    def _refresh(self):
+        if not self._loaded or self.store.changed():
+            self._rows = self.store.load()
+            self._loaded = True
+
+    def __contains__(self, device_serial):
+        if self.store.shared:
+            return self.get(device_serial) is not None
+        self._refresh()
+        return device_serial in self._rows
+
+    def __len__(self):
+        if self.store.shared:
+            return len(self.store.load())
+        self._refresh()
+        return len(self._rows)
+
+    def get(self, device_serial):
+        """Return the row for device_serial, or None if the serial is not registered."""
+        if self.store.shared:
+            self.store.changed()    # Re-imports the device CSV if setup.py rewrote it
+            return self.store.get(device_serial)
+        self._refresh()
+        return self._rows.get(device_serial)
+
+    def get_system_name(self, device_serial):
+        """Return the SystemName currently recorded for device_serial, or None."""
+        row = self.get(device_serial)
+        return row.get("SystemName") if row else None
+
+    def update(self, device_serial, switch_port_connected, system_name):
+        """
+        Update the port state of a registered device in memory.
+
+        :return: True if the serial is registered and was updated, False otherwise.
+        """
+        row = self.get(device_serial)
+        if row is None:
+            return False
+        row["switch_port_connected"] = switch_port_connected
+        row["SystemName"] = system_name
+        self._rows[device_serial] = row     # With a shared store, holds the row until save()
+        return True
+
+    def save(self, device_serial):
+        """Persist the row of device_serial to the state store."""
+        row = self._rows.pop(device_serial, None) if self.store.shared else self._rows.get(device_serial)
+        if row is not None:
+            self.store.upsert(row)
+
+    def snapshot(self):
+        """The loaded device rows (see warmstart); None with a shared store, which needs no warming."""
+        return None if self.store.shared else self.store.snapshot()
+
+    def restore(self, snapshot):
+        """Load the rows of a snapshot() instead of reading the store. Returns True if the snapshot was current."""
+        if self.store.shared or not self.store.restore(snapshot):
+            return False
+        self._rows = {row["Serial Number"]: dict(row) for row in snapshot["rows"]}
+        self._loaded = True
+        return True
+
+
+class BoatCatalogue(_WatchedCsv):
+    """
+    Hash index of boats.csv: (network_id, SystemName) -> (ssid_number, vlan).
+
+    The optional network_id column assigns a boat to one network (marina); rows without it apply to every
+    served network, and a network's own row for a SystemName takes precedence over such a row.
+
+    The file is validated on load. A changed file is parsed into a fresh dict which then replaces the
+    old one in a single assignment, so concurrent lookups see either the old or the new table. If the
+    new file is invalid the previous table stays in service.
+    """
+
+    def __init__(self, csv_file_path=None):
+        super().__init__(csv_file_path or config.BOATS_CSV)
+        self._index = {}
+        self._names = frozenset()   # SystemNames of every network, for membership tests
+
+    @staticmethod
+    def build_index(rows):
+        """
+        Build and validate the (network_id, SystemName) index from boats.csv rows (network_id None: every network).
+
+        :raises BoatCatalogueError: on duplicate SystemNames, or an ssid_number/vlan used by more than one boat
+            of the same network.
+        """
+        index, scopes = {}, {}
+        for row in rows:
+            system_name = (row.get("SystemName") or "").strip()
+            if not system_name:
+                continue
+            network_id = (row.get("network_id") or "").strip() or None
+            ssid_number = (row.get("ssid_number") or "").strip()
+            vlan = (row.get("vlan") or "").strip()
+            if (network_id, system_name) in index:
+                raise BoatCatalogueError(f"Duplicate SystemName in boats.csv: {system_name}")
+            index[(network_id, system_name)] = (ssid_number or None, vlan or None)
+            scopes.setdefault(network_id, []).append((system_name, ssid_number, vlan))
+
+        # SSIDs and VLANs are per network: check every network's boats together with the shared ones
+        for network_id in scopes:
+            boats = scopes[None] if network_id is None else scopes.get(None, []) + scopes[network_id]
+            where = f" in network {network_id}" if network_id else ""
+            ssid_owner, vlan_owner = {}, {}
+            for system_name, ssid_number, vlan in boats:
+                if ssid_number and ssid_owner.setdefault(ssid_number, system_name) != system_name:
+                    raise BoatCatalogueError(
+                        f"SSID {ssid_number} assigned to both {ssid_owner[ssid_number]} and {system_name}{where}")
+                if vlan and vlan_owner.setdefault(vlan, system_name) != system_name:
+                    raise BoatCatalogueError(
+                        f"VLAN {vlan} assigned to both {vlan_owner[vlan]} and {system_name}{where}")
+        return index
+
+    def _set_index(self, index):
+        self._index, self._names = index, frozenset(name for _, name in index)
+
+    def _load(self, rows, fieldnames):
+        try:
+            self._set_index(self.build_index(rows))
+        except BoatCatalogueError as e:
+            lm.tsp(f"[bold red]Invalid {self.csv_file_path}, keeping previous boat table: {e}[/bold red]")
+
+    def _clear(self):
+        self._set_index({})
+
+    def _dump(self):
+        return self._index
+
+    def _restore(self, index):
+        self._set_index(dict(index))
+
+    def __contains__(self, system_name):
+        self._refresh()
+        return system_name in self._names
+
+    def __len__(self):
+        self._refresh()
+        return len(self._index)
+
+    def names(self, network_id=None):
+        """Return the SystemNames of the boats of network_id (shared boats only when it is None)."""
+        self._refresh()
+        return list(dict.fromkeys(name for network, name in self._index if network in (None, network_id)))
+
+    def lookup(self, system_name, network_id=None):
+        """
+        Return (ssid_number, vlan) for system_name in network_id, or (None, None) if the boat is not registered.
+        """
+        self._refresh()
+        index = self._index
+        return index.get((network_id, system_name)) or index.get((None, system_name), (None, None))
@@ -1,9 +1,67 @@
 from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from alerts import PortAlert, PORT_ALERT_TYPES, peek_alert_type, peek_serial, peek_network_id
+from workqueue import QueueFullError
+from metrics import REGISTRY, WEBHOOKS
 
 router = APIRouter()
 
+
+def _rejected(alert_type, result):
+    WEBHOOKS.inc(alert_type=alert_type or '', result=result)
+    return JSONResponse(status_code=200, content={"status": result})
+
+
 @router.post("/webhook")
 async def webhook_handler(request: Request) -> object:
-    data = await request.json()
+    body = await request.body()
     meraki_operations = request.app.state.meraki_operations
-    return await meraki_operations.handle_webhook(data)
\ No newline at end of file
+
+    # Fast path: most alerts are not port events or come from switches we do not manage; answer those
+    # from the raw body without decoding it
+    alert_type = peek_alert_type(body)
+    if alert_type is not None and alert_type not in PORT_ALERT_TYPES:
+        return _rejected(alert_type, "ignored")
+    device_serial = peek_serial(body)
+    if device_serial is not None and device_serial not in meraki_operations.registry:
+        return _rejected(alert_type, "unregistered")
+    network_id = peek_network_id(body)
+    if network_id is not None and network_id not in meraki_operations.shards:
+        return _rejected(alert_type, "unknown_network")
+
+    try:
+        alert = PortAlert.parse(body)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"detail": "Invalid webhook payload"})
+    if not alert.is_port_alert:
+        return _rejected(alert.alert_type_id, "ignored")
+    if not alert.device_serial:
+        return JSONResponse(status_code=400, content={"detail": "Invalid webhook payload"})
+
+    shard = meraki_operations.shards.route(alert.network_id)
+    if shard is None or shard.queue is None:
+        return await meraki_operations.handle_webhook(alert)
+
+    # Queue mode: enqueue on the network's queue and acknowledge immediately
+    try:
+        shard.queue.submit(alert)
+    except QueueFullError as e:
+        return JSONResponse(status_code=429, content={"detail": str(e)}, headers={"Retry-After": "1"})
+    return JSONResponse(status_code=202, content={"status": "queued"})
+
+
+@router.get("/metrics")
+async def metrics_handler() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/ready")
+async def ready_handler(request: Request) -> JSONResponse:
+    # Readiness probe: 503 until the caches are warm (restored from the snapshot or loaded and seeded)
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse(status_code=503, content={"status": "warming"})
+    unseeded = getattr(request.app.state, "unseeded_networks", None)
+    if unseeded:
+        # Ready, but the SSID state of these networks could not be read from the Dashboard yet
+        return JSONResponse(status_code=200, content={"status": "ready", "unseeded_networks": unseeded})
+    return JSONResponse(status_code=200, content={"status": "ready"})
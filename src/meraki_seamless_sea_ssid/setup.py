@@ -13,9 +13,14 @@ or implied.
 """
 
 # from meraki_funcs import get_meraki_dashboard, get_org_id, get_networks_in_org, get_meraki_network_switches
-from meraki_funcs import MerakiOps
+from meraki_funcs import MerakiOps, AsyncMerakiOps
+from discovery import FleetDiscovery, DiscoveryError
 from funcs import save_devices_to_csv
+from config import config
+import argparse
+import asyncio
 import os
+import sys
 from logrr import lm
 import json
 
@@ -104,5 +109,57 @@ def main():
         print("Organization ID not found.")
 
 
+async def discover(args):
+    """
+    Non-interactive setup: add the switches of every matching network to the device list.
+    """
+    meraki_ops = AsyncMerakiOps()
+    await meraki_ops.open(resolve_org=False)
+    try:
+        discovery = FleetDiscovery(meraki_ops, meraki_ops.registry.store, network_tags=args.network_tag,
+                                   network_names=args.network_name,
+                                   model_patterns=args.model)
+        try:
+            org_id = await discovery.select_org(args.org)
+        except DiscoveryError as e:
+            lm.tsp(f"[bold red]{e}[/bold red]")
+            sys.exit(1)
+        meraki_ops.bind_org(org_id)
+        try:
+            summary = await discovery.run(org_id)
+        except Exception as e:
+            lm.tsp(f"[bold red]Discovery failed: {e}[/bold red]")
+            sys.exit(1)
+    finally:
+        await meraki_ops.close()
+        if meraki_ops.journal is not None:
+            await meraki_ops.journal.close()
+    lm.tsp(f"Discovery finished: {summary}")
+
+    # The app handles a single network; save it when the switches were found in only one
+    networks = [network_id for network_id, switches in discovery.switches.items() if switches]
+    if len(networks) == 1:
+        save_network_id_to_env(networks[0])
+    elif networks:
+        print(f"Switches found in {len(networks)} networks; MERAKI_NETWORK_ID in .env was left unchanged.")
+
+
 if __name__ == "__main__":
-    main()
+    # python setup.py                    interactive selection of the organization, network and switches
+    # python setup.py discover --org "My Org" --network-tag marina --model "MS120*" --model "MS320*"
+    parser = argparse.ArgumentParser(description="Select the Meraki network and switches used by the app")
+    commands = parser.add_subparsers(dest="command")
+    discover_parser = commands.add_parser("discover", help="Add the switches of all matching networks without prompting")
+    discover_parser.add_argument("--org", help="Organization name or ID (optional if the API key sees only one)")
+    discover_parser.add_argument("--network-tag", action="append", default=[],
+                                 help="Only networks with this tag (repeatable, any tag matches)")
+    discover_parser.add_argument("--network-name", action="append", default=[],
+                                 help="Only networks whose name matches this pattern, e.g. 'Marina*' (repeatable)")
+    discover_parser.add_argument("--model", action="append", default=[],
+                                 help=f"Switch model pattern (repeatable, default SWITCH_MODEL_PATTERNS: "
+                                      f"{' '.join(config.SWITCH_MODEL_PATTERNS)})")
+    args = parser.parse_args()
+    if args.command == "discover":
+        asyncio.run(discover(args))
+    else:
+        main()
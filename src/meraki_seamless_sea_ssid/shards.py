@@ -0,0 +1,86 @@
+import asyncio
+import contextvars
+from config import config
+from workqueue import WebhookQueue
+
+# The shard whose work is running; BaseMerakiOps._call() takes Dashboard tokens from its rate limiter
+current_shard = contextvars.ContextVar('current_shard', default=None)
+
+
+def configured_network_ids():
+    """MERAKI_NETWORK_ID followed by MERAKI_NETWORK_IDS, without duplicates."""
+    return list(dict.fromkeys([config.MERAKI_NETWORK_ID, *config.MERAKI_NETWORK_IDS]))
+
+
+class NetworkShard:
+    """
+    Processing state of one served network (marina): its organization, its rate limiter (a share of the
+    organization's Dashboard budget, see ratelimit.get_network_rate_limiter), its SSID action batcher and,
+    in queue mode, its own webhook queue and worker pool.
+    """
+
+    def __init__(self, network_id, org_id, rate_limiter, batcher=None):
+        self.network_id = network_id
+        self.org_id = org_id
+        self.rate_limiter = rate_limiter
+        self.batcher = batcher
+        self.queue = None
+
+    def __repr__(self):
+        return f"NetworkShard({self.network_id!r}, org={self.org_id!r})"
+
+
+class ShardRouter:
+    """
+    The served networks by network ID. Webhooks are routed by their networkId; alerts that carry none go to
+    the shard of MERAKI_NETWORK_ID, alerts of networks that are not served are not routed at all.
+    """
+
+    def __init__(self, default_network_id=None):
+        self.default_network_id = default_network_id or config.MERAKI_NETWORK_ID
+        self._shards = {}
+
+    def add(self, shard):
+        self._shards[shard.network_id] = shard
+
+    def __iter__(self):
+        return iter(list(self._shards.values()))
+
+    def __len__(self):
+        return len(self._shards)
+
+    def __contains__(self, network_id):
+        return network_id in self._shards
+
+    def get(self, network_id):
+        return self._shards.get(network_id)
+
+    def route(self, network_id):
+        """Return the shard of network_id (the default shard when it is None), or None if it is not served."""
+        return self._shards.get(network_id or self.default_network_id)
+
+    def orgs(self):
+        """Return {org_id: [shards]}."""
+        orgs = {}
+        for shard in self._shards.values():
+            orgs.setdefault(shard.org_id, []).append(shard)
+        return orgs
+
+    async def start_queues(self, handler, maxsize, workers):
+        """Give every shard its own bounded webhook queue drained by `workers` worker tasks."""
+        for shard in self._shards.values():
+            shard.queue = WebhookQueue(handler, maxsize=maxsize, workers=workers)
+            await shard.queue.start()
+
+    def qsize(self):
+        return sum(shard.queue.qsize() for shard in self._shards.values() if shard.queue is not None)
+
+    async def stop_queues(self, timeout=30.0):
+        """Drain the queues of all shards concurrently, waiting at most `timeout` seconds."""
+        await asyncio.gather(*(shard.queue.stop(timeout=timeout) for shard in self._shards.values()
+                               if shard.queue is not None))
+
+    async def flush_batches(self):
+        """Submit the pending SSID changes of every shard and wait for them (used on shutdown)."""
+        await asyncio.gather(*(shard.batcher.flush() for shard in self._shards.values()
+                               if shard.batcher is not None))
@@ -0,0 +1,94 @@
+# Fields of an update payload that getNetworkWirelessSsids reports back. The PSK is never returned and
+# encryptionMode only for some authModes, so only these are compared and cached.
+STATE_FIELDS = ('name', 'enabled', 'authMode', 'useVlanTagging', 'defaultVlanId')
+
+
+def ssid_state(ssid):
+    """The STATE_FIELDS of an SSID record or update payload."""
+    return {k: ssid[k] for k in STATE_FIELDS if k in ssid}
+
+
+class SsidStateCache:
+    """
+    Last applied configuration per (network_id, ssid_number).
+
+    Seeded from getNetworkWirelessSsids at startup and updated after each successful
+    updateNetworkWirelessSsid. An update is a no-op (cache hit) when every STATE_FIELDS key of its payload
+    is already present in the cached state with the same value. Failed calls invalidate the entry, since the
+    SSID may be in an unknown state.
+
+    With a shared `store` (several uvicorn workers) the state lives in the store instead of this process,
+    so a worker never skips an update because of a change another worker made.
+    """
+
+    def __init__(self, store=None):
+        self.store = store if store is not None and store.shared else None
+        self._state = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(network_id, ssid_number):
+        return network_id, str(ssid_number)
+
+    def _get(self, network_id, ssid_number):
+        if self.store is not None:
+            return self.store.get_ssid_state(network_id, ssid_number)
+        return self._state.get(self._key(network_id, ssid_number))
+
+    def _put(self, network_id, ssid_number, state):
+        if self.store is not None:
+            self.store.put_ssid_state(network_id, ssid_number, state)
+        else:
+            self._state[self._key(network_id, ssid_number)] = state
+
+    def seed(self, network_id, ssids):
+        """
+        Load the SSID list returned by getNetworkWirelessSsids for network_id. Every compared field is
+        reported back, so the Dashboard's record replaces the cached one.
+        """
+        for ssid in ssids:
+            self._put(network_id, ssid["number"], ssid_state(ssid))
+
+    def matches(self, network_id, ssid_number, payload):
+        """Return True (and count a hit) if payload would not change the cached SSID state."""
+        cached = self._get(network_id, ssid_number)
+        if cached is not None and all(k in cached and cached[k] == v for k, v in ssid_state(payload).items()):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def record(self, network_id, ssid_number, payload):
+        """Record a successfully applied payload."""
+        self._put(network_id, ssid_number, {**(self._get(network_id, ssid_number) or {}), **ssid_state(payload)})
+
+    def invalidate(self, network_id, ssid_number):
+        if self.store is not None:
+            self.store.delete_ssid_state(network_id, ssid_number)
+        else:
+            self._state.pop(self._key(network_id, ssid_number), None)
+
+    def get(self, network_id, ssid_number):
+        return self._get(network_id, ssid_number)
+
+    def snapshot(self):
+        """[(network_id, ssid_number, state)] for a warm start; None with a shared store, which keeps the state."""
+        if self.store is not None:
+            return None
+        return [(network_id, ssid_number, state) for (network_id, ssid_number), state in self._state.items()]
+
+    def restore(self, snapshot):
+        """Load a snapshot(); entries recorded since startup are kept. Returns True if it had any entries."""
+        for network_id, ssid_number, state in snapshot:
+            self._state.setdefault(self._key(network_id, ssid_number), state)
+        return bool(snapshot)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "entries": len(self._state),
+        }
@@ -0,0 +1,418 @@
+import json
+import os
+import sqlite3
+import sys
+import time
+from threading import Lock
+from config import config
+from logrr import lm
+from funcs import read_csv_data, write_to_csv
+
+DEVICE_FIELDNAMES = ["Serial Number", "Model", "switch_port_connected", "SystemName"]
+
+
+class StateStore:
+    """
+    Persistence backend for per-device port state. Rows use the ms_120_device_list.csv shape:
+    {"Serial Number", "Model", "switch_port_connected", "SystemName"}.
+
+    Stores with `shared = True` can be used by several app processes at once: the device registry and
+    the SSID cache then read through to the store instead of keeping their own copy.
+    """
+
+    shared = False
+
+    def load(self):
+        """Return all rows as a dict keyed by serial number."""
+        raise NotImplementedError
+
+    def changed(self):
+        """Return True if the stored data was modified by someone else since the last load()."""
+        raise NotImplementedError
+
+    def upsert(self, row):
+        """Insert or update a single device row."""
+        raise NotImplementedError
+
+    def replace_all(self, rows):
+        """Replace the whole device list (e.g. after setup.py selected new devices)."""
+        raise NotImplementedError
+
+    def add_devices(self, rows):
+        """Insert the rows whose serial is not stored yet; known devices keep their state. Returns the number added."""
+        raise NotImplementedError
+
+    def claim_event(self, key, ttl):
+        """
+        Record webhook idempotency key as seen for ttl seconds. Returns False if it was already claimed,
+        e.g. by another worker. Stores that cannot be shared between processes always return True.
+        """
+        return True
+
+    def release_event(self, key):
+        """Drop a claimed key so a re-delivery of the webhook is processed again."""
+
+    def get_ssid_state(self, network_id, ssid_number):
+        """Return the last applied configuration of an SSID, or None. Required when shared is True."""
+        raise NotImplementedError
+
+    def put_ssid_state(self, network_id, ssid_number, state):
+        """Store the last applied configuration of an SSID. Required when shared is True."""
+        raise NotImplementedError
+
+    def delete_ssid_state(self, network_id, ssid_number):
+        """Forget the configuration of an SSID (its state is unknown). Required when shared is True."""
+        raise NotImplementedError
+
+    def modified(self, device_serial):
+        """Time (epoch seconds) the row of device_serial was last written, or None if unknown."""
+        return None
+
+    def snapshot(self):
+        """The device rows for a warm start (see warmstart), or None if the store has nothing worth keeping."""
+        return None
+
+    def restore(self, snapshot):
+        """Take the rows of a snapshot() instead of reading them. Returns True if the snapshot was used."""
+        return False
+
+    def close(self):
+        pass
+
+
+class CsvStateStore(StateStore):
+    """
+    Legacy backend: the device list lives in ms_120_device_list.csv and every write rewrites the file.
+    """
+
+    def __init__(self, csv_file_path=None):
+        self.csv_file_path = csv_file_path or config.CSV_DB
+        self.fieldnames = list(DEVICE_FIELDNAMES)
+        self._rows = {}
+        self._mtime = None
+        self._lock = Lock()
+
+    def _current_mtime(self):
+        try:
+            return os.stat(self.csv_file_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def changed(self):
+        return self._current_mtime() != self._mtime
+
+    def load(self):
+        with self._lock:
+            self._reload()
+            return {serial: dict(row) for serial, row in self._rows.items()}
+
+    def _reload(self):
+        self._mtime = self._current_mtime()
+        if self._mtime is None:
+            lm.tsp(f"CSV file not found at {self.csv_file_path}")
+            self._rows = {}
+        else:
+            rows, fieldnames = read_csv_data(self.csv_file_path)
+            self._rows = {row["Serial Number"]: row for row in rows}
+            self.fieldnames = list(fieldnames or DEVICE_FIELDNAMES)
+
+    def upsert(self, row):
+        with self._lock:
+            self._rows[row["Serial Number"]] = dict(row)
+            self._write()
+
+    def replace_all(self, rows):
+        with self._lock:
+            self._rows = {row["Serial Number"]: dict(row) for row in rows}
+            self._write()
+
+    def add_devices(self, rows):
+        with self._lock:
+            if self._current_mtime() != self._mtime:
+                self._reload()
+            new_rows = [dict(row) for row in rows if row["Serial Number"] not in self._rows]
+            if new_rows:
+                self._rows.update((row["Serial Number"], row) for row in new_rows)
+                self._write()
+            return len(new_rows)
+
+    def modified(self, device_serial):
+        # Every write rewrites the whole file
+        mtime = self._current_mtime()
+        return mtime / 1e9 if mtime is not None else None
+
+    def snapshot(self):
+        with self._lock:
+            if self._mtime is None:
+                return None
+            return {"mtime": self._mtime, "fieldnames": list(self.fieldnames), "rows": list(self._rows.values())}
+
+    def restore(self, snapshot):
+        with self._lock:
+            if snapshot["mtime"] != self._current_mtime():  # The CSV was rewritten since, e.g. by setup.py
+                return False
+            self._rows = {row["Serial Number"]: dict(row) for row in snapshot["rows"]}
+            self.fieldnames = list(snapshot["fieldnames"])
+            self._mtime = snapshot["mtime"]
+            return True
+
+    def _write(self):
+        write_to_csv(self.csv_file_path, list(self._rows.values()), self.fieldnames)
+        self._mtime = self._current_mtime()
+
+
+class SqliteStateStore(StateStore):
+    """
+    SQLite backend in WAL mode with the serial number as primary key. Each state change is a single-row
+    UPSERT, so the cost per event does not depend on fleet size and concurrent writers cannot lose each
+    other's updates.
+
+    ms_120_device_list.csv remains the hand-off format for setup.py: when the CSV is newer than the last
+    import it is imported again, and export_csv() writes the current state back out in the same format.
+
+    The store is shared by all uvicorn workers on the host. Webhook idempotency keys and the applied SSID
+    configuration are kept in a separate database (<db>-shared) attached to the same connection, so their
+    frequent writes by other workers do not change the device table's data_version.
+
+    Statements run on the event loop of the worker, so once the store is open a write waits at most
+    `busy_timeout` seconds (STATE_DB_BUSY_TIMEOUT) for another worker's write lock before it fails with
+    sqlite3.OperationalError, instead of stalling every webhook of the process. Opening the store (the CSV
+    import of one of several starting workers) may wait up to 30s.
+    """
+
+    shared = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS devices (
+            serial TEXT PRIMARY KEY,
+            model TEXT NOT NULL DEFAULT '',
+            switch_port_connected TEXT NOT NULL DEFAULT 'False',
+            system_name TEXT NOT NULL DEFAULT 'N/A',
+            updated_at REAL NOT NULL DEFAULT (julianday('now'))
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+    SHARED_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS shared.seen_events (
+            key TEXT PRIMARY KEY,
+            expires REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS shared.ssid_state (
+            network_id TEXT NOT NULL,
+            ssid_number TEXT NOT NULL,
+            state TEXT NOT NULL,
+            PRIMARY KEY (network_id, ssid_number)
+        );
+    """
+    PRUNE_EVERY = 1000     # claims between deletions of expired keys
+
+    def __init__(self, db_path=None, csv_file_path=None, busy_timeout=None):
+        self.db_path = db_path or config.STATE_DB
+        self.csv_file_path = csv_file_path or config.CSV_DB
+        self._lock = Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.execute("ATTACH DATABASE ? AS shared", (f"{self.db_path}-shared",))
+        self._conn.execute("PRAGMA shared.journal_mode=WAL")
+        self._conn.execute("PRAGMA shared.synchronous=NORMAL")
+        self._conn.executescript(self.SHARED_SCHEMA)
+        self._claims = 0
+        self._data_version = None
+        self._csv_imported = None
+        self._sync_from_csv()
+        busy_timeout = config.STATE_DB_BUSY_TIMEOUT if busy_timeout is None else busy_timeout
+        self._conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+
+    @staticmethod
+    def _to_row(serial, model, switch_port_connected, system_name):
+        return {"Serial Number": serial, "Model": model,
+                "switch_port_connected": switch_port_connected, "SystemName": system_name}
+
+    @staticmethod
+    def _to_params(row):
+        return (row["Serial Number"], row.get("Model") or "",
+                str(row.get("switch_port_connected", False)), row.get("SystemName") or "N/A")
+
+    def _csv_mtime(self):
+        try:
+            return str(os.stat(self.csv_file_path).st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+    def _sync_from_csv(self):
+        """
+        Import the device CSV if it changed since the last import (e.g. setup.py was run). The check and
+        the import run in one write transaction, so only one of several starting workers imports it.
+        """
+        csv_mtime = self._csv_mtime()
+        if csv_mtime is None or csv_mtime == self._csv_imported:
+            return False
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                imported = self._conn.execute("SELECT value FROM meta WHERE key = 'csv_mtime'").fetchone()
+                if imported and imported[0] == csv_mtime:
+                    self._conn.execute("COMMIT")
+                    self._csv_imported = csv_mtime
+                    return False
+                rows, _ = read_csv_data(self.csv_file_path)
+                self._replace_rows(rows)
+                self._conn.execute("INSERT INTO meta(key, value) VALUES ('csv_mtime', ?) "
+                                   "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (csv_mtime,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._csv_imported = csv_mtime
+        lm.tsp(f"Imported {len(rows)} device(s) from {self.csv_file_path} into {self.db_path}")
+        return True
+
+    def _current_data_version(self):
+        with self._lock:
+            return self._conn.execute("PRAGMA main.data_version").fetchone()[0]
+
+    def changed(self):
+        # data_version only moves when another connection commits; our own writes leave it unchanged
+        try:
+            imported = self._sync_from_csv()
+        except sqlite3.OperationalError as e:   # e.g. another worker is importing it; retried at the next check
+            lm.tsp(f"[orange1]Device CSV not imported yet: {e}[/orange1]")
+            imported = False
+        return imported or self._current_data_version() != self._data_version
+
+    def load(self):
+        with self._lock:
+            self._data_version = self._conn.execute("PRAGMA main.data_version").fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT serial, model, switch_port_connected, system_name FROM devices").fetchall()
+        return {serial: self._to_row(serial, *rest) for serial, *rest in rows}
+
+    def get(self, device_serial):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT serial, model, switch_port_connected, system_name FROM devices WHERE serial = ?",
+                (device_serial,)).fetchone()
+        return self._to_row(*row) if row else None
+
+    def upsert(self, row):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO devices(serial, model, switch_port_connected, system_name) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(serial) DO UPDATE SET switch_port_connected = excluded.switch_port_connected, "
+                "system_name = excluded.system_name, updated_at = julianday('now')",
+                self._to_params(row))
+
+    def _replace_rows(self, rows):
+        self._conn.execute("DELETE FROM devices")
+        self._conn.executemany(
+            "INSERT INTO devices(serial, model, switch_port_connected, system_name) VALUES (?, ?, ?, ?)",
+            [self._to_params(row) for row in rows])
+
+    def replace_all(self, rows):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._replace_rows(rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def add_devices(self, rows):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.executemany(
+                    "INSERT INTO devices(serial, model, switch_port_connected, system_name) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(serial) DO NOTHING",
+                    [self._to_params(row) for row in rows])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return cursor.rowcount
+
+    def modified(self, device_serial):
+        with self._lock:
+            row = self._conn.execute("SELECT (updated_at - 2440587.5) * 86400.0 FROM devices WHERE serial = ?",
+                                     (device_serial,)).fetchone()
+        return row[0] if row else None
+
+    def claim_event(self, key, ttl):
+        now = time.time()
+        with self._lock:
+            self._claims += 1
+            if self._claims % self.PRUNE_EVERY == 0:
+                self._conn.execute("DELETE FROM shared.seen_events WHERE expires <= ?", (now,))
+            # Inserts a new key or takes over an expired one; a live key is left alone (rowcount 0)
+            cursor = self._conn.execute(
+                "INSERT INTO shared.seen_events(key, expires) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET expires = excluded.expires WHERE seen_events.expires <= ?",
+                (key, now + ttl, now))
+            return cursor.rowcount == 1
+
+    def release_event(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM shared.seen_events WHERE key = ?", (key,))
+
+    def get_ssid_state(self, network_id, ssid_number):
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM shared.ssid_state WHERE network_id = ? AND ssid_number = ?",
+                                     (network_id, str(ssid_number))).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_ssid_state(self, network_id, ssid_number, state):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO shared.ssid_state(network_id, ssid_number, state) VALUES (?, ?, ?) "
+                "ON CONFLICT(network_id, ssid_number) DO UPDATE SET state = excluded.state",
+                (network_id, str(ssid_number), json.dumps(state)))
+
+    def delete_ssid_state(self, network_id, ssid_number):
+        with self._lock:
+            self._conn.execute("DELETE FROM shared.ssid_state WHERE network_id = ? AND ssid_number = ?",
+                               (network_id, str(ssid_number)))
+
+    def import_csv(self, csv_file_path):
+        """Replace the device table with the contents of a ms_120_device_list.csv style file."""
+        rows, _ = read_csv_data(csv_file_path)
+        self.replace_all(rows)
+        lm.tsp(f"Imported {len(rows)} device(s) from {csv_file_path} into {self.db_path}")
+
+    def export_csv(self, csv_file_path):
+        """Write the device table out in the ms_120_device_list.csv format."""
+        rows = sorted(self.load().values(), key=lambda row: row["Serial Number"])
+        write_to_csv(csv_file_path, rows, DEVICE_FIELDNAMES)
+        lm.tsp(f"Exported {len(rows)} device(s) from {self.db_path} to {csv_file_path}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_state_store():
+    """
+    Build the state backend selected by config.STATE_BACKEND ('csv' or 'sqlite').
+    """
+    if config.STATE_BACKEND == 'sqlite':
+        return SqliteStateStore()
+    return CsvStateStore()
+
+
+if __name__ == "__main__":
+    # python state_store.py import|export [csv_path]
+    if len(sys.argv) < 2 or sys.argv[1] not in ('import', 'export'):
+        print("Usage: python state_store.py import|export [csv_path]")
+        sys.exit(1)
+    store = SqliteStateStore(busy_timeout=30)
+    path = sys.argv[2] if len(sys.argv) > 2 else config.CSV_DB
+    if sys.argv[1] == 'import':
+        store.import_csv(path)
+    else:
+        store.export_csv(path)
+    store.close()
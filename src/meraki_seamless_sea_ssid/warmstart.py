@@ -0,0 +1,117 @@
+import fcntl
+import marshal
+import os
+import sys
+import time
+import zlib
+from logrr import lm
+
+_MAGIC = b"SEAWARM1"
+
+
+class CacheSnapshot:
+    """
+    Binary snapshot of the in-memory caches, written on shutdown and loaded at the next start so the app
+    serves from warm caches while they are refreshed against the store and the Dashboard in the background:
+
+        registry    device rows of the CSV state store (None with a shared store)
+        boats       boats.csv index
+        ssid        SSID desired-state cache (None with a shared store)
+        inventory   org-wide switch inventory
+
+    LLDP entries are not saved: they only live for LLDP_CACHE_TTL seconds, less than a restart takes.
+
+    The file is `_MAGIC` followed by the zlib-compressed marshal dump of {"saved_at", "python", "caches"}.
+    marshal only loads plain data, but its format may change between Python versions, so a snapshot written
+    by another version is ignored, as is one older than `max_age` seconds. The registry and the boat index
+    are only taken if their CSV file has not changed since the snapshot.
+
+    Worker processes sharing the state store hold the same caches, so only one of them writes the
+    snapshot: the first to save takes a lock (`<path>.lock`) it keeps until it exits, the others skip.
+    """
+
+    REQUIRED = ("registry", "boats", "ssid")    # Caches that must be restored for a warm start
+
+    def __init__(self, path, max_age=86400.0):
+        self.path = path
+        self.max_age = max_age
+        self._writer_fd = None
+
+    def _is_writer(self):
+        """Only one process writes the snapshot; the lock is released when the process exits."""
+        if self._writer_fd is not None:
+            return True
+        fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (BlockingIOError, PermissionError):
+            os.close(fd)
+            return False
+        self._writer_fd = fd
+        return True
+
+    def save(self, meraki_ops):
+        """
+        Write the caches of meraki_ops atomically (blocking). Returns the size written, or None if another
+        worker process writes the snapshot.
+        """
+        if not self._is_writer():
+            return None
+        caches = {
+            "registry": meraki_ops.registry.snapshot(),
+            "boats": meraki_ops.boats.snapshot(),
+            "ssid": meraki_ops.ssid_cache.snapshot(),
+            "inventory": meraki_ops.inventory.snapshot(),
+        }
+        data = _MAGIC + zlib.compress(marshal.dumps({"saved_at": time.time(), "python": sys.version_info[:2],
+                                                     "caches": caches}))
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        return len(data)
+
+    def read(self):
+        """Return the decoded snapshot, or None if there is none or it cannot be used."""
+        try:
+            with open(self.path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return None
+        try:
+            if not data.startswith(_MAGIC):
+                raise ValueError("not a cache snapshot")
+            snapshot = marshal.loads(zlib.decompress(data[len(_MAGIC):]))
+        except (ValueError, EOFError, TypeError, zlib.error) as e:
+            lm.tsp(f"[red]Ignoring cache snapshot {self.path}: {e}[/red]")
+            return None
+        if tuple(snapshot["python"]) != sys.version_info[:2]:
+            lm.lnp(f"Ignoring cache snapshot {self.path} written by Python {snapshot['python']}")
+            return None
+        if time.time() - snapshot["saved_at"] > self.max_age:
+            lm.lnp(f"Ignoring cache snapshot {self.path}: older than {self.max_age:.0f}s")
+            return None
+        return snapshot
+
+    def load(self, meraki_ops):
+        """
+        Restore the caches of meraki_ops from the snapshot. Returns True if the caches are warm: every cache
+        of REQUIRED was restored or is kept by a shared store.
+        """
+        snapshot = self.read()
+        if snapshot is None:
+            return False
+        caches = snapshot["caches"]
+        age = max(0.0, time.time() - snapshot["saved_at"])
+        shared = meraki_ops.registry.store.shared     # The shared store holds the rows and SSID state itself
+        restored = {
+            "registry": shared or caches["registry"] is not None and meraki_ops.registry.restore(caches["registry"]),
+            "boats": caches["boats"] is not None and meraki_ops.boats.restore(caches["boats"]),
+            "ssid": shared or caches["ssid"] is not None and meraki_ops.ssid_cache.restore(caches["ssid"]),
+            "inventory": caches["inventory"] is not None and meraki_ops.inventory.restore(caches["inventory"],
+                                                                                        age=age),
+        }
+        lm.lnp(f"Cache snapshot {self.path} from {age:.0f}s ago restored: {restored}")
+        return all(restored[name] for name in self.REQUIRED)
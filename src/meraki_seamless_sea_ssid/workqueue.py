@@ -0,0 +1,67 @@
+import asyncio
+from logrr import lm
+
+
+class QueueFullError(Exception):
+    """Raised by WebhookQueue.submit when the queue is at capacity."""
+
+
+class WebhookQueue:
+    """
+    Bounded asyncio queue drained by a fixed pool of worker tasks.
+
+    The webhook route submits payloads and returns immediately; the workers run the handler
+    (MerakiOps.handle_webhook) in the background. submit() never waits: a full queue raises
+    QueueFullError so the route can answer 429 and let Meraki retry later.
+    """
+
+    def __init__(self, handler, maxsize=1000, workers=4):
+        self.handler = handler
+        self.maxsize = maxsize
+        self.num_workers = workers
+        self.queue = None
+        self._workers = []
+
+    async def start(self):
+        """Create the queue and spawn the workers on the running event loop."""
+        self.queue = asyncio.Queue(maxsize=self.maxsize)
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.num_workers)]
+
+    def submit(self, data):
+        """
+        Enqueue a webhook payload without blocking.
+
+        :raises QueueFullError: if the queue is at capacity.
+        """
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Webhook queue is full ({self.maxsize} events)")
+
+    def qsize(self):
+        return self.queue.qsize() if self.queue else 0
+
+    async def stop(self, timeout=30.0):
+        """
+        Gracefully drain the queue, waiting at most `timeout` seconds, then stop the workers.
+        """
+        if self.queue is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            lm.tsp(f"[red]Webhook queue drain timed out, dropping {self.queue.qsize()} queued event(s)[/red]")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self, worker_id):
+        while True:
+            data = await self.queue.get()
+            try:
+                await self.handler(data)
+            except Exception as e:
+                lm.tsp(f"[red]Worker {worker_id} failed to process webhook: {e}[/red]")
+            finally:
+                self.queue.task_done()
@@ -0,0 +1,127 @@
+import os
+import pathlib
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+MODULE_DIR = pathlib.Path(__file__).parents[1] / "src" / "meraki_seamless_sea_ssid"
+sys.path.insert(0, str(MODULE_DIR))
+
+# The app modules read their settings at import time; keep them away from the real Dashboard and data files.
+# Paths are pointed at a fresh directory per test by the `workdir` fixture.
+_SESSION_DIR = pathlib.Path(tempfile.mkdtemp(prefix="sea-ssid-tests-"))
+for name, value in {
+    "MERAKI_API_KEY": "test-key",
+    "MERAKI_BASE_URL": "http://127.0.0.1:1/api/v1",
+    "MERAKI_NETWORK_ID": "N_mock",
+    "MERAKI_ORG_ID": "mock-org",
+    "PSK": "test-psk",
+    "MERAKI_SSID_NAME": "Boat",
+    "MERAKI_BACKEND": "async",
+    "INTERACTIVE": "false",
+    "LOGGER_LEVEL": "WARNING",
+    "LOG_PRETTY_PAYLOADS": "false",
+    "EVENT_LOG_PATH": str(_SESSION_DIR / "events.jsonl"),
+    "JOURNAL_PATH": str(_SESSION_DIR / "journal.jsonl"),
+}.items():
+    os.environ[name] = value
+
+from config import config   # noqa: E402
+from mock_dashboard import MockDashboard, create_mock_app   # noqa: E402
+import ratelimit    # noqa: E402
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _session_dir():
+    # logrr writes logs/app.log relative to the working directory
+    cwd = os.getcwd()
+    os.chdir(_SESSION_DIR)
+    yield
+    os.chdir(cwd)
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Point every data file of the app at tmp_path, with an empty device list and boat table."""
+    (tmp_path / "ms_120_device_list.csv").write_text("Serial Number,Model,switch_port_connected,SystemName\n")
+    (tmp_path / "boats.csv").write_text("SystemName,ssid_number,vlan\n")
+    for name, file_name in {
+        "CSV_DB": "ms_120_device_list.csv",
+        "BOATS_CSV": "boats.csv",
+        "STATE_DB": "state.db",
+        "JOURNAL_PATH": "journal.jsonl",
+        "WARM_START_PATH": "cache.snapshot",
+        "PENDING_ACTIONS_PATH": "pending_actions.json",
+    }.items():
+        monkeypatch.setattr(config, name, str(tmp_path / file_name))
+    monkeypatch.setattr(config, "EVENT_LOG_ENABLED", False)
+    monkeypatch.setattr(config, "JOURNAL_ENABLED", False)
+    monkeypatch.setattr(config, "PORT_COALESCE_WINDOW", 0.0)
+    monkeypatch.setattr(config, "RECONCILE_INTERVAL", 0.0)
+    monkeypatch.setattr(config, "INVENTORY_REFRESH_INTERVAL", 0.0)
+    # Rate limiters hold tasks of the event loop they were first used on; every test runs its own loop
+    monkeypatch.setattr(ratelimit, "_limiters", {})
+    return tmp_path
+
+
+def write_csv(path, header, rows):
+    lines = [",".join(header)] + [",".join(str(value) for value in row) for row in rows]
+    pathlib.Path(path).write_text("\n".join(lines) + "\n")
+
+
+@pytest.fixture
+def devices(workdir):
+    """write(rows) replaces the device list with (serial, switch_port_connected, SystemName) rows."""
+    def write(rows):
+        write_csv(workdir / "ms_120_device_list.csv", ["Serial Number", "Model", "switch_port_connected", "SystemName"],
+                  [(serial, "MS120-8", connected, system_name) for serial, connected, system_name in rows])
+    return write
+
+
+@pytest.fixture
+def boats(workdir):
+    """write(rows) replaces boats.csv with (SystemName, ssid_number, vlan[, network_id]) rows."""
+    def write(rows, network_column=False):
+        header = ["SystemName", "ssid_number", "vlan"] + (["network_id"] if network_column else [])
+        write_csv(workdir / "boats.csv", header, rows)
+    return write
+
+
+class _MockServer:
+    """The mock Dashboard app served by uvicorn on a background thread."""
+
+    def __init__(self, mock):
+        import uvicorn
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{self.sock.getsockname()[1]}/api/v1"
+        self.server = uvicorn.Server(uvicorn.Config(create_mock_app(mock), log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, kwargs={"sockets": [self.sock]}, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Mock Dashboard did not start")
+            time.sleep(0.01)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+@pytest.fixture
+def dashboard(monkeypatch):
+    """A mock Dashboard with 4 switches of 4 ports, served on localhost, that the app is configured to use."""
+    mock = MockDashboard(switches=4, ports=4, latency=0.0, jitter=0.0, seed=1)
+    server = _MockServer(mock)
+    server.start()
+    monkeypatch.setattr(config, "MERAKI_BASE_URL", server.url)
+    mock.url = server.url
+    yield mock
+    server.stop()
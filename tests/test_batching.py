@@ -0,0 +1,59 @@
+import asyncio
+
+from batching import SsidBatcher, is_rejection, ssid_action_body
+from breaker import is_retryable
+from config import config
+from meraki_funcs import AsyncMerakiOps
+from mock_dashboard import MOCK_NETWORK_ID
+
+ENABLE = {"name": "Boat", "enabled": True, "authMode": "psk", "encryptionMode": "wpa", "psk": "test-psk",
+          "useVlanTagging": True, "defaultVlanId": 103}
+
+
+async def with_ops(scenario):
+    ops = AsyncMerakiOps()
+    await ops.open()
+    try:
+        return await scenario(ops)
+    finally:
+        await ops.close()
+
+
+def test_batcher_collapses_changes_of_one_ssid():
+    submitted = []
+
+    async def submit(items):
+        submitted.append(items)
+        return [None] * len(items)
+
+    async def scenario():
+        batcher = SsidBatcher(submit, window=0.01)
+        await asyncio.gather(batcher.add("N_1", 3, {"enabled": True}), batcher.add("N_1", "3", {"enabled": False}),
+                             batcher.add("N_1", 4, {"enabled": True}))
+
+    asyncio.run(scenario())
+    assert submitted == [[("N_1", "3", {"enabled": False}), ("N_1", 4, {"enabled": True})]]
+
+
+def test_action_body_has_only_api_fields():
+    assert ssid_action_body({"name": "Boat", "enabled": False, "authMode": "open", "vlan": None}) == \
+        {"name": "Boat", "enabled": False, "authMode": "open"}
+    assert ssid_action_body({"enabled": True, "vlan": "103"}) == \
+        {"enabled": True, "useVlanTagging": True, "defaultVlanId": 103}
+
+
+def test_rejected_batch_is_retried_item_by_item(dashboard):
+    items = [(MOCK_NETWORK_ID, 3, ENABLE), (MOCK_NETWORK_ID, 4, {**ENABLE, "defaultVlanId": 5000})]
+    results = asyncio.run(with_ops(lambda ops: ops._apply_ssid_updates(items)))
+    assert results[0] is None and getattr(results[1], "status", None) == 400
+    assert dashboard.ssids[(MOCK_NETWORK_ID, "3")]["defaultVlanId"] == 103
+    assert dashboard.calls["createOrganizationActionBatch"] == 1 and dashboard.calls["updateNetworkWirelessSsid"] == 2
+
+
+def test_batch_failed_by_outage_is_not_split(dashboard, monkeypatch):
+    monkeypatch.setattr(config, "MERAKI_MAX_RETRIES", 0)
+    dashboard.outage = "error"
+    items = [(MOCK_NETWORK_ID, 3, ENABLE), (MOCK_NETWORK_ID, 4, {**ENABLE, "defaultVlanId": 104})]
+    results = asyncio.run(with_ops(lambda ops: ops._apply_ssid_updates(items)))
+    assert len(results) == 2 and all(is_retryable(error) and not is_rejection(error) for error in results)
+    assert "updateNetworkWirelessSsid" not in dashboard.calls
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, is_outage, is_retryable
+
+
+class StatusError(Exception):
+    def __init__(self, status):
+        super().__init__(f"status {status}")
+        self.status = status
+
+
+def test_outage_classification():
+    assert is_outage(asyncio.TimeoutError()) and is_outage(ConnectionResetError())
+    assert is_outage(StatusError(None)) and is_outage(StatusError(503))
+    assert not is_outage(StatusError(429)) and not is_outage(StatusError(400)) and not is_outage(ValueError())
+    assert is_retryable(StatusError(429)) and is_retryable(CircuitOpenError(1.0))
+    assert not is_retryable(StatusError(400))
+
+
+def test_opens_after_consecutive_outages_and_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.before_call()
+    breaker.record_failure(StatusError(503))
+    breaker.record_failure(StatusError(400))     # An answer resets the count
+    breaker.record_failure(StatusError(503))
+    assert breaker.state == CLOSED
+    breaker.record_failure(asyncio.TimeoutError())
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.rejected == 1
+
+
+def test_single_probe_closes_breaker():
+    closed = []
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.on_close(lambda: closed.append(True))
+    breaker.record_failure(StatusError(503))
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()   # Only one probe at a time
+    breaker.record_success()
+    assert breaker.state == CLOSED and closed == [True]
+
+
+def test_failed_probe_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0)
+    for _ in range(3):
+        breaker.record_failure(StatusError(503))
+    breaker.before_call()
+    breaker.record_failure(StatusError(503))
+    assert breaker.state == OPEN and breaker.opened == 2
@@ -0,0 +1,96 @@
+import asyncio
+
+from lldp_cache import LldpCache
+from idempotency import IdempotencyWindow, webhook_key
+from alerts import PortAlert
+from ssid_cache import SsidStateCache
+
+
+def lldp_response(**ports):
+    return {"ports": {port.lstrip("p"): {"lldp": {"systemName": name}} for port, name in ports.items()}}
+
+
+def test_lldp_cache_shares_fetch_between_ports():
+    async def scenario():
+        fetches = []
+
+        async def fetch(serial):
+            fetches.append(serial)
+            await asyncio.sleep(0.01)
+            return lldp_response(p1="BOAT-1", p2="BOAT-2")
+
+        cache = LldpCache(fetch, ttl=60)
+        cache.prefetch("Q1")
+        names = await asyncio.gather(cache.get_system_name("Q1", 1), cache.get_system_name("Q1", 2))
+        names.append(await cache.get_system_name("Q1", 2))
+        return fetches, names, cache.hits
+
+    fetches, names, hits = asyncio.run(scenario())
+    assert fetches == ["Q1"]
+    assert names == ["BOAT-1", "BOAT-2", "BOAT-2"] and hits == 1
+
+
+def test_lldp_cache_refetches_unknown_port():
+    async def scenario():
+        responses = [lldp_response(p1="BOAT-1"), lldp_response(p1="BOAT-1", p2="BOAT-2")]
+
+        async def fetch(serial):
+            return responses.pop(0)
+
+        cache = LldpCache(fetch, ttl=60)
+        await cache.get_system_name("Q1", 1)
+        return await cache.get_system_name("Q1", 2)     # Plugged in after the first fetch
+
+    assert asyncio.run(scenario()) == "BOAT-2"
+
+
+def test_lldp_cache_forgets_invalidated_port():
+    async def scenario():
+        responses = [lldp_response(p1="BOAT-1", p2="BOAT-2"), lldp_response(p1="BOAT-1", p2="BOAT-2"),
+                     lldp_response(p1="BOAT-1", p2="BOAT-3")]
+
+        async def fetch(serial):
+            await asyncio.sleep(0.01)
+            return responses.pop(0)
+
+        cache = LldpCache(fetch, ttl=60)
+        await cache.get_system_name("Q1", 1)
+        cache.invalidate("Q1", 2)      # BOAT-2 left the port within the TTL
+        cache.prefetch("Q1", 2)
+        await asyncio.sleep(0)
+        cache.invalidate("Q1", 2)      # BOAT-3 docked while that fetch was in flight
+        return await cache.get_system_name("Q1", 2), await cache.get_system_name("Q1", 1), cache.fetches
+
+    assert asyncio.run(scenario()) == ("BOAT-3", "BOAT-1", 3)
+
+
+def test_idempotency_window_drops_redelivery():
+    alert = PortAlert("Q1", "port_connected", port_number=1, alert_id="1", occurred_at="t")
+    window = IdempotencyWindow(ttl=60, max_size=10)
+    key = webhook_key(alert)
+    assert not window.is_duplicate(key)
+    assert window.is_duplicate(key)
+    window.forget(key)
+    assert not window.is_duplicate(key)
+    assert webhook_key(PortAlert("Q1", "port_connected", port_number=1)) is None
+
+
+def test_idempotency_window_is_bounded():
+    window = IdempotencyWindow(ttl=60, max_size=2)
+    for key in ("a", "b", "c"):
+        window.is_duplicate(key)
+    assert len(window) == 2 and not window.is_duplicate("a")
+
+
+def test_ssid_cache_compares_only_reported_fields():
+    cache = SsidStateCache()
+    enable = {"name": "Boat", "enabled": True, "authMode": "psk", "encryptionMode": "wpa", "psk": "secret",
+              "useVlanTagging": True, "defaultVlanId": 103}
+    cache.seed("N_1", [{"number": 3, "name": "Boat", "enabled": True, "authMode": "psk",
+                        "useVlanTagging": True, "defaultVlanId": 103}])
+    assert cache.matches("N_1", 3, enable)
+    assert not cache.matches("N_1", 3, {**enable, "defaultVlanId": 104})
+    cache.record("N_1", 3, {"name": "Boat", "enabled": False, "authMode": "open"})
+    assert "psk" not in cache.get("N_1", 3) and cache.matches("N_1", "3", {"name": "Boat", "enabled": False,
+                                                                            "authMode": "open"})
+    assert cache.stats()["hits"] == 2
@@ -0,0 +1,115 @@
+import asyncio
+import subprocess
+import sys
+
+import pytest
+
+from dispatcher import PortDispatcher
+from portlock import PortLocks
+from workqueue import QueueFullError, WebhookQueue
+
+
+def test_burst_for_one_port_runs_latest_event():
+    async def scenario():
+        dispatcher = PortDispatcher(coalesce_window=0.01)
+        runs = []
+
+        def event(state):
+            async def run():
+                runs.append(state)
+                return state
+            return run
+
+        results = await asyncio.gather(*(dispatcher.dispatch(("Q1", 1), event(state))
+                                         for state in ("connected", "disconnected", "connected")))
+        return results, runs, dispatcher.in_flight()
+
+    results, runs, in_flight = asyncio.run(scenario())
+    assert results == ["connected"] * 3 and runs == ["connected"] and in_flight == 0
+
+
+def test_cancelled_runner_releases_every_caller():
+    async def scenario():
+        dispatcher = PortDispatcher()
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(60)
+
+        running = asyncio.ensure_future(dispatcher.dispatch(("Q1", 1), slow))
+        await started.wait()
+        queued = asyncio.ensure_future(dispatcher.dispatch(("Q1", 1), slow))
+        await asyncio.sleep(0)
+        dispatcher._runners[("Q1", 1)].cancel()     # e.g. the event loop shutting down
+        outcomes = await asyncio.wait_for(asyncio.gather(running, queued, return_exceptions=True), 1)
+        return outcomes, dispatcher.in_flight()
+
+    outcomes, in_flight = asyncio.run(scenario())
+    assert all(isinstance(outcome, asyncio.CancelledError) for outcome in outcomes) and in_flight == 0
+
+
+def test_failed_event_is_raised_to_its_callers():
+    async def fail():
+        raise ValueError("rejected")
+
+    with pytest.raises(ValueError):
+        asyncio.run(PortDispatcher().dispatch(("Q1", 1), fail))
+
+
+def test_full_queue_rejects_and_stop_drains():
+    async def scenario():
+        handled = []
+        release = asyncio.Event()
+
+        async def handler(data):
+            await release.wait()
+            handled.append(data)
+
+        queue = WebhookQueue(handler, maxsize=1, workers=1)
+        await queue.start()
+        queue.submit(1)
+        await asyncio.sleep(0)      # The worker takes the first event
+        queue.submit(2)
+        with pytest.raises(QueueFullError):
+            queue.submit(3)
+        release.set()
+        await queue.stop(timeout=1)
+        return handled
+
+    assert asyncio.run(scenario()) == [1, 2]
+
+
+def test_port_lock_waits_for_another_process(workdir):
+    path = str(workdir / "state.db-locks")
+    locks = PortLocks(path, slots=16)
+    slot = locks._slot(("Q1", "1"))
+    holder = subprocess.Popen(
+        [sys.executable, "-c", "import fcntl, os, sys, time; fd = os.open(sys.argv[1], os.O_RDWR); "
+                               "fcntl.lockf(fd, fcntl.LOCK_EX, 1, int(sys.argv[2])); print(flush=True); "
+                               "sys.stdin.readline()", path, str(slot)],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    other = next(("Q2", str(port)) for port in range(1, 100) if locks._slot(("Q2", str(port))) != slot)
+
+    async def scenario():
+        async def other_port():
+            async with locks.hold(other):
+                return "other"
+
+        held = asyncio.ensure_future(locks.hold(("Q1", "1")).__aenter__())
+        assert await asyncio.wait_for(other_port(), 1) == "other"    # Other slots are not blocked
+        await asyncio.sleep(0.05)
+        assert not held.done()
+        holder.stdin.write(b"\n")
+        holder.stdin.flush()
+        await asyncio.wait_for(held, 2)
+
+    try:
+        holder.stdout.readline()
+        asyncio.run(scenario())
+        assert locks.contended == 1
+    finally:
+        holder.kill()
+        holder.wait()
+        locks.close()
@@ -0,0 +1,40 @@
+import json
+
+from events import WebhookEvent, percentile, summarize
+from metrics import MetricsRegistry
+
+
+def test_event_record_has_stage_timings():
+    event = WebhookEvent()
+    event.serial, event.alert_type = "Q1", "port_connected"
+    with event.stage("parse"):
+        pass
+    event.executed = True
+    event.result = "enabled"
+    record = event.to_dict()
+    assert set(record["stages_ms"]) == {"parse"} and record["total_ms"] >= record["stages_ms"]["parse"]
+    assert record["result"] == "enabled" and not record["coalesced"]
+
+
+def test_summarize_event_log(tmp_path):
+    path = tmp_path / "events.jsonl"
+    path.write_text("".join(json.dumps({"stages_ms": {"parse": ms}, "total_ms": ms * 2}) + "\n"
+                            for ms in range(1, 101)))
+    summary = summarize(str(path))
+    assert summary["parse"] == {"count": 100, "p50": 50, "p95": 95, "p99": 99}
+    assert summary["total"]["p99"] == 198
+    assert percentile([], 50) == 0.0
+
+
+def test_metrics_exposition_format():
+    registry = MetricsRegistry()
+    calls = registry.counter("calls_total", "Calls.", ("operation",))
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    registry.callback("broken", "Fails at scrape time.", "gauge", lambda: 1 / 0)
+    calls.inc(operation='say "hi"')
+    latency.observe(0.5)
+    text = registry.render()
+    assert 'calls_total{operation="say \\"hi\\""} 1' in text
+    assert 'latency_seconds_bucket{le="0.1"} 0' in text and 'latency_seconds_bucket{le="1.0"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 1' in text and "latency_seconds_sum 0.5" in text
+    assert "# broken unavailable" in text
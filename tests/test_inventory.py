@@ -0,0 +1,157 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from config import config
+from discovery import FleetDiscovery
+from inventory import SwitchInventory, model_family, model_query
+from meraki_funcs import AsyncMerakiOps, MerakiOps
+from mock_dashboard import MOCK_NETWORK_ID, MOCK_ORG_ID, synthetic_boat, synthetic_serial
+from reconciler import Reconciler
+from state_store import CsvStateStore
+
+SERIALS = [synthetic_serial(index) for index in range(4)]
+
+
+async def with_ops(scenario, backend=AsyncMerakiOps):
+    ops = backend()
+    await ops.open()
+    try:
+        return await scenario(ops)
+    finally:
+        await ops.close()
+
+
+def test_model_query_and_family():
+    assert model_query(["MS120-8", "MS120-24"]) == {"models": ["MS120-8", "MS120-24"]}
+    assert model_query(["MS120*"]) == {"model": "MS120"}
+    assert model_query(["MS1*", "MS2*"]) == {}
+    assert model_family("ms120-8fp") == "MS120"
+
+
+@pytest.mark.parametrize("backend", [AsyncMerakiOps, MerakiOps])
+def test_port_endpoints_follow_link_headers(dashboard, monkeypatch, backend):
+    monkeypatch.setattr(config, "RECONCILE_PER_PAGE", 3)
+    dashboard.docked = {(1, 2)}
+
+    async def scenario(ops):
+        return await ops.get_meraki_switch_port_status(MOCK_NETWORK_ID), \
+            await ops.get_meraki_switch_lldp(MOCK_NETWORK_ID)
+
+    statuses, lldp = asyncio.run(with_ops(scenario, backend))
+    assert sorted(statuses) == SERIALS
+    assert lldp[SERIALS[1]] == {"2": synthetic_boat(1, 2)}
+    assert dashboard.calls["getOrganizationSwitchPortsStatusesBySwitch"] == 2    # Two pages of 3 and 1
+
+
+def test_every_page_takes_a_token_and_a_429_repeats_only_that_page(dashboard, monkeypatch):
+    monkeypatch.setattr(config, "RECONCILE_PER_PAGE", 1)
+    dashboard.retry_after = 0
+    simulate, requests = dashboard.simulate, []
+
+    async def rate_limit_third_page(operation):
+        requests.append(operation)
+        if len(requests) == 3:
+            return dashboard._too_many_requests()
+        return await simulate(operation)
+
+    dashboard.simulate = rate_limit_third_page
+
+    async def scenario(ops):
+        return await ops.get_meraki_switch_port_status(MOCK_NETWORK_ID), ops.rate_limiter.stats()
+
+    statuses, stats = asyncio.run(with_ops(scenario))
+    assert sorted(statuses) == SERIALS
+    assert len(requests) == 5   # Four pages of {"items", "meta"}, the third one twice
+    assert stats["calls"] == 5 and stats["retries"] == 1
+    assert not dashboard._cursors   # Expired with the last page
+
+
+def test_mock_rejects_cursors_it_did_not_issue(dashboard):
+    async def scenario():
+        async with aiohttp.ClientSession() as session:
+            url = f"{dashboard.url}/organizations/{MOCK_ORG_ID}/devices"
+            async with session.get(url, params={"perPage": 2}) as response:
+                next_url = response.links["next"]["url"]
+                assert f"startingAfter={SERIALS[1]}" not in str(next_url)
+            async with session.get(url, params={"perPage": 2, "startingAfter": SERIALS[1]}) as response:
+                return response.status
+
+    assert asyncio.run(scenario()) == 400
+
+
+def test_inventory_reads_every_page(dashboard):
+    async def scenario(ops):
+        inventory = SwitchInventory(ops, model_patterns=["MS120*"], per_page=3)
+        summary = await inventory.refresh()
+        return summary, inventory
+
+    summary, inventory = asyncio.run(with_ops(scenario))
+    assert summary == {"full": True, "switches": 4, "changed": 4}
+    assert [device["serial"] for device in inventory.switches(family="MS120")] == SERIALS
+    assert inventory.network_of(SERIALS[0]) == MOCK_NETWORK_ID
+    assert not dashboard._cursors and not dashboard._walks
+
+
+def test_inventory_filters_models_locally(dashboard):
+    async def scenario(ops):
+        inventory = SwitchInventory(ops, model_patterns=["MS390*"])
+        return await inventory.refresh()
+
+    assert asyncio.run(with_ops(scenario))["switches"] == 0
+
+
+def test_discovery_adds_switches_of_selected_networks(dashboard, devices):
+    devices([(SERIALS[0], True, "BOAT-A")])
+    dashboard.network_ids.append("N_mock-1")    # Odd switches move to a second network
+
+    async def scenario(ops):
+        discovery = FleetDiscovery(ops, CsvStateStore(), network_names=["Mock network 0"])
+        ops.bind_org(await discovery.select_org())
+        return await discovery.run(ops.org_id)
+
+    summary = asyncio.run(with_ops(scenario))
+    assert summary["networks"] == 1 and summary["switches"] == 2 and summary["added"] == 1
+    rows = CsvStateStore().load()
+    assert sorted(rows) == [SERIALS[0], SERIALS[2]]
+    assert rows[SERIALS[0]]["SystemName"] == "BOAT-A"   # Known switches keep their port state
+
+
+def test_reconciliation_sweep_sets_up_docked_boat(dashboard, devices, boats, monkeypatch):
+    monkeypatch.setattr(config, "RECONCILE_PER_PAGE", 3)
+    dashboard.docked = {(0, 1)}
+    devices([(serial, False, "N/A") for serial in SERIALS])
+    boats([(synthetic_boat(0, 1), 3, 103), (synthetic_boat(2, 1), 4, 104)])
+
+    async def scenario(ops):
+        summary = await Reconciler(ops, interval=0).sweep()
+        return summary, ops.registry.get(SERIALS[0])
+
+    summary, row = asyncio.run(with_ops(scenario))
+    assert summary["docked"] == 1 and summary["applied"] == 1
+    assert dashboard.ssids[(MOCK_NETWORK_ID, "3")]["enabled"] is True
+    assert (MOCK_NETWORK_ID, "4") not in dashboard.ssids
+    assert row["SystemName"] == synthetic_boat(0, 1)
+
+
+def test_sweep_keeps_boat_on_port_with_unknown_neighbour(dashboard, devices, boats):
+    dashboard.docked = {(0, 1)}
+    dashboard.ssids[(MOCK_NETWORK_ID, "3")] = {"number": 3, "name": "Boat", "enabled": True, "authMode": "psk"}
+    devices([(SERIALS[0], True, synthetic_boat(0, 1))])
+    boats([(synthetic_boat(0, 1), 3, 103)])
+    lldp_discovery = dashboard.lldp_discovery
+    dashboard.lldp_discovery = lambda network_ids: []     # LLDP not reported yet
+
+    async def scenario(ops):
+        reconciler = Reconciler(ops, interval=0)
+        first = await reconciler.sweep()
+        dashboard.lldp_discovery = lldp_discovery
+        dashboard.docked = set()    # Undocked once LLDP is known
+        return first, await reconciler.sweep()
+
+    first, second = asyncio.run(with_ops(scenario))
+    assert first["unresolved"] == 1 and first["applied"] == 0
+    assert second["unresolved"] == 0 and second["applied"] == 1
+    assert dashboard.calls["updateNetworkWirelessSsid"] == 1
+    assert dashboard.ssids[(MOCK_NETWORK_ID, "3")]["enabled"] is False
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from config import config
+from journal import EventJournal
+from loadtest import read_webhooks, webhook_payload
+from meraki_funcs import AsyncMerakiOps
+from mock_dashboard import synthetic_boat, synthetic_serial
+from state_store import CsvStateStore, SqliteStateStore
+
+SERIAL = synthetic_serial(0)
+
+
+def state_record(ts, connected=True, system_name="BOAT-A"):
+    return {"ts": ts, "type": "state", "serial": SERIAL, "switch_port_connected": connected,
+            "SystemName": system_name}
+
+
+def test_journal_is_off_by_default():
+    assert config.model_fields["JOURNAL_ENABLED"].default is False
+
+
+def test_group_commit_and_compaction(workdir):
+    async def scenario():
+        journal = EventJournal(str(workdir / "journal.jsonl"), backups=1)
+        await asyncio.gather(*(journal.commit(state_record(0, system_name=f"BOAT-{i}")) for i in range(10)))
+        fsyncs = journal.fsyncs
+        assert journal.compact()
+        journal.append({"type": "ssid", "network_id": "N_1", "ssid_number": "3", "payload": {"enabled": True},
+                        "result": "applied"})
+        await journal.close()
+        return fsyncs, journal.load()
+
+    fsyncs, state = asyncio.run(scenario())
+    assert fsyncs < 10     # Concurrent commits share an fsync
+    assert state["devices"][SERIAL]["SystemName"] == "BOAT-9" and state["ssids"] == {"N_1|3": {"enabled": True}}
+    assert os.path.exists(workdir / "journal.jsonl.1")
+
+
+@pytest.mark.parametrize("store", [CsvStateStore, SqliteStateStore])
+def test_replay_skips_rows_the_store_wrote_later(devices, monkeypatch, store):
+    monkeypatch.setattr(config, "JOURNAL_ENABLED", True)
+    monkeypatch.setattr(config, "STATE_BACKEND", "sqlite" if store is SqliteStateStore else "csv")
+    with open(config.JOURNAL_PATH, "w") as file:
+        file.write(json.dumps(state_record(time.time() - 60)) + "\n")
+    devices([(SERIAL, False, "N/A")])   # e.g. setup.py reset the device list after the journal was written
+
+    async def scenario(record=None):
+        ops = AsyncMerakiOps()
+        try:
+            if record is not None:
+                await ops.journal.commit(record)
+            await ops.restore_from_journal()
+            return ops.registry.get(SERIAL)
+        finally:
+            await ops.journal.close()
+            ops.registry.store.close()
+
+    row = asyncio.run(scenario())
+    assert str(row["switch_port_connected"]) == "False" and row["SystemName"] == "N/A"
+    # A crash after journaling a change but before the store was written: the change is restored
+    row = asyncio.run(scenario(state_record(time.time() + 60, system_name="BOAT-B")))
+    assert str(row["switch_port_connected"]) == "True" and row["SystemName"] == "BOAT-B"
+
+
+def test_duplicate_webhook_is_not_journaled(dashboard, devices, boats, monkeypatch):
+    monkeypatch.setattr(config, "JOURNAL_ENABLED", True)
+    devices([(SERIAL, False, "N/A")])
+    boats([(synthetic_boat(0, 1), 3, 103)])
+    payload = webhook_payload(SERIAL, 1, "port_connected")
+
+    async def scenario():
+        ops = AsyncMerakiOps()
+        await ops.open()
+        try:
+            await ops.handle_webhook(dict(payload))
+            await ops.handle_webhook(dict(payload))     # Re-delivery
+        finally:
+            await ops.close()
+
+    asyncio.run(scenario())
+    records = list(EventJournal.read_records(config.JOURNAL_PATH))
+    assert [record["payload"]["alertId"] for record in records if record["type"] == "webhook"] == [payload["alertId"]]
+    assert dashboard.calls["updateNetworkWirelessSsid"] == 1
+
+
+def test_replay_reads_journaled_and_recorded_webhooks(workdir):
+    payload = webhook_payload(SERIAL, 1, "port_connected")
+    journal, requests = workdir / "journal.jsonl", workdir / "requests.jsonl"
+    journal.write_text("".join(json.dumps(record) + "\n" for record in (
+        {"type": "webhook", "payload": payload}, state_record(0))) + '{"type": "webh')
+    requests.write_text(json.dumps({"body": json.dumps(payload)}) + "\n" + json.dumps(payload) + "\n[1]\n")
+    assert list(read_webhooks([str(journal), str(requests)])) == [payload] * 3
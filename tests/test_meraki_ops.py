@@ -0,0 +1,142 @@
+import asyncio
+
+from config import config
+from loadtest import webhook_payload
+from meraki_funcs import AsyncMerakiOps, MerakiOps, create_meraki_ops
+from mock_dashboard import MOCK_NETWORK_ID, synthetic_boat, synthetic_serial
+
+SERIAL = synthetic_serial(0)
+BOAT = synthetic_boat(0, 1)
+
+
+async def open_ops():
+    ops = AsyncMerakiOps()
+    await ops.open()
+    return ops
+
+
+def test_create_meraki_ops_selects_backend(monkeypatch):
+    monkeypatch.setattr(config, "MERAKI_BACKEND", "async")
+    assert isinstance(create_meraki_ops(), AsyncMerakiOps)
+    monkeypatch.setattr(config, "MERAKI_BACKEND", "sync")
+    assert isinstance(create_meraki_ops(), MerakiOps)
+
+
+def test_port_connected_enables_boat_ssid(dashboard, devices, boats):
+    devices([(SERIAL, False, "N/A")])
+    boats([(BOAT, 3, 103)])
+
+    async def scenario():
+        ops = await open_ops()
+        try:
+            session = ops.dashboard
+            await ops.handle_webhook(webhook_payload(SERIAL, 1, "port_connected"))
+            assert ops.dashboard is session     # One shared aio session for every webhook
+            return ops.registry.get(SERIAL)
+        finally:
+            await ops.close()
+
+    row = asyncio.run(scenario())
+    ssid = dashboard.ssids[(MOCK_NETWORK_ID, "3")]
+    assert ssid["enabled"] is True and ssid["authMode"] == "psk" and ssid["psk"] == config.PSK
+    assert str(row["switch_port_connected"]) == "True" and row["SystemName"] == BOAT
+
+
+def test_port_disconnected_disables_boat_ssid(dashboard, devices, boats):
+    devices([(SERIAL, True, BOAT)])
+    boats([(BOAT, 3, 103)])
+
+    async def scenario():
+        ops = await open_ops()
+        try:
+            await ops.handle_webhook(webhook_payload(SERIAL, 1, "port_disconnected"))
+            return ops.registry.get(SERIAL)
+        finally:
+            await ops.close()
+
+    row = asyncio.run(scenario())
+    assert dashboard.ssids[(MOCK_NETWORK_ID, "3")]["enabled"] is False
+    assert str(row["switch_port_connected"]) == "False" and row["SystemName"] == "N/A"
+    assert "getDeviceLldpCdp" not in dashboard.calls     # A disconnect needs no LLDP lookup
+
+
+def test_unregistered_serial_makes_no_dashboard_call(dashboard, devices, boats):
+    devices([(SERIAL, False, "N/A")])
+
+    async def scenario():
+        ops = await open_ops()
+        try:
+            await ops.handle_webhook(webhook_payload(synthetic_serial(3), 1, "port_connected"))
+        finally:
+            await ops.close()
+
+    asyncio.run(scenario())
+    assert dashboard.calls == {}
+
+
+def test_each_network_is_served_by_its_own_shard(dashboard, devices, boats, monkeypatch):
+    other_network = "N_mock-1"
+    monkeypatch.setattr(config, "MERAKI_NETWORK_IDS", [other_network])
+    devices([(SERIAL, False, "N/A"), (synthetic_serial(1), False, "N/A")])
+    boats([(BOAT, 3, 103), (synthetic_boat(1, 1), 4, 104)])
+
+    async def scenario():
+        ops = await open_ops()
+        try:
+            await ops.handle_webhook(webhook_payload(SERIAL, 1, "port_connected"))
+            await ops.handle_webhook(webhook_payload(synthetic_serial(1), 1, "port_connected",
+                                                     network_id=other_network))
+            return [shard.network_id for shard in ops.shards], ops.shards.get(other_network).rate_limiter.parent
+        finally:
+            await ops.close()
+
+    networks, parent = asyncio.run(scenario())
+    assert networks == [MOCK_NETWORK_ID, other_network]
+    assert parent is not None     # Networks of one organization split its rate budget
+    assert dashboard.ssids[(MOCK_NETWORK_ID, "3")]["enabled"] is True
+    assert dashboard.ssids[(other_network, "4")]["enabled"] is True
+
+
+def test_seeded_ssid_cache_skips_unchanged_update(dashboard):
+    enable = {"name": config.MERAKI_SSID_NAME, "enabled": True, "authMode": "psk", "encryptionMode": "wpa",
+              "psk": config.PSK, "useVlanTagging": True, "defaultVlanId": 103}
+    dashboard.update_ssid(MOCK_NETWORK_ID, 3, enable)
+    dashboard.update_ssid(MOCK_NETWORK_ID, 4, {"name": config.MERAKI_SSID_NAME, "enabled": False, "authMode": "open"})
+
+    async def scenario():
+        ops = await open_ops()
+        try:
+            assert await ops.seed_ssid_cache(MOCK_NETWORK_ID)
+            return (await ops.setup_meraki_network(3, MOCK_NETWORK_ID, config.PSK, "103"),
+                    await ops.teardown_meraki_network(4, MOCK_NETWORK_ID),
+                    await ops.setup_meraki_network(3, MOCK_NETWORK_ID, config.PSK, "104"))
+        finally:
+            await ops.close()
+
+    assert asyncio.run(scenario()) == ("unchanged", "unchanged", "applied")
+    assert dashboard.calls["updateNetworkWirelessSsid"] == 1
+    assert dashboard.ssids[(MOCK_NETWORK_ID, "3")]["defaultVlanId"] == 104
+
+
+def test_change_during_outage_is_queued_and_drained(dashboard, monkeypatch):
+    monkeypatch.setattr(config, "MERAKI_MAX_RETRIES", 0)
+    monkeypatch.setattr(config, "BREAKER_FAILURE_THRESHOLD", 1)
+    monkeypatch.setattr(config, "BREAKER_RESET_TIMEOUT", 0.0)
+    dashboard.outage = "error"
+
+    async def scenario():
+        ops = await open_ops()
+        try:
+            queued = await ops.setup_meraki_network(3, MOCK_NETWORK_ID, config.PSK, "103")
+            failed_fast = await ops.teardown_meraki_network(4, MOCK_NETWORK_ID)
+            dashboard.outage = None
+            drained = await ops.drain_pending_actions()     # The probe closes the breaker
+            drained += await ops.drain_pending_actions()
+            return queued, failed_fast, drained, len(ops.pending)
+        finally:
+            await ops.close()
+
+    assert asyncio.run(scenario()) == ("pending", "pending", 2, 0)
+    ssid = dashboard.ssids[(MOCK_NETWORK_ID, "3")]
+    assert ssid["enabled"] is True and ssid["psk"] == config.PSK    # Added back from config, never queued on disk
+    assert dashboard.ssids[(MOCK_NETWORK_ID, "4")]["enabled"] is False
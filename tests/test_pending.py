@@ -0,0 +1,70 @@
+import asyncio
+import subprocess
+import sys
+
+from config import config
+from pending import PendingActions
+
+ENABLE = {"name": "Boat", "enabled": True, "authMode": "psk", "psk": "test-psk"}
+DISABLE = {"name": "Boat", "enabled": False, "authMode": "open"}
+
+
+def test_changes_are_coalesced_per_ssid_without_psk():
+    async def scenario():
+        pending = PendingActions(config.PENDING_ACTIONS_PATH)
+        first = await pending.put("N_1", 3, ENABLE)
+        await pending.put("N_1", 4, ENABLE)
+        await pending.put("N_1", 3, DISABLE)
+        await pending.remove(first)     # Drained meanwhile, but superseded by the newer change
+        return PendingActions(config.PENDING_ACTIONS_PATH).entries()
+
+    entries = asyncio.run(scenario())
+    assert [(entry["ssid_number"], entry["payload"]) for entry in entries] == \
+        [("3", DISABLE), ("4", {k: v for k, v in ENABLE.items() if k != "psk"})]
+
+
+def test_only_the_lock_holder_drains():
+    # Another worker process drains the file
+    holder = subprocess.Popen(
+        [sys.executable, "-c", "import fcntl, os, sys, time; fd = os.open(sys.argv[1], os.O_RDWR | os.O_CREAT); "
+                               "fcntl.lockf(fd, fcntl.LOCK_EX); print(flush=True); time.sleep(30)",
+         f"{config.PENDING_ACTIONS_PATH}.drain"], stdout=subprocess.PIPE)
+    drains = []
+
+    async def drain():
+        drains.append(True)
+        return 1
+
+    async def scenario():
+        pending = PendingActions(config.PENDING_ACTIONS_PATH)
+        await pending.put("N_1", 3, ENABLE)
+        pending.start(drain, interval=0.01)
+        try:
+            pending.wake()
+            await asyncio.sleep(0.1)
+            skipped = len(drains)
+            holder.kill()
+            holder.wait()
+            await asyncio.sleep(0.1)   # Takes over at the next interval
+            return skipped
+        finally:
+            await pending.stop()
+
+    try:
+        holder.stdout.readline()
+        assert asyncio.run(scenario()) == 0 and drains
+    finally:
+        holder.kill()
+        holder.wait()
+
+
+def test_discard_drops_only_changes_queued_before():
+    async def scenario():
+        pending = PendingActions(config.PENDING_ACTIONS_PATH)
+        entry = await pending.put("N_1", 3, DISABLE)
+        await pending.discard("N_1", 3, before=entry["updated_at"])     # Queued after the applied change
+        kept = ("N_1", 3) in pending
+        await pending.discard("N_1", 3, before=entry["updated_at"] + 1)
+        return kept, ("N_1", 3) in PendingActions(config.PENDING_ACTIONS_PATH)
+
+    assert asyncio.run(scenario()) == (True, False)
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import pytest
+
+from ratelimit import OrgRateLimiter, PRIORITY_HIGH, PRIORITY_LOW
+
+
+class StatusError(Exception):
+    def __init__(self, status):
+        super().__init__(f"status {status}")
+        self.status = status
+
+
+def test_token_bucket_limits_call_rate():
+    async def scenario():
+        limiter = OrgRateLimiter(rate=20.0, burst=2)
+        started = time.monotonic()
+        for _ in range(6):
+            await limiter.acquire()
+        return time.monotonic() - started
+
+    # Two calls from the burst, four more at 20/s
+    assert asyncio.run(scenario()) >= 0.15
+
+
+def test_high_priority_is_served_first():
+    async def scenario():
+        limiter = OrgRateLimiter(rate=50.0, burst=1)
+        await limiter.acquire()     # Empty the bucket so the others queue
+        order = []
+
+        async def call(priority, name):
+            await limiter.acquire(priority)
+            order.append(name)
+
+        await asyncio.gather(call(PRIORITY_LOW, "low-1"), call(PRIORITY_LOW, "low-2"), call(PRIORITY_HIGH, "high"))
+        return order
+
+    assert asyncio.run(scenario())[0] == "high"
+
+
+def test_retries_429_and_5xx_but_not_4xx():
+    async def scenario():
+        limiter = OrgRateLimiter(rate=100.0, burst=10, max_retries=3, base_backoff=0.001)
+        failures = [StatusError(429), StatusError(503)]
+
+        async def flaky():
+            if failures:
+                raise failures.pop(0)
+            return "ok"
+
+        async def rejected():
+            raise StatusError(400)
+
+        assert await limiter.call(PRIORITY_LOW, flaky) == "ok"
+        assert limiter.retries == 2
+        with pytest.raises(StatusError):
+            await limiter.call(PRIORITY_LOW, rejected)
+        assert limiter.retries == 2
+
+    asyncio.run(scenario())
+
+
+def test_network_limiter_takes_parent_tokens():
+    async def scenario():
+        parent = OrgRateLimiter(rate=100.0, burst=5)
+        child = OrgRateLimiter(rate=100.0, burst=5, parent=parent)
+        await child.acquire()
+        tokens = int(parent._tokens)
+        child.pause(0.05)     # A 429 seen by the network pauses the whole organization
+        return tokens, parent._paused_until > time.monotonic()
+
+    tokens, paused = asyncio.run(scenario())
+    assert tokens == 4 and paused
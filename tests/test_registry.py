@@ -0,0 +1,121 @@
+import os
+import sqlite3
+import time
+
+import pytest
+
+from config import config
+from registry import BoatCatalogue, BoatCatalogueError, DeviceRegistry
+from state_store import CsvStateStore, SqliteStateStore
+
+
+def touch_later(path):
+    """Move the mtime of path forward, as a rewrite one second later would."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_registry_lookups_and_saved_row(devices):
+    devices([("Q1", False, "N/A"), ("Q2", True, "BOAT-A")])
+    registry = DeviceRegistry()
+    assert "Q1" in registry and "Q3" not in registry
+    assert registry.get_system_name("Q2") == "BOAT-A"
+
+    assert registry.update("Q1", switch_port_connected=True, system_name="BOAT-B")
+    assert not registry.update("Q3", switch_port_connected=True, system_name="BOAT-B")
+    registry.save("Q1")
+    assert DeviceRegistry().get("Q1")["SystemName"] == "BOAT-B"
+
+
+def test_registry_reloads_rewritten_csv(devices):
+    devices([("Q1", False, "N/A")])
+    registry = DeviceRegistry()
+    assert len(registry) == 1
+    devices([("Q1", False, "N/A"), ("Q2", False, "N/A")])
+    touch_later(config.CSV_DB)
+    assert "Q2" in registry
+
+
+def test_sqlite_registry_imports_csv_and_shares_rows(devices, monkeypatch):
+    monkeypatch.setattr(config, "STATE_BACKEND", "sqlite")
+    devices([("Q1", False, "N/A")])
+    first, second = DeviceRegistry(SqliteStateStore()), DeviceRegistry(SqliteStateStore())
+    assert first.store.shared and "Q1" in first
+
+    first.update("Q1", switch_port_connected=True, system_name="BOAT-A")
+    first.save("Q1")
+    assert second.get_system_name("Q1") == "BOAT-A"     # Read through, as by another worker
+
+
+def test_sqlite_store_claims_event_once(devices):
+    stores = SqliteStateStore(), SqliteStateStore()
+    assert stores[0].claim_event("key", ttl=60)
+    assert not stores[1].claim_event("key", ttl=60)
+    stores[0].release_event("key")
+    assert stores[1].claim_event("key", ttl=60)
+
+
+def test_sqlite_write_gives_up_on_a_held_lock_after_the_busy_timeout(devices, monkeypatch):
+    monkeypatch.setattr(config, "STATE_DB_BUSY_TIMEOUT", 0.1)
+    devices([("Q1", False, "N/A")])
+    holder, store = SqliteStateStore(), SqliteStateStore()
+    holder._conn.execute("BEGIN IMMEDIATE")    # Another worker's long write transaction
+    try:
+        started = time.monotonic()
+        with pytest.raises(sqlite3.OperationalError):
+            store.upsert({"Serial Number": "Q1", "switch_port_connected": True, "SystemName": "BOAT-A"})
+        assert time.monotonic() - started < 5
+    finally:
+        holder._conn.execute("ROLLBACK")
+    assert "Q1" in DeviceRegistry(store)    # Usable again once the lock is released
+
+
+def test_csv_store_snapshot_only_restores_unchanged_file(devices):
+    devices([("Q1", False, "N/A")])
+    store = CsvStateStore()
+    store.load()
+    snapshot = store.snapshot()
+    assert CsvStateStore().restore(snapshot)
+    touch_later(config.CSV_DB)
+    assert not CsvStateStore().restore(snapshot)
+
+
+def test_boat_lookup_prefers_network_row(boats):
+    boats([("BOAT-A", 1, 101, ""), ("BOAT-A", 2, 102, "N_2"), ("BOAT-B", 3, 103, "N_2")], network_column=True)
+    catalogue = BoatCatalogue()
+    assert catalogue.lookup("BOAT-A") == ("1", "101")
+    assert catalogue.lookup("BOAT-A", "N_2") == ("2", "102")
+    assert catalogue.lookup("BOAT-B", "N_3") == (None, None)
+    assert catalogue.lookup("BOAT-C") == (None, None)
+    assert "BOAT-B" in catalogue and "BOAT-C" not in catalogue
+    assert catalogue.names("N_2") == ["BOAT-A", "BOAT-B"]
+
+
+@pytest.mark.parametrize("rows", [
+    [("BOAT-A", 1, 101), ("BOAT-A", 2, 102)],
+    [("BOAT-A", 1, 101), ("BOAT-B", 1, 102)],
+    [("BOAT-A", 1, 101), ("BOAT-B", 2, 101)],
+])
+def test_boat_catalogue_rejects_conflicts(rows):
+    with pytest.raises(BoatCatalogueError):
+        BoatCatalogue.build_index([{"SystemName": name, "ssid_number": str(ssid), "vlan": str(vlan)}
+                                   for name, ssid, vlan in rows])
+
+
+def test_boat_catalogue_keeps_table_when_reload_is_invalid(boats):
+    boats([("BOAT-A", 1, 101)])
+    catalogue = BoatCatalogue()
+    assert catalogue.lookup("BOAT-A") == ("1", "101")
+    boats([("BOAT-A", 1, 101), ("BOAT-B", 1, 102)])
+    touch_later(config.BOATS_CSV)
+    assert catalogue.lookup("BOAT-A") == ("1", "101")
+    assert "BOAT-B" not in catalogue
+
+
+def test_boat_membership_survives_snapshot_restore(boats):
+    boats([("BOAT-A", 1, 101)])
+    catalogue = BoatCatalogue()
+    assert "BOAT-A" in catalogue
+    restored = BoatCatalogue()
+    assert restored.restore(catalogue.snapshot())
+    assert "BOAT-A" in restored and "BOAT-B" not in restored
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from alerts import peek_alert_type, peek_network_id, peek_serial
+from config import config
+from loadtest import webhook_payload
+from main import create_app, warm_up
+from metrics import WEBHOOKS
+from mock_dashboard import MOCK_NETWORK_ID, synthetic_boat, synthetic_serial
+from routes import ready_handler
+
+SERIAL = synthetic_serial(0)
+BOAT = synthetic_boat(0, 1)
+
+
+@pytest.fixture
+def client(dashboard, devices, boats, monkeypatch):
+    monkeypatch.setattr(config, "WARM_START_ENABLED", False)
+    devices([(SERIAL, False, "N/A")])
+    boats([(BOAT, 3, 103)])
+    with TestClient(create_app()) as test_client:
+        yield test_client
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def post(client, payload):
+    return client.post("/webhook", content=json.dumps(payload), headers={"Content-Type": "application/json"})
+
+
+def test_port_connected_is_applied(client, dashboard):
+    assert post(client, webhook_payload(SERIAL, 1, "port_connected")).status_code == 200
+    assert dashboard.ssids[(MOCK_NETWORK_ID, "3")]["enabled"] is True
+
+
+def test_unrelated_alerts_are_rejected_without_dashboard_calls(client, dashboard):
+    wait_for(lambda: client.get("/ready").status_code == 200)
+    dashboard.reset()
+    noise = post(client, webhook_payload(SERIAL, 1, "settings_changed"))
+    unregistered = post(client, webhook_payload(synthetic_serial(3), 1, "port_connected"))
+    other_network = post(client, webhook_payload(SERIAL, 1, "port_connected", network_id="N_other"))
+    assert [response.json()["status"] for response in (noise, unregistered, other_network)] == \
+        ["ignored", "unregistered", "unknown_network"]
+    assert dashboard.calls == {}
+    assert client.post("/webhook", content=b"[1, 2]").status_code == 400
+
+
+def test_queue_mode_acknowledges_with_202(dashboard, devices, boats, monkeypatch):
+    monkeypatch.setattr(config, "WARM_START_ENABLED", False)
+    monkeypatch.setattr(config, "WEBHOOK_QUEUE_MODE", True)
+    devices([(SERIAL, False, "N/A")])
+    boats([(BOAT, 3, 103)])
+    with TestClient(create_app()) as client:
+        response = post(client, webhook_payload(SERIAL, 1, "port_connected"))
+        assert response.status_code == 202
+        wait_for(lambda: dashboard.ssids.get((MOCK_NETWORK_ID, "3"), {}).get("enabled"))
+
+
+def test_metrics_and_readiness(client):
+    wait_for(lambda: client.get("/ready").status_code == 200)
+    assert client.get("/ready").json() == {"status": "ready"}
+    enabled = WEBHOOKS.value(alert_type="port_connected", result="enabled")
+    post(client, webhook_payload(SERIAL, 1, "port_connected"))
+    metrics = client.get("/metrics").text
+    assert f'sea_ssid_webhooks_total{{alert_type="port_connected",result="enabled"}} {enabled + 1}' in metrics
+    assert 'sea_ssid_dashboard_calls_total{operation="updateNetworkWirelessSsid",outcome="ok"}' in metrics
+
+
+def test_warm_up_is_ready_without_networks_that_cannot_seed():
+    class Ops:
+        registry, boats = [], []
+        shards = [SimpleNamespace(network_id="N_ok"), SimpleNamespace(network_id="N_down")]
+        down, tries = True, 0
+
+        async def seed_ssid_cache(self, network_id):
+            self.tries += network_id == "N_down"
+            return network_id == "N_ok" or not self.down
+
+    app = SimpleNamespace(state=SimpleNamespace(meraki_operations=Ops(), ready=False, unseeded_networks=[]))
+
+    async def scenario():
+        task = asyncio.create_task(warm_up(app, retry_interval=0.01, attempts=2))
+        while not app.state.ready:
+            await asyncio.sleep(0.001)
+        assert app.state.meraki_operations.tries == 2
+        response = await ready_handler(SimpleNamespace(app=app))
+        app.state.meraki_operations.down = False    # The network is retried until it seeds
+        await asyncio.wait_for(task, 1)
+        return response
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert json.loads(response.body) == {"status": "ready", "unseeded_networks": ["N_down"]}
+    assert app.state.ready and app.state.unseeded_networks == []
+
+
+def test_peeks_only_read_top_level_keys():
+    payload = webhook_payload(SERIAL, 1, "port_connected")
+    assert peek_serial(json.dumps(payload).encode()) == SERIAL
+    assert peek_alert_type(json.dumps(payload).encode()) == "port_connected"
+    # Only nested in alertData (or inside a string): left to the decoder
+    del payload["deviceSerial"], payload["networkId"]
+    payload["alertData"].update(deviceSerial="Q-OTHER", networkId="N_other")
+    payload["alertType"] = '{"deviceSerial": "Q-OTHER"'
+    assert peek_serial(json.dumps(payload).encode()) is None
+    assert peek_network_id(json.dumps(payload).encode()) is None
+    # A repeated key: the decoder decides which one counts
+    assert peek_serial(b'{"deviceSerial": "Q1", "deviceSerial": "Q2"}') is None
+
+
+def test_nested_keys_do_not_reject_the_alert(client, dashboard):
+    payload = webhook_payload(SERIAL, 1, "port_connected")
+    payload["alertData"]["deviceSerial"] = "Q-NOT-REGISTERED"
+    payload["alertData"]["networkId"] = "N_other"
+    text = json.dumps(payload).replace('"networkId": "N_mock", ', "")
+    text = text.replace('"alertData": {', '"alertData": {"alertTypeId": "settings_changed", ')
+    assert client.post("/webhook", content=text, headers={"Content-Type": "application/json"}).status_code == 200
+    assert dashboard.ssids[(MOCK_NETWORK_ID, "3")]["enabled"] is True
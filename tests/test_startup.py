@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+from conftest import MODULE_DIR
+
+
+def run_python(code, cwd, **env):
+    """Run code in a fresh interpreter with the app's modules importable."""
+    return subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {str(MODULE_DIR)!r})\n{code}"],
+                          cwd=cwd, env={**os.environ, **env}, capture_output=True, text=True, check=True)
+
+
+def test_importing_the_app_has_no_side_effects(tmp_path):
+    output = run_python("import threading, main\n"
+                        "print('meraki' in sys.modules, 'rich' in sys.modules, threading.active_count())", tmp_path)
+    assert output.stdout.split() == ["False", "False", "1"]
+    assert not (tmp_path / "logs").exists()    # Log files are opened on first use
+
+
+def test_nonblocking_console_samples_a_burst(tmp_path):
+    output = run_python("from logrr import lm\n"
+                        "for i in range(200): lm.tsp(f'message {i}')\n"
+                        "lm.shutdown(); print(lm.console_dropped, file=sys.stderr)",
+                        tmp_path, LOG_NONBLOCKING="true", LOG_QUEUE_SIZE="8", LOG_SAMPLE_RATE="4")
+    rendered = [line for line in output.stdout.splitlines() if line.startswith("message ")]
+    dropped = int(output.stderr.split()[-1])
+    assert dropped > 0 and len(rendered) + dropped == 200
+    assert rendered[0] == "message 0"
@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+
+from config import config
+from meraki_funcs import AsyncMerakiOps
+from mock_dashboard import synthetic_boat, synthetic_serial
+from warmstart import CacheSnapshot
+
+SERIAL = synthetic_serial(0)
+
+
+def open_caches():
+    ops = AsyncMerakiOps()
+    len(ops.registry)
+    len(ops.boats)
+    return ops
+
+
+def test_snapshot_restores_caches(devices, boats):
+    devices([(SERIAL, True, synthetic_boat(0, 1))])
+    boats([(synthetic_boat(0, 1), 3, 103)])
+    ops = open_caches()
+    ops.ssid_cache.record("N_mock", 3, {"name": "Boat", "enabled": True, "authMode": "psk"})
+    snapshot = CacheSnapshot(config.WARM_START_PATH)
+    assert snapshot.save(ops) > 0
+    assert "lldp" not in snapshot.read()["caches"]   # Expired long before the next start
+
+    restored = AsyncMerakiOps()
+    assert snapshot.load(restored)
+    assert restored.registry.get(SERIAL)["SystemName"] == synthetic_boat(0, 1)
+    assert restored.ssid_cache.get("N_mock", 3)["enabled"] is True
+
+
+def test_only_one_worker_writes_the_snapshot(devices):
+    # Another worker process holds the writer lock
+    holder = subprocess.Popen(
+        [sys.executable, "-c", "import fcntl, os, sys, time; fd = os.open(sys.argv[1], os.O_RDWR | os.O_CREAT); "
+                               "fcntl.lockf(fd, fcntl.LOCK_EX); print(flush=True); time.sleep(30)",
+         f"{config.WARM_START_PATH}.lock"], stdout=subprocess.PIPE)
+    try:
+        holder.stdout.readline()
+        assert CacheSnapshot(config.WARM_START_PATH).save(open_caches()) is None
+        assert not os.path.exists(config.WARM_START_PATH)
+    finally:
+        holder.kill()
+        holder.wait()
+    assert CacheSnapshot(config.WARM_START_PATH).save(open_caches()) > 0